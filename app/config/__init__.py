@@ -1,3 +1,3 @@
 # Инициализация пакета конфигурации
-from app.config.database import get_engine, get_session, init_db
+from app.config.database import get_engine, get_session, session_scope, remove_session, dispose_engine, create_indexes, set_journal_mode, init_db
 from app.config.init_db import initialize_database
@@ -1,25 +1,335 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.models.base import Base
-
 import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker, scoped_session
+from app.models.base import Base
 
 # Конфигурация базы данных
 # Создаем путь к базе данных в корневой директории проекта
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
-DATABASE_URL = f'sqlite:///{os.path.join(BASE_DIR, "amonic.db")}'
+DATABASE_URL = os.environ.get('AMONIC_DATABASE_URL', f'sqlite:///{os.path.join(BASE_DIR, "amonic.db")}')
+
+# Профили настройки SQLite (применяются к каждому новому соединению)
+# default     - настройки SQLite по умолчанию
+# performance - WAL, чтобы окна поиска не ждали записи бронирований и импорта
+# strict      - performance с проверкой внешних ключей
+SQLITE_PROFILES = {
+    'default': {},
+    'performance': {
+        'busy_timeout': 5000,    # в миллисекундах
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456,  # 256 МБ
+        'cache_size': -65536,    # 64 МБ (отрицательное значение - в килобайтах)
+        'temp_store': 'MEMORY',
+        # Существующие данные и удаление пользователей рассчитаны
+        # на непроверяемые внешние ключи
+        'foreign_keys': 'OFF',
+    },
+}
+SQLITE_PROFILES['strict'] = dict(SQLITE_PROFILES['performance'], foreign_keys='ON')
+
+# Параметры, сохраняемые в файле базы: устанавливаются один раз в init_db.
+# Смена режима журнала требует монопольного доступа и при открытой другим
+# клиентом транзакции сразу завершается ошибкой «database is locked»
+PERSISTENT_PRAGMAS = ('journal_mode',)
+
+# Профиль выбирается переменной окружения AMONIC_DB_PROFILE,
+# отдельные параметры переопределяются через AMONIC_DB_<ПАРАМЕТР>,
+# например AMONIC_DB_MMAP_SIZE=0
+DATABASE_PROFILE = os.environ.get('AMONIC_DB_PROFILE', 'performance')
+
+# Движок и реестр сессий создаются один раз на процесс (лениво)
+_engine = None
+_session_registry = None
+_lock = threading.Lock()
+
+def get_sqlite_pragmas(profile=None):
+    """Возвращает параметры PRAGMA для профиля с учетом переопределений из окружения"""
+    profile = profile or DATABASE_PROFILE
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown database profile: {profile}")
+
+    pragmas = dict(SQLITE_PROFILES[profile])
+    for name in SQLITE_PROFILES['performance']:
+        value = os.environ.get(f'AMONIC_DB_{name.upper()}')
+        if value is not None:
+            pragmas[name] = value
+    return pragmas
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Подключает обработчик, выполняющий PRAGMA при открытии каждого соединения"""
+    pragmas = {name: value for name, value in pragmas.items() if name not in PERSISTENT_PRAGMAS}
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    # busy_timeout первым: следующие PRAGMA уже ждут снятия блокировки
+    ordered = sorted(pragmas.items(), key=lambda item: item[0] != 'busy_timeout')
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in ordered:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+def set_journal_mode(engine=None, pragmas=None):
+    """Переключает режим журнала базы по профилю (режим сохраняется в файле)
+
+    Если режим уже установлен, база не блокируется. Возвращает текущий
+    режим журнала или None, если профиль его не задает.
+    """
+    engine = engine or get_engine()
+    pragmas = get_sqlite_pragmas() if pragmas is None else pragmas
+    journal_mode = pragmas.get('journal_mode')
+    if engine.dialect.name != 'sqlite' or not journal_mode:
+        return None
+
+    with engine.connect() as connection:
+        current = connection.exec_driver_sql('PRAGMA journal_mode').scalar()
+        if current.lower() != str(journal_mode).lower():
+            current = connection.exec_driver_sql(f'PRAGMA journal_mode={journal_mode}').scalar()
+    return current
 
 def get_engine():
-    """Создает и возвращает движок SQLAlchemy"""
-    return create_engine(DATABASE_URL)
+    """Возвращает движок SQLAlchemy (один на процесс)"""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                engine = create_engine(DATABASE_URL)
+                apply_sqlite_pragmas(engine, get_sqlite_pragmas())
+                _engine = engine
+    return _engine
+
+def get_session_registry():
+    """Возвращает реестр сессий (scoped_session, по одной сессии на поток)"""
+    global _session_registry
+    if _session_registry is None:
+        engine = get_engine()
+        with _lock:
+            if _session_registry is None:
+                _session_registry = scoped_session(sessionmaker(bind=engine))
+    return _session_registry
 
 def get_session():
-    """Создает и возвращает сессию SQLAlchemy"""
-    engine = get_engine()
-    Session = sessionmaker(bind=engine)
-    return Session()
+    """Возвращает сессию SQLAlchemy текущего потока"""
+    return get_session_registry()()
+
+def get_fresh_session():
+    """Сессия потока без устаревших объектов для нового вызова контроллера"""
+    session = get_session()
+    if session.info.get('scope_depth') or not session.in_transaction():
+        return session
+    if session.new or session.dirty or session.deleted:
+        return session
+
+    connection = session.connection()
+    if connection.dialect.name == 'sqlite' and connection.connection.driver_connection.in_transaction:
+        # Изменения уже отправлены в базу (flush), но не зафиксированы
+        return session
+
+    # Завершаем прошлую транзакцию: объекты перечитаются при обращении
+    session.rollback()
+    return session
+
+@contextmanager
+def session_scope(immediate=False):
+    """Контекст единицы работы: фиксирует изменения при успехе, откатывает при ошибке
+
+    Вложенные контексты входят в транзакцию внешнего и ничего не фиксируют сами.
+    immediate=True открывает транзакцию SQLite командой BEGIN IMMEDIATE:
+    блокировка записи берется сразу, и проверка с последующей записью
+    (например, мест при бронировании) не пересекается с другими процессами.
+    """
+    session = get_session()
+    if session.info.get('scope_depth'):
+        session.info['scope_depth'] += 1
+        try:
+            yield session
+        finally:
+            session.info['scope_depth'] -= 1
+        return
+
+    session.info['scope_depth'] = 1
+    try:
+        if immediate:
+            _begin_immediate(session)
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.info['scope_depth'] = 0
+
+def _begin_immediate(session):
+    """Начинает транзакцию SQLite с немедленной блокировкой записи"""
+    connection = session.connection()
+    if connection.dialect.name != 'sqlite':
+        return
+    dbapi_connection = connection.connection.driver_connection
+    if not dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+
+def is_database_locked(error):
+    """Ошибка блокировки SQLite, после которой транзакцию можно повторить"""
+    return isinstance(error, OperationalError) and 'database is locked' in str(error)
+
+def run_in_transaction(work, retries=5, backoff=0.05, max_backoff=1.0):
+    """Выполняет work(session) в транзакции BEGIN IMMEDIATE с повторами
+
+    При ошибке «database is locked» транзакция откатывается и повторяется
+    до retries раз с экспоненциальной задержкой и случайным разбросом.
+    Возвращает результат work.
+    """
+    attempt = 0
+    while True:
+        try:
+            with session_scope(immediate=True) as session:
+                return work(session)
+        except OperationalError as error:
+            if not is_database_locked(error) or attempt >= retries:
+                raise
+            delay = min(max_backoff, backoff * (2 ** attempt))
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            attempt += 1
+
+def remove_session():
+    """Закрывает сессию текущего потока и удаляет ее из реестра"""
+    if _session_registry is not None:
+        _session_registry.remove()
+
+def dispose_engine():
+    """Закрывает все сессии и соединения пула (например, при завершении приложения)"""
+    global _engine, _session_registry
+    with _lock:
+        if _session_registry is not None:
+            _session_registry.remove()
+            _session_registry = None
+        if _engine is not None:
+            _search_indexes.pop(_engine, None)
+            _engine.dispose()
+            _engine = None
+
+def create_indexes(engine=None):
+    """Создает индексы моделей, отсутствующие в существующей базе данных
+
+    create_all пропускает уже существующие таблицы вместе с их индексами,
+    поэтому для старых баз индексы создаются отдельно.
+    Возвращает список имен созданных индексов.
+    """
+    engine = engine or get_engine()
+    created = []
+    with engine.begin() as connection:
+        existing = {
+            table_name: {index['name'] for index in inspect(connection).get_indexes(table_name)}
+            for table_name in inspect(connection).get_table_names()
+        }
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            for index in table.indexes:
+                if index.name not in existing[table.name]:
+                    index.create(connection)
+                    created.append(index.name)
+    return created
+
+# Индекс номеров рейсов (FTS5 с триграммами, внешнее содержимое - schedules).
+# Триггеры обновляют индекс при любых изменениях расписания: импорте,
+# редактировании, удалении
+FLIGHT_NUMBER_INDEX = 'schedules_flight_number_fts'
+FLIGHT_NUMBER_INDEX_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FLIGHT_NUMBER_INDEX} USING fts5("
+    f"flight_number, content='schedules', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS {FLIGHT_NUMBER_INDEX}_insert AFTER INSERT ON schedules BEGIN "
+    f"INSERT INTO {FLIGHT_NUMBER_INDEX}(rowid, flight_number) VALUES (new.id, new.flight_number); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FLIGHT_NUMBER_INDEX}_delete AFTER DELETE ON schedules BEGIN "
+    f"INSERT INTO {FLIGHT_NUMBER_INDEX}({FLIGHT_NUMBER_INDEX}, rowid, flight_number) "
+    f"VALUES ('delete', old.id, old.flight_number); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FLIGHT_NUMBER_INDEX}_update AFTER UPDATE OF id, flight_number ON schedules BEGIN "
+    f"INSERT INTO {FLIGHT_NUMBER_INDEX}({FLIGHT_NUMBER_INDEX}, rowid, flight_number) "
+    f"VALUES ('delete', old.id, old.flight_number); "
+    f"INSERT INTO {FLIGHT_NUMBER_INDEX}(rowid, flight_number) VALUES (new.id, new.flight_number); END",
+)
+
+# Наличие индекса номеров рейсов по движкам (проверяется один раз)
+_search_indexes = {}
+
+def _is_search_index_unsupported(error):
+    """Ошибка SQLite без FTS5 или без токенизатора trigram (старше 3.34)"""
+    message = str(error)
+    return ('no such module: fts5' in message or 'no such tokenizer' in message
+            or 'parse error in tokenize directive' in message)
+
+def _supports_search_index(connection):
+    """Проверяет, что SQLite поддерживает FTS5 с триграммами (временной таблицей)"""
+    try:
+        connection.exec_driver_sql(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS temp.flight_number_probe USING fts5(value, tokenize='trigram')"
+        )
+        connection.exec_driver_sql("DROP TABLE temp.flight_number_probe")
+    except OperationalError as error:
+        if _is_search_index_unsupported(error):
+            return False
+        raise
+    return True
+
+def create_search_indexes(engine=None):
+    """Создает индекс номеров рейсов, если SQLite поддерживает FTS5 с триграммами
+
+    Новый индекс заполняется по существующим расписаниям. Возвращает
+    True, если индекс есть в базе. Другие ошибки (например, «database is
+    locked») выбрасываются и не запоминаются как отсутствие поддержки.
+    """
+    engine = engine or get_engine()
+    if engine.dialect.name != 'sqlite':
+        _search_indexes[engine] = False
+        return False
+
+    try:
+        with engine.begin() as connection:
+            exists = inspect(connection).has_table(FLIGHT_NUMBER_INDEX)
+            for statement in FLIGHT_NUMBER_INDEX_DDL:
+                connection.exec_driver_sql(statement)
+            if not exists:
+                connection.exec_driver_sql(f"INSERT INTO {FLIGHT_NUMBER_INDEX}({FLIGHT_NUMBER_INDEX}) VALUES ('rebuild')")
+    except OperationalError as error:
+        if not _is_search_index_unsupported(error):
+            raise
+        _search_indexes[engine] = False
+        return False
+
+    _search_indexes[engine] = True
+    return True
+
+def has_search_index(engine=None):
+    """Есть ли в базе индекс номеров рейсов, который может использовать SQLite
+
+    Таблица индекса могла быть создана другой сборкой SQLite, поэтому
+    поддержка FTS5 с триграммами проверяется отдельно.
+    """
+    engine = engine or get_engine()
+    if engine not in _search_indexes:
+        if engine.dialect.name != 'sqlite':
+            _search_indexes[engine] = False
+        else:
+            with engine.connect() as connection:
+                _search_indexes[engine] = (inspect(connection).has_table(FLIGHT_NUMBER_INDEX) and
+                                           _supports_search_index(connection))
+    return _search_indexes[engine]
 
 def init_db():
-    """Инициализирует базу данных, создавая все таблицы"""
+    """Инициализирует базу данных, создавая все таблицы и индексы"""
     engine = get_engine()
+    set_journal_mode(engine)
     Base.metadata.create_all(engine)
+    create_indexes(engine)
+    create_search_indexes(engine)
@@ -3,6 +3,7 @@ import random
 import string
 from app.config.database import get_session
 from app.models import Base, Role, User, Office, Country, CabinType, Aircraft, Airport, Route, Schedule, Ticket
+from app.controllers.inventory_controller import InventoryController
 
 def initialize_database():
     """Инициализация базы данных начальными данными"""
@@ -277,4 +278,8 @@ def initialize_database():
         session.commit()
         print("Tickets added successfully")
     
+    # Счетчики свободных мест для добавленных рейсов и билетов
+    if not schedules or not tickets:
+        InventoryController.reconcile()
+    
     print("Database initialization completed successfully")
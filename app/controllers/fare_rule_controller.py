@@ -0,0 +1,162 @@
+from sqlalchemy import Integer, case, cast, func, or_, select
+from app.models import FareRule, CabinType, Schedule
+from app.config.database import get_session, get_fresh_session, session_scope
+from app.utils.fare_rules import FareRuleEntry, FareRuleCache
+
+class FareRuleController:
+    """Контроллер правил тарифов (множители и надбавки к базовым ценам)"""
+
+    @staticmethod
+    def _load_rules():
+        """Активные правила для компиляции (один запрос проекции)"""
+        session = get_session()
+        rows = session.query(
+            FareRule.id,
+            CabinType.name,
+            FareRule.route_id,
+            FareRule.start_date,
+            FareRule.end_date,
+            FareRule.multiplier,
+            FareRule.surcharge,
+            FareRule.priority
+        ).join(CabinType, FareRule.cabin_type_id == CabinType.id).filter(
+            FareRule.active == True
+        ).all()
+        return [FareRuleEntry(*row) for row in rows]
+
+    @staticmethod
+    def price_expression(cabin_type_name, schedule=Schedule):
+        """SQL-выражение цены кабины с учетом правил тарифов
+
+        Правило выбирается коррелированным подзапросом в том же порядке,
+        что и в CompiledFareRules, поэтому цена совпадает с
+        Schedule.get_price_by_cabin_type. Если активных правил нет,
+        возвращается выражение базовой цены.
+        """
+        base_price = Schedule.price_expression(cabin_type_name, schedule)
+        if not len(fare_rules.rules()):
+            return base_price
+
+        def rule_value(column):
+            return select(column).join(
+                CabinType, FareRule.cabin_type_id == CabinType.id
+            ).where(
+                FareRule.active == True,
+                func.lower(CabinType.name) == cabin_type_name.lower(),
+                or_(FareRule.route_id == schedule.route_id, FareRule.route_id.is_(None)),
+                or_(FareRule.start_date.is_(None), FareRule.start_date <= schedule.date),
+                or_(FareRule.end_date.is_(None), FareRule.end_date >= schedule.date)
+            ).order_by(
+                FareRule.route_id.is_(None),
+                or_(FareRule.start_date.isnot(None), FareRule.end_date.isnot(None)).desc(),
+                FareRule.priority.desc(),
+                FareRule.id.desc()
+            ).limit(1).scalar_subquery()
+
+        multiplier = rule_value(FareRule.multiplier)
+        return case(
+            (multiplier.is_(None), base_price),
+            else_=cast(base_price * multiplier + rule_value(FareRule.surcharge), Integer)
+        )
+
+    @staticmethod
+    def get_all_rules():
+        """Получение списка всех правил"""
+        session = get_fresh_session()
+        return session.query(FareRule).order_by(FareRule.id).all()
+
+    @staticmethod
+    def add_rule(cabin_type, multiplier=1.0, surcharge=0.0, route_id=None, start_date=None, end_date=None, priority=0):
+        """Добавление правила тарифа"""
+        session = get_fresh_session()
+
+        cabin_type_obj = session.query(CabinType).filter_by(name=cabin_type).first()
+        if not cabin_type_obj:
+            return False, "Тип кабины не найден"
+
+        error = FareRuleController._validate_rule(multiplier, start_date, end_date)
+        if error:
+            return False, error
+
+        try:
+            with session_scope():
+                rule = FareRule(
+                    cabin_type_id=cabin_type_obj.id,
+                    route_id=route_id,
+                    start_date=start_date,
+                    end_date=end_date,
+                    multiplier=multiplier,
+                    surcharge=surcharge,
+                    priority=priority,
+                    active=True
+                )
+                session.add(rule)
+
+            fare_rules.invalidate()
+            return True, rule.id
+        except Exception as e:
+            return False, f"Ошибка при добавлении правила: {str(e)}"
+
+    @staticmethod
+    def _validate_rule(multiplier, start_date, end_date):
+        """Проверка значений правила; возвращает сообщение об ошибке или None"""
+        if multiplier < 0:
+            return "Множитель не может быть отрицательным"
+
+        if start_date and end_date and start_date > end_date:
+            return "Дата начала позже даты окончания"
+
+        return None
+
+    @staticmethod
+    def update_rule(rule_id, **values):
+        """Изменение полей правила (multiplier, surcharge, start_date, ...)"""
+        session = get_fresh_session()
+        rule = session.query(FareRule).get(rule_id)
+
+        if not rule:
+            return False, "Правило не найдено"
+
+        for name in values:
+            if name not in ("route_id", "start_date", "end_date", "multiplier", "surcharge", "priority", "active"):
+                return False, f"Ошибка при обновлении правила: Unknown fare rule field: {name}"
+
+        # Проверяются значения правила после изменения
+        error = FareRuleController._validate_rule(
+            values.get("multiplier", rule.multiplier),
+            values.get("start_date", rule.start_date),
+            values.get("end_date", rule.end_date)
+        )
+        if error:
+            return False, error
+
+        try:
+            with session_scope():
+                for name, value in values.items():
+                    setattr(rule, name, value)
+
+            fare_rules.invalidate()
+            return True, "Правило успешно обновлено"
+        except Exception as e:
+            return False, f"Ошибка при обновлении правила: {str(e)}"
+
+    @staticmethod
+    def delete_rule(rule_id):
+        """Удаление правила"""
+        session = get_fresh_session()
+        rule = session.query(FareRule).get(rule_id)
+
+        if not rule:
+            return False, "Правило не найдено"
+
+        try:
+            with session_scope():
+                session.delete(rule)
+
+            fare_rules.invalidate()
+            return True, "Правило удалено"
+        except Exception as e:
+            return False, f"Ошибка при удалении правила: {str(e)}"
+
+# Скомпилированные правила; сбрасываются при каждом изменении через контроллер
+fare_rules = FareRuleCache(FareRuleController._load_rules)
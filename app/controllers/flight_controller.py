@@ -1,11 +1,59 @@
 import datetime
-import random
-import string
 import csv
 import io
-from app.models import Schedule, Route, Airport, Aircraft, CabinType, Ticket, Country
-from app.config.database import get_session
-from sqlalchemy import and_, or_
+import itertools
+import os
+from collections import Counter, namedtuple
+from app.models import Schedule, Route, Airport, Aircraft, CabinType, Ticket, Booking, Country, flight_number_index
+from app.config.database import get_fresh_session, session_scope, run_in_transaction, has_search_index
+from app.controllers.inventory_controller import InventoryController
+from app.controllers.fare_rule_controller import FareRuleController, fare_rules
+from sqlalchemy import and_, or_, func, insert, literal, literal_column, select, union_all, update
+from sqlalchemy.orm import aliased, contains_eager, joinedload
+from app.utils.date_utils import get_date_range
+from app.utils.booking_reference import encode_reference, normalize_reference
+from app.utils.flight_graph import FlightGraph, make_leg
+from app.utils.search_cache import SearchCache, FlightGraphCache
+
+# Кэш сегментов поиска (search_segments), инвалидируется при изменении рейсов
+search_cache = SearchCache()
+flight_graphs = FlightGraphCache()
+
+# С этого числа пассажиров билеты вставляются пакетами без объектов ORM
+BULK_BOOKING_THRESHOLD = 50
+# Размер пакета при массовой вставке билетов
+TICKET_INSERT_BATCH = 500
+# Размер пачки ID рейсов в одном UPDATE массовых операций
+BULK_UPDATE_BATCH = 500
+# Число строк файла изменений расписания, фиксируемых одной транзакцией
+IMPORT_CHUNK_SIZE = 1000
+# Минимальная длина подстроки номера рейса для поиска по индексу триграмм
+FLIGHT_NUMBER_INDEX_MIN_LENGTH = 3
+# Типы кабин в календаре минимальных цен
+FARE_CALENDAR_CABINS = ("Economy", "Business", "First Class")
+
+# Проекции для таблиц окон: только отображаемые столбцы, без объектов ORM,
+# поэтому строки можно кэшировать и передавать между потоками
+FlightSegment = namedtuple('FlightSegment', ['id', 'route_id', 'date', 'time', 'flight_number', 'economy_price'])
+SearchRow = namedtuple('SearchRow', [
+    'iid', 'from_code', 'to_code', 'date', 'time', 'flight_numbers', 'price', 'stops', 'seats_left'
+])
+ScheduleRow = namedtuple('ScheduleRow', [
+    'id', 'date', 'time', 'from_code', 'to_code', 'flight_number', 'aircraft_name',
+    'economy_price', 'business_price', 'first_class_price', 'confirmed'
+])
+
+class SeatsUnavailable(Exception):
+    """На сегменте поездки не хватает мест; откатывает всю транзакцию бронирования"""
+
+    def __init__(self, schedule):
+        super().__init__(schedule.flight_number)
+        self.schedule = schedule
+        # Номер рейса сохраняется до отката: после него объект рейса устаревает
+        self.flight_number = schedule.flight_number
+
+class BookingRejected(Exception):
+    """Бронирование невозможно (рейс или тип кабины не найден)"""
 
 class FlightController:
     """Контроллер для работы с рейсами и билетами"""
@@ -13,33 +61,29 @@ class FlightController:
     @staticmethod
     def get_all_airports():
         """Получение списка всех аэропортов"""
-        session = get_session()
+        session = get_fresh_session()
         return session.query(Airport).all()
 
     @staticmethod
     def get_all_cabin_types():
         """Получение списка всех типов кабин"""
-        session = get_session()
+        session = get_fresh_session()
         return session.query(CabinType).all()
 
     @staticmethod
     def get_all_countries():
         """Получение списка всех стран"""
-        session = get_session()
+        session = get_fresh_session()
         return session.query(Country).all()
 
     @staticmethod
     def search_flights(from_airport_code, to_airport_code, date, extended_search=False):
-        """Поиск рейсов по параметрам"""
-        session = get_session()
-
-        # Получаем аэропорты
-        from_airport = session.query(Airport).filter_by(iata_code=from_airport_code).first()
-        to_airport = session.query(Airport).filter_by(iata_code=to_airport_code).first()
-
-        if not from_airport or not to_airport:
-            return []
+        """Поиск рейсов по параметрам
 
+        Возвращает объекты ORM сессии потока, поэтому результат не кэшируется:
+        после фиксации или закрытия сессии такие объекты устаревают.
+        Кэшируемые строки без объектов ORM возвращает search_segments.
+        """
         # Определяем диапазон дат
         if extended_search:
             start_date = date - datetime.timedelta(days=3)
@@ -48,6 +92,15 @@ class FlightController:
             start_date = date
             end_date = date
 
+        session = get_fresh_session()
+
+        # Получаем аэропорты
+        from_airport = session.query(Airport).filter_by(iata_code=from_airport_code).first()
+        to_airport = session.query(Airport).filter_by(iata_code=to_airport_code).first()
+
+        if not from_airport or not to_airport:
+            return []
+
         # Ищем прямые рейсы
         direct_flights = session.query(Schedule).join(Route).filter(
             Route.departure_airport_id == from_airport.id,
@@ -57,305 +110,1091 @@ class FlightController:
             Schedule.confirmed == True
         ).all()
 
-        # Ищем рейсы с пересадкой (упрощенный алгоритм)
-        connecting_flights = []
+        # Ищем рейсы с пересадкой одним запросом: самосоединение расписаний
+        # и маршрутов возвращает пары (первый сегмент, второй сегмент)
+        first_leg = aliased(Schedule)
+        second_leg = aliased(Schedule)
+        first_route = aliased(Route)
+        second_route = aliased(Route)
+
+        connecting_rows = session.query(first_leg, second_leg).join(
+            first_route, first_leg.route
+        ).join(
+            second_route, second_route.departure_airport_id == first_route.arrival_airport_id
+        ).join(
+            second_leg, second_leg.route_id == second_route.id
+        ).filter(
+            first_route.departure_airport_id == from_airport.id,
+            first_route.arrival_airport_id != to_airport.id,
+            second_route.arrival_airport_id == to_airport.id,
+            first_leg.date >= start_date,
+            first_leg.date <= end_date,
+            first_leg.confirmed == True,
+            second_leg.date == first_leg.date,  # Стыковка в тот же день для простоты
+            second_leg.time > first_leg.time,   # Время вылета после прибытия первого сегмента
+            second_leg.confirmed == True
+        ).options(
+            contains_eager(first_leg.route.of_type(first_route)).joinedload(first_route.departure_airport),
+            contains_eager(first_leg.route.of_type(first_route)).joinedload(first_route.arrival_airport),
+            contains_eager(second_leg.route.of_type(second_route)).joinedload(second_route.departure_airport),
+            contains_eager(second_leg.route.of_type(second_route)).joinedload(second_route.arrival_airport)
+        ).order_by(first_leg.date, first_leg.time, second_leg.time).all()
+
+        connecting_flights = [(first, second) for first, second in connecting_rows]
 
-        # Получаем все рейсы из аэропорта отправления
-        first_leg_flights = session.query(Schedule).join(Route).filter(
-            Route.departure_airport_id == from_airport.id,
+        return {
+            'direct': direct_flights,
+            'connecting': connecting_flights
+        }
+
+    @staticmethod
+    def _segment_columns(schedule):
+        """Столбцы FlightSegment для расписания (или его псевдонима)"""
+        return (schedule.id, schedule.route_id, schedule.date, schedule.time, schedule.flight_number,
+                schedule.economy_price)
+
+    @staticmethod
+    def search_segments(from_airport_code, to_airport_code, start_date, end_date):
+        """Сегменты прямых рейсов и рейсов с пересадкой без объектов ORM
+
+        Возвращает словарь {'direct': [FlightSegment], 'connecting':
+        [(FlightSegment, FlightSegment)]}. Каждый вид рейсов выбирается
+        одним запросом с соединением аэропортов по кодам; результат
+        кэшируется общим для всех потоков.
+        """
+        cache_key = search_cache.make_key(from_airport_code, to_airport_code, start_date, end_date,
+                                          start_date != end_date)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        session = get_fresh_session()
+        departure_airport = aliased(Airport)
+        arrival_airport = aliased(Airport)
+
+        direct_rows = session.query(*FlightController._segment_columns(Schedule)).join(
+            Route, Schedule.route_id == Route.id
+        ).join(
+            departure_airport, Route.departure_airport_id == departure_airport.id
+        ).join(
+            arrival_airport, Route.arrival_airport_id == arrival_airport.id
+        ).filter(
+            departure_airport.iata_code == from_airport_code,
+            arrival_airport.iata_code == to_airport_code,
             Schedule.date >= start_date,
             Schedule.date <= end_date,
             Schedule.confirmed == True
-        ).all()
+        ).order_by(Schedule.date, Schedule.time).all()
+
+        # Пары сегментов с пересадкой в тот же день, как в search_flights
+        first_leg = aliased(Schedule)
+        second_leg = aliased(Schedule)
+        first_route = aliased(Route)
+        second_route = aliased(Route)
+
+        connecting_rows = session.query(
+            *FlightController._segment_columns(first_leg),
+            *FlightController._segment_columns(second_leg)
+        ).select_from(first_leg).join(
+            first_route, first_leg.route_id == first_route.id
+        ).join(
+            departure_airport, first_route.departure_airport_id == departure_airport.id
+        ).join(
+            second_route, second_route.departure_airport_id == first_route.arrival_airport_id
+        ).join(
+            arrival_airport, second_route.arrival_airport_id == arrival_airport.id
+        ).join(
+            second_leg, second_leg.route_id == second_route.id
+        ).filter(
+            departure_airport.iata_code == from_airport_code,
+            arrival_airport.iata_code == to_airport_code,
+            first_route.arrival_airport_id != arrival_airport.id,
+            first_leg.date >= start_date,
+            first_leg.date <= end_date,
+            first_leg.confirmed == True,
+            second_leg.date == first_leg.date,
+            second_leg.time > first_leg.time,
+            second_leg.confirmed == True
+        ).order_by(first_leg.date, first_leg.time, second_leg.time).all()
+
+        size = len(FlightSegment._fields)
+        result = {
+            'direct': [FlightSegment(*row) for row in direct_rows],
+            'connecting': [(FlightSegment(*row[:size]), FlightSegment(*row[size:])) for row in connecting_rows]
+        }
+        search_cache.put(cache_key, result)
+        return result
 
-        # Для каждого первого сегмента ищем стыковочный рейс
-        for first_leg in first_leg_flights:
-            # Получаем аэропорт прибытия первого сегмента
-            first_leg_arrival_airport_id = first_leg.route.arrival_airport_id
+    @staticmethod
+    def get_search_rows(from_airport_code, to_airport_code, date, cabin_type, extended_search=False):
+        """Строки таблицы результатов поиска без объектов ORM
+
+        Возвращает список SearchRow; iid - идентификатор строки для
+        бронирования ("direct_<id>" или "connecting_<i>_<a>_<b>").
+        Строки можно передавать между потоками.
+        """
+        days = 3 if extended_search else 0
+        start_date, end_date = get_date_range(date, days, days)
+        segments = FlightController.search_segments(from_airport_code, to_airport_code, start_date, end_date)
+        if not segments['direct'] and not segments['connecting']:
+            return []
 
-            # Пропускаем, если это уже пункт назначения
-            if first_leg_arrival_airport_id == to_airport.id:
-                continue
+        # Свободные места для всех рейсов получаем одним запросом
+        flight_ids = [segment.id for segment in segments['direct']]
+        for first_leg, second_leg in segments['connecting']:
+            flight_ids.extend((first_leg.id, second_leg.id))
+        seats_left = FlightController.get_remaining_seats(flight_ids, cabin_type)
+
+        # Цена сегмента - базовая цена кабины с правилом тарифа, как в
+        # Schedule.get_price_by_cabin_type
+        compiled_rules = fare_rules.rules()
+
+        def price(segment):
+            base_price = Schedule.price_for_cabin(segment.economy_price, cabin_type)
+            return compiled_rules.apply(segment.route_id, segment.date, cabin_type, base_price)
+
+        rows = []
+        for segment in segments['direct']:
+            rows.append(SearchRow(
+                f"direct_{segment.id}",
+                from_airport_code,
+                to_airport_code,
+                segment.date,
+                segment.time,
+                segment.flight_number,
+                price(segment),
+                0,
+                seats_left.get(segment.id, 0)
+            ))
+
+        for i, (first_leg, second_leg) in enumerate(segments['connecting']):
+            rows.append(SearchRow(
+                f"connecting_{i}_{first_leg.id}_{second_leg.id}",
+                from_airport_code,
+                to_airport_code,
+                first_leg.date,
+                first_leg.time,
+                f"{first_leg.flight_number} - {second_leg.flight_number}",
+                price(first_leg) + price(second_leg),
+                1,
+                min(seats_left.get(first_leg.id, 0), seats_left.get(second_leg.id, 0))
+            ))
+        return rows
 
-            # Ищем рейсы из этого аэропорта в пункт назначения
-            second_leg_flights = session.query(Schedule).join(Route).filter(
-                Route.departure_airport_id == first_leg_arrival_airport_id,
-                Route.arrival_airport_id == to_airport.id,
-                Schedule.date == first_leg.date,  # Стыковка в тот же день для простоты
-                Schedule.time > first_leg.time,   # Время вылета после прибытия первого сегмента
-                Schedule.confirmed == True
-            ).all()
+    @staticmethod
+    def get_fare_calendar(from_airport_code, to_airport_code, date, days=3):
+        """Календарь минимальных цен на date ± days дней
+
+        Возвращает словарь {дата: {"direct": {кабина: цена},
+        "connecting": {кабина: цена}}} только для дат, в которые есть рейсы.
+        Прямые рейсы и рейсы с одной пересадкой (по тем же правилам, что и
+        в search_flights) агрегируются одним запросом с GROUP BY по дате,
+        объекты рейсов не загружаются.
+        """
+        start_date, end_date = get_date_range(date, days, days)
+        session = get_fresh_session()
+
+        from_airport_id = select(Airport.id).where(Airport.iata_code == from_airport_code).scalar_subquery()
+        to_airport_id = select(Airport.id).where(Airport.iata_code == to_airport_code).scalar_subquery()
+
+        # Прямые рейсы
+        direct = select(
+            Schedule.date.label("day"),
+            literal(0).label("stops"),
+            *[func.min(FareRuleController.price_expression(cabin)) for cabin in FARE_CALENDAR_CABINS]
+        ).join(Route, Schedule.route_id == Route.id).where(
+            Route.departure_airport_id == from_airport_id,
+            Route.arrival_airport_id == to_airport_id,
+            Schedule.date >= start_date,
+            Schedule.date <= end_date,
+            Schedule.confirmed == True
+        ).group_by(Schedule.date)
+
+        # Рейсы с одной пересадкой: минимум суммы цен сегментов
+        first_leg = aliased(Schedule)
+        second_leg = aliased(Schedule)
+        first_route = aliased(Route)
+        second_route = aliased(Route)
+        connecting = select(
+            first_leg.date.label("day"),
+            literal(1).label("stops"),
+            *[func.min(FareRuleController.price_expression(cabin, first_leg) +
+                       FareRuleController.price_expression(cabin, second_leg))
+              for cabin in FARE_CALENDAR_CABINS]
+        ).select_from(first_leg).join(
+            first_route, first_leg.route_id == first_route.id
+        ).join(
+            second_route, second_route.departure_airport_id == first_route.arrival_airport_id
+        ).join(
+            second_leg, second_leg.route_id == second_route.id
+        ).where(
+            first_route.departure_airport_id == from_airport_id,
+            first_route.arrival_airport_id != to_airport_id,
+            second_route.arrival_airport_id == to_airport_id,
+            first_leg.date >= start_date,
+            first_leg.date <= end_date,
+            first_leg.confirmed == True,
+            second_leg.date == first_leg.date,
+            second_leg.time > first_leg.time,
+            second_leg.confirmed == True
+        ).group_by(first_leg.date)
+
+        calendar = {}
+        for day, stops, *prices in session.execute(union_all(direct, connecting)):
+            fares = calendar.setdefault(day, {"direct": {}, "connecting": {}})
+            fares["connecting" if stops else "direct"] = dict(zip(FARE_CALENDAR_CABINS, prices))
+        return calendar
 
-            # Добавляем стыковочные рейсы в список
-            for second_leg in second_leg_flights:
-                connecting_flights.append((first_leg, second_leg))
+    @staticmethod
+    def get_search_cache_stats():
+        """Счетчики попаданий и промахов кэша поиска"""
+        return search_cache.stats()
 
-        return {
-            'direct': direct_flights,
-            'connecting': connecting_flights
-        }
+    @staticmethod
+    def _invalidate_search_cache(schedule, *dates):
+        """Инвалидация результатов поиска и графов рейсов, затронутых изменением рейса"""
+        from_code = schedule.route.departure_airport.iata_code
+        to_code = schedule.route.arrival_airport.iata_code
+        for date in dates or (schedule.date,):
+            search_cache.invalidate(from_code, to_code, date)
+            flight_graphs.invalidate(date)
+
+    @staticmethod
+    def search_itineraries(from_airport_code, to_airport_code, date, extended_search=False,
+                           max_stops=2, cabin_type="Economy", min_connection_minutes=60):
+        """Поиск маршрутов с пересадками (до max_stops) по графу рейсов
+
+        Возвращает Парето-оптимальные маршруты по времени вылета и прилета,
+        цене и числу пересадок; допускаются стыковки через полночь.
+        Граф строится по всем подтвержденным рейсам диапазона дат (на
+        max_stops + 1 дней дольше окна вылета), поэтому он кэшируется
+        и инвалидируется вместе с кэшем поиска.
+        """
+        session = get_fresh_session()
+
+        # Получаем аэропорты
+        from_airport = session.query(Airport).filter_by(iata_code=from_airport_code).first()
+        to_airport = session.query(Airport).filter_by(iata_code=to_airport_code).first()
+
+        if not from_airport or not to_airport:
+            return []
+
+        # Определяем диапазон дат вылета
+        days = 3 if extended_search else 0
+        start_date, end_date = get_date_range(date, days, days)
+
+        # Последующие сегменты могут вылетать в следующие дни
+        load_end_date = end_date + datetime.timedelta(days=max_stops + 1)
+        # Правила тарифов скомпилированы заранее: цена сегмента - поиск в словаре
+        compiled_rules = fare_rules.rules()
+        graph_key = flight_graphs.make_key(start_date, load_end_date, cabin_type, min_connection_minutes, compiled_rules)
+        graph = flight_graphs.get(graph_key)
+        if graph is None:
+            graph = FlightController._build_flight_graph(
+                session, start_date, load_end_date, cabin_type, min_connection_minutes, compiled_rules
+            )
+            flight_graphs.put(graph_key, graph)
+
+        return graph.find_itineraries(
+            from_airport.id,
+            to_airport.id,
+            datetime.datetime.combine(start_date, datetime.time.min),
+            datetime.datetime.combine(end_date, datetime.time.max),
+            max_stops
+        )
+
+    @staticmethod
+    def _build_flight_graph(session, start_date, end_date, cabin_type, min_connection_minutes, compiled_rules):
+        """Граф подтвержденных рейсов за диапазон дат с ценами по правилам тарифов"""
+        # Загружаем подтвержденные рейсы одним запросом
+        rows = session.query(
+            Schedule.id,
+            Schedule.flight_number,
+            Schedule.route_id,
+            Route.departure_airport_id,
+            Route.arrival_airport_id,
+            Schedule.date,
+            Schedule.time,
+            Route.flight_time,
+            Schedule.price_expression(cabin_type)
+        ).join(Route).filter(
+            Schedule.date >= start_date,
+            Schedule.date <= end_date,
+            Schedule.confirmed == True
+        ).all()
+
+        legs = [
+            make_leg(schedule_id, flight_number, departure_id, arrival_id, leg_date, leg_time, flight_time,
+                     compiled_rules.apply(route_id, leg_date, cabin_type, price))
+            for schedule_id, flight_number, route_id, departure_id, arrival_id, leg_date, leg_time, flight_time, price in rows
+        ]
+
+        return FlightGraph(legs, min_connection=datetime.timedelta(minutes=min_connection_minutes))
 
     @staticmethod
     def get_flight_by_id(flight_id):
         """Получение рейса по ID"""
-        session = get_session()
-        return session.query(Schedule).get(flight_id)
+        session = get_fresh_session()
+        # Маршрут с аэропортами и самолет загружаются тем же запросом
+        return session.get(Schedule, flight_id, options=[
+            joinedload(Schedule.route).joinedload(Route.departure_airport),
+            joinedload(Schedule.route).joinedload(Route.arrival_airport),
+            joinedload(Schedule.aircraft)
+        ])
 
     @staticmethod
     def check_seat_availability(flight_id, cabin_type, passengers_count):
         """Проверка наличия свободных мест"""
-        session = get_session()
-        schedule = session.query(Schedule).get(flight_id)
-
-        if not schedule:
+        remaining = FlightController.get_remaining_seats([flight_id], cabin_type).get(flight_id)
+        if remaining is None:
             return False
 
+        # Проверяем, достаточно ли мест
+        return passengers_count <= remaining
+
+    @staticmethod
+    def get_remaining_seats(flight_ids, cabin_type):
+        """Количество свободных мест в кабине для набора рейсов
+
+        Возвращает словарь {ID рейса: свободные места}; значения читаются
+        из счетчиков seat_inventory по первичному ключу.
+        """
+        flight_ids = set(flight_ids)
+        if not flight_ids:
+            return {}
+
+        session = get_fresh_session()
+
         # Получаем тип кабины
         cabin_type_obj = session.query(CabinType).filter_by(name=cabin_type).first()
         if not cabin_type_obj:
-            return False
+            return {}
 
-        # Считаем существующие билеты
-        existing_tickets = session.query(Ticket).filter(
-            Ticket.schedule_id == flight_id,
-            Ticket.cabin_type_id == cabin_type_obj.id
-        ).count()
+        return InventoryController.get_available_seats(flight_ids, cabin_type_obj.id)
 
-        # Проверяем, достаточно ли мест
-        if cabin_type == "Economy":
-            return existing_tickets + passengers_count <= schedule.aircraft.economy_seats
-        elif cabin_type == "Business":
-            return existing_tickets + passengers_count <= schedule.aircraft.business_seats
-        else:  # First Class
-            # Предполагаем, что места первого класса = общее - эконом - бизнес
-            first_class_seats = schedule.aircraft.total_seats - schedule.aircraft.economy_seats - schedule.aircraft.business_seats
-            return existing_tickets + passengers_count <= first_class_seats
+    @staticmethod
+    def parse_flight_selection(selection):
+        """ID рейсов (сегментов) для строки результатов поиска
+
+        "direct_<id>" - прямой рейс, "connecting_<i>_<a>_<b>" - рейс
+        с пересадкой из сегментов a и b.
+        """
+        if not selection:
+            return []
+        kind, *parts = selection.split("_")
+        if kind == "direct":
+            return [int(parts[0])]
+        if kind == "connecting":
+            return [int(part) for part in parts[1:]]
+        raise ValueError(f"Unknown flight selection: {selection}")
 
     @staticmethod
     def book_flight(flight_id, cabin_type, passengers_data, user_id=None):
         """Бронирование билетов на рейс"""
-        session = get_session()
+        return FlightController.book_itinerary([flight_id], cabin_type, passengers_data, user_id)
 
-        # Получаем рейс
-        schedule = session.query(Schedule).get(flight_id)
-        if not schedule:
+    @staticmethod
+    def book_itinerary(flight_ids, cabin_type, passengers_data, user_id=None):
+        """Бронирование всех сегментов поездки (туда, пересадки, обратно)
+
+        Места на всех сегментах списываются и билеты создаются в одной
+        транзакции с одним номером бронирования: если на каком-либо
+        сегменте не хватает мест, не бронируется ни один.
+        """
+        if not flight_ids:
             return False, "Рейс не найден"
 
-        # Получаем тип кабины
-        cabin_type_obj = session.query(CabinType).filter_by(name=cabin_type).first()
-        if not cabin_type_obj:
-            return False, "Тип кабины не найден"
-
-        # Проверяем наличие мест
-        if not FlightController.check_seat_availability(flight_id, cabin_type, len(passengers_data)):
-            return False, "Недостаточно свободных мест"
-
-        # Генерируем номер бронирования
-        booking_reference = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+        # Рейсы, загруженные прошлыми вызовами, перечитываются в транзакции
+        get_fresh_session()
+
+        def reserve_and_issue(session):
+            # Рейсы и тип кабины читаются в той же транзакции, поэтому
+            # блокировка базы при чтении тоже приводит к повтору
+            schedules = session.query(Schedule).options(
+                joinedload(Schedule.route).joinedload(Route.departure_airport),
+                joinedload(Schedule.route).joinedload(Route.arrival_airport)
+            ).filter(Schedule.id.in_(flight_ids)).all()
+            schedules_by_id = {schedule.id: schedule for schedule in schedules}
+            if any(flight_id not in schedules_by_id for flight_id in flight_ids):
+                raise BookingRejected("Рейс не найден")
+
+            cabin_type_obj = session.query(CabinType).filter_by(name=cabin_type).first()
+            if not cabin_type_obj:
+                raise BookingRejected("Тип кабины не найден")
+            cabin_type_id = cabin_type_obj.id
+
+            # Списываем места на всех сегментах и создаем билеты в одной транзакции
+            for flight_id in flight_ids:
+                if not InventoryController.reserve_seats(flight_id, cabin_type_id, len(passengers_data)):
+                    # Исключение откатывает места, уже списанные на других сегментах
+                    raise SeatsUnavailable(schedules_by_id[flight_id])
+
+            booking_reference = FlightController._allocate_booking_reference(session)
+            rows = []
+            for flight_id in flight_ids:
+                rows.extend(FlightController._ticket_rows(flight_id, cabin_type_id, passengers_data, booking_reference, user_id))
+            if len(rows) >= BULK_BOOKING_THRESHOLD:
+                FlightController._insert_tickets(session, rows)
+            else:
+                FlightController._add_tickets(session, rows)
+
+            # Затронутые результаты поиска - до фиксации, пока рейсы загружены
+            touched = [
+                (schedule.route.departure_airport.iata_code, schedule.route.arrival_airport.iata_code, schedule.date)
+                for schedule in schedules
+            ]
+            return booking_reference, touched
 
         try:
-            # Создаем билеты для каждого пассажира
-            for passenger in passengers_data:
-                ticket = Ticket(
-                    user_id=user_id,
-                    schedule_id=flight_id,
-                    cabin_type_id=cabin_type_obj.id,
-                    firstname=passenger['firstname'],
-                    lastname=passenger['lastname'],
-                    email=passenger.get('email'),
-                    phone=passenger.get('phone'),
-                    passport_number=passenger['passport_number'],
-                    passport_country_id=passenger['passport_country_id'],
-                    booking_reference=booking_reference,
-                    confirmed=True
-                )
-                session.add(ticket)
-
-            session.commit()
-            return True, f"Бронирование успешно создано. Номер бронирования: {booking_reference}"
+            # BEGIN IMMEDIATE с повторами при блокировке базы другим процессом
+            booking_reference, touched = run_in_transaction(reserve_and_issue)
+        except BookingRejected as e:
+            return False, str(e)
+        except SeatsUnavailable as e:
+            if len(flight_ids) == 1:
+                return False, "Недостаточно свободных мест"
+            return False, f"Недостаточно свободных мест на рейсе {e.flight_number}"
         except Exception as e:
-            session.rollback()
             return False, f"Ошибка при создании бронирования: {str(e)}"
 
+        for from_code, to_code, date in touched:
+            search_cache.invalidate(from_code, to_code, date)
+        return True, f"Бронирование успешно создано. Номер бронирования: {booking_reference}"
+
+    @staticmethod
+    def _allocate_booking_reference(session):
+        """Выделение номера бронирования в текущей транзакции
+
+        Номер строится из порядкового номера строки bookings, уникальность
+        дополнительно гарантирует ограничение UNIQUE на bookings.reference.
+        """
+        booking = Booking(created_at=datetime.datetime.now())
+        session.add(booking)
+        session.flush()
+        booking.reference = encode_reference(booking.id)
+        session.flush()
+        return booking.reference
+
+    @staticmethod
+    def get_booking(reference):
+        """Бронирование по номеру: билеты и сегменты одним запросом
+
+        Возвращает словарь {"reference", "tickets", "segments"} или None,
+        если бронирование не найдено. Сегменты упорядочены по времени вылета.
+        """
+        session = get_fresh_session()
+        reference = normalize_reference(reference)
+        if not reference:
+            return None
+
+        tickets = session.query(Ticket).options(
+            joinedload(Ticket.cabin_type),
+            joinedload(Ticket.schedule).joinedload(Schedule.route).joinedload(Route.departure_airport),
+            joinedload(Ticket.schedule).joinedload(Schedule.route).joinedload(Route.arrival_airport)
+        ).filter(
+            Ticket.booking_reference == reference
+        ).order_by(Ticket.id).all()
+
+        if not tickets:
+            return None
+
+        segments = sorted({ticket.schedule for ticket in tickets}, key=lambda schedule: (schedule.date, schedule.time))
+        return {
+            "reference": reference,
+            "tickets": tickets,
+            "segments": segments
+        }
+
+    @staticmethod
+    def _ticket_rows(flight_id, cabin_type_id, passengers_data, booking_reference, user_id=None):
+        """Значения полей билетов для каждого пассажира"""
+        return [
+            {
+                "user_id": user_id,
+                "schedule_id": flight_id,
+                "cabin_type_id": cabin_type_id,
+                "firstname": passenger['firstname'],
+                "lastname": passenger['lastname'],
+                "email": passenger.get('email'),
+                "phone": passenger.get('phone'),
+                "passport_number": passenger['passport_number'],
+                "passport_country_id": passenger['passport_country_id'],
+                "booking_reference": booking_reference,
+                "confirmed": True
+            }
+            for passenger in passengers_data
+        ]
+
+    @staticmethod
+    def _add_tickets(session, rows):
+        """Создание билетов через объекты ORM (небольшие бронирования)"""
+        tickets = [Ticket(**row) for row in rows]
+        session.add_all(tickets)
+        return tickets
+
+    @staticmethod
+    def _insert_tickets(session, rows):
+        """Массовая вставка билетов пакетами (групповые и чартерные бронирования)
+
+        Одна инструкция INSERT выполняется через executemany для каждого
+        пакета, объекты ORM и unit of work не создаются.
+        """
+        statement = insert(Ticket)
+        for start in range(0, len(rows), TICKET_INSERT_BATCH):
+            session.execute(statement, rows[start:start + TICKET_INSERT_BATCH])
+
     @staticmethod
     def update_schedule(schedule_id, date, time, economy_price):
         """Обновление расписания рейса"""
-        session = get_session()
+        session = get_fresh_session()
         schedule = session.query(Schedule).get(schedule_id)
 
         if not schedule:
             return False, "Расписание не найдено"
 
+        old_date = schedule.date
+
         try:
-            schedule.date = date
-            schedule.time = time
-            schedule.economy_price = economy_price
+            with session_scope():
+                schedule.date = date
+                schedule.time = time
+                schedule.economy_price = economy_price
 
-            session.commit()
+            FlightController._invalidate_search_cache(schedule, old_date, date)
             return True, "Расписание успешно обновлено"
         except Exception as e:
-            session.rollback()
             return False, f"Ошибка при обновлении расписания: {str(e)}"
 
     @staticmethod
     def toggle_flight_status(schedule_id):
         """Изменение статуса рейса (подтвержден/отменен)"""
-        session = get_session()
+        session = get_fresh_session()
         schedule = session.query(Schedule).get(schedule_id)
 
         if not schedule:
             return False, "Расписание не найдено"
 
         try:
-            schedule.confirmed = not schedule.confirmed
+            with session_scope():
+                schedule.confirmed = not schedule.confirmed
 
-            session.commit()
+            FlightController._invalidate_search_cache(schedule)
             status = "подтвержден" if schedule.confirmed else "отменен"
             return True, f"Рейс {schedule.flight_number} {status}"
         except Exception as e:
-            session.rollback()
             return False, f"Ошибка при изменении статуса: {str(e)}"
 
     @staticmethod
-    def get_filtered_schedules(from_airport=None, to_airport=None, date=None, flight_number=None, sort_by="date_time"):
-        """Получение отфильтрованного списка расписаний"""
-        session = get_session()
-        query = session.query(Schedule).join(Route)
+    def _bulk_conditions(schedule_ids=None, from_airport=None, to_airport=None, start_date=None, end_date=None,
+                         flight_number=None):
+        """Условия WHERE массовой операции над расписаниями
+
+        По фильтрам - одно условие; при списке ID - по условию на пачку
+        из BULK_UPDATE_BATCH идентификаторов (фильтры тоже применяются).
+        """
+        conditions = []
+        if from_airport or to_airport:
+            routes = select(Route.id)
+            if from_airport:
+                routes = routes.where(Route.departure_airport_id == FlightController._airport_id(from_airport))
+            if to_airport:
+                routes = routes.where(Route.arrival_airport_id == FlightController._airport_id(to_airport))
+            conditions.append(Schedule.route_id.in_(routes))
+
+        if start_date:
+            conditions.append(Schedule.date >= start_date)
+
+        if end_date:
+            conditions.append(Schedule.date <= end_date)
+
+        if flight_number:
+            conditions.append(FlightController._flight_number_condition(flight_number))
+
+        if schedule_ids is None:
+            return [and_(*conditions)] if conditions else []
+
+        ids = sorted(set(schedule_ids))
+        return [and_(Schedule.id.in_(ids[start:start + BULK_UPDATE_BATCH]), *conditions)
+                for start in range(0, len(ids), BULK_UPDATE_BATCH)]
+
+    @staticmethod
+    def _bulk_update(conditions, values, check=None):
+        """Выполняет UPDATE по каждому условию в одной транзакции
+
+        check(session, condition) может отменить операцию исключением
+        ValueError. Возвращает число измененных рейсов.
+        """
+        def apply(session):
+            updated = 0
+            for condition in conditions:
+                if check:
+                    check(session, condition)
+                # Измененные рейсы, загруженные в сессию, помечаются устаревшими
+                result = session.execute(
+                    update(Schedule).where(condition).values(values).execution_options(synchronize_session="fetch")
+                )
+                updated += result.rowcount
+            return updated
+
+        updated = run_in_transaction(apply)
+        # Изменения могли затронуть любые закэшированные результаты поиска
+        search_cache.clear()
+        flight_graphs.clear()
+        return updated
+
+    @staticmethod
+    def set_flights_status(confirmed, schedule_ids=None, from_airport=None, to_airport=None, start_date=None,
+                           end_date=None, flight_number=None):
+        """Массовое подтверждение или отмена рейсов
+
+        Рейсы задаются списком ID и/или фильтрами (аэропорты - объекты
+        Airport или ID, диапазон дат, подстрока номера рейса). Изменение
+        выполняется UPDATE по множеству строк в одной транзакции.
+        Возвращает (True, число рейсов) или (False, сообщение об ошибке).
+        """
+        conditions = FlightController._bulk_conditions(schedule_ids, from_airport, to_airport, start_date, end_date,
+                                                       flight_number)
+        if schedule_ids is None and not conditions:
+            return False, "Не заданы рейсы для изменения"
+
+        try:
+            return True, FlightController._bulk_update(conditions, {"confirmed": bool(confirmed)})
+        except Exception as e:
+            return False, f"Ошибка при изменении статуса: {str(e)}"
+
+    @staticmethod
+    def reprice_flights(percent=0, amount=0, schedule_ids=None, from_airport=None, to_airport=None, start_date=None,
+                        end_date=None, flight_number=None):
+        """Массовое изменение цены эконом-класса рейсов
+
+        Новая цена - цена * (1 + percent / 100) + amount, округленная до
+        копеек; цены бизнес- и первого класса следуют за ней. Рейсы
+        задаются как в set_flights_status. Если хотя бы одна цена стала бы
+        неположительной, ничего не изменяется.
+        Возвращает (True, число рейсов) или (False, сообщение об ошибке).
+        """
+        conditions = FlightController._bulk_conditions(schedule_ids, from_airport, to_airport, start_date, end_date,
+                                                       flight_number)
+        if schedule_ids is None and not conditions:
+            return False, "Не заданы рейсы для изменения"
+
+        new_price = func.round(Schedule.economy_price * (1 + percent / 100) + amount, 2)
+
+        def check(session, condition):
+            invalid = session.query(func.count(Schedule.id)).filter(condition, new_price <= 0).scalar()
+            if invalid:
+                raise ValueError(f"цена стала бы неположительной у {invalid} рейсов")
+
+        try:
+            return True, FlightController._bulk_update(conditions, {"economy_price": new_price}, check)
+        except Exception as e:
+            return False, f"Ошибка при изменении цен: {str(e)}"
+
+    # Ключи сортировки расписаний: (атрибут Schedule, по убыванию). Последним
+    # ключом всегда идет ID, чтобы порядок был однозначным для постраничной выборки
+    SCHEDULE_SORT_KEYS = {
+        "date_time": (("date", False), ("time", False)),
+        "economy_price": (("economy_price", False), ("date", False), ("time", False)),
+        "business_price": (("business_price", False), ("date", False), ("time", False)),
+        "first_class_price": (("first_class_price", False), ("date", False), ("time", False)),
+        "confirmed": (("confirmed", True),),
+    }
+
+    @staticmethod
+    def _schedule_sort_keys(sort_by):
+        return FlightController.SCHEDULE_SORT_KEYS.get(sort_by, ()) + (("id", False),)
+
+    @staticmethod
+    def schedule_page_key(schedule, sort_by="date_time"):
+        """Ключ страницы для расписания или строки ScheduleRow
+
+        Передается в after_key/before_key для выборки следующей или
+        предыдущей страницы при той же сортировке.
+        """
+        return tuple(getattr(schedule, name) for name, _ in FlightController._schedule_sort_keys(sort_by))
+
+    @staticmethod
+    def _keyset_condition(columns, key, backward=False):
+        """Условие «строка после ключа» (или до ключа) для сортировки columns
+
+        columns - список (выражение, по убыванию); сравнение раскрывается
+        в (a > x) OR (a = x AND b > y) ..., поэтому допускает смешанные
+        направления сортировки.
+        """
+        # Значения ключа передаются параметрами: сравнение «<» с True/False
+        # напрямую SQLAlchemy не допускает
+        key = [literal(value) for value in key]
+        conditions = []
+        for i, (column, descending) in enumerate(columns):
+            later = column < key[i] if descending != backward else column > key[i]
+            equal = [previous == value for (previous, _), value in zip(columns[:i], key[:i])]
+            conditions.append(and_(*equal, later))
+        return or_(*conditions)
+
+    @staticmethod
+    def _flight_number_condition(flight_number):
+        """Условие поиска номера рейса по подстроке
+
+        Подстроки от трех символов ищутся по индексу триграмм (без полного
+        просмотра schedules), более короткие - через LIKE.
+        """
+        if len(flight_number) < FLIGHT_NUMBER_INDEX_MIN_LENGTH or not has_search_index():
+            return Schedule.flight_number.like(f"%{flight_number}%")
+
+        # Подстрока передается как фраза FTS5: кавычки внутри удваиваются
+        phrase = '"' + flight_number.replace('"', '""') + '"'
+        matches = select(flight_number_index.c.rowid).where(
+            literal_column(flight_number_index.name).op('MATCH')(phrase)
+        )
+        return Schedule.id.in_(matches)
 
+    @staticmethod
+    def _airport_id(airport):
+        """ID аэропорта по объекту Airport или самому ID
+
+        Окна передают ID, чтобы в фоновый поток не попадали объекты ORM
+        сессии главного потока.
+        """
+        return airport if isinstance(airport, int) else airport.id
+
+    @staticmethod
+    def _filter_schedules(query, from_airport=None, to_airport=None, date=None, flight_number=None,
+                          sort_by="date_time", max_price=None, cabin_type="Economy",
+                          page_size=None, after_key=None, before_key=None):
+        """Фильтры, сортировка и страница запроса расписаний (запрос уже соединен с Route)
+
+        При before_key строки выбираются в обратном порядке; вызывающий
+        переворачивает результат.
+        """
         # Применяем фильтры, если они указаны
         if from_airport:
-            query = query.filter(Route.departure_airport_id == from_airport.id)
+            query = query.filter(Route.departure_airport_id == FlightController._airport_id(from_airport))
 
         if to_airport:
-            query = query.filter(Route.arrival_airport_id == to_airport.id)
+            query = query.filter(Route.arrival_airport_id == FlightController._airport_id(to_airport))
 
         if date:
             query = query.filter(Schedule.date == date)
 
         if flight_number:
-            query = query.filter(Schedule.flight_number.like(f"%{flight_number}%"))
+            query = query.filter(FlightController._flight_number_condition(flight_number))
+
+        if max_price is not None:
+            query = query.filter(Schedule.price_expression(cabin_type) <= max_price)
+
+        # Применяем сортировку; страница начинается сразу после (или до)
+        # ключа, без OFFSET, поэтому ее стоимость не зависит от номера
+        backward = before_key is not None
+        columns = [(getattr(Schedule, name), descending)
+                   for name, descending in FlightController._schedule_sort_keys(sort_by)]
+
+        if after_key is not None:
+            query = query.filter(FlightController._keyset_condition(columns, after_key))
+        if before_key is not None:
+            query = query.filter(FlightController._keyset_condition(columns, before_key, backward=True))
+
+        query = query.order_by(*(column.desc() if descending != backward else column
+                                 for column, descending in columns))
+
+        if page_size:
+            query = query.limit(page_size)
+
+        return query
 
-        # Применяем сортировку
-        if sort_by == "date_time":
-            query = query.order_by(Schedule.date, Schedule.time)
-        elif sort_by == "economy_price":
-            query = query.order_by(Schedule.economy_price)
-        elif sort_by == "confirmed":
-            query = query.order_by(Schedule.confirmed.desc())
+    @staticmethod
+    def get_filtered_schedules(from_airport=None, to_airport=None, date=None, flight_number=None, sort_by="date_time",
+                               max_price=None, cabin_type="Economy", page_size=None, after_key=None, before_key=None):
+        """Получение отфильтрованного списка расписаний
+
+        max_price - ограничение цены в кабине cabin_type; фильтрация и
+        сортировка по цене любой кабины выполняются в базе данных
+        по базовым ценам (без правил тарифов).
+        page_size - размер страницы; after_key/before_key - ключ
+        (schedule_page_key) последней строки предыдущей страницы или
+        первой строки следующей.
+        """
+        session = get_fresh_session()
+        # Маршрут уже соединен для фильтров; аэропорты и самолет загружаются
+        # тем же запросом, чтобы таблица не выполняла запросы на каждую строку
+        query = session.query(Schedule).join(Route).options(
+            contains_eager(Schedule.route).joinedload(Route.departure_airport),
+            contains_eager(Schedule.route).joinedload(Route.arrival_airport),
+            joinedload(Schedule.aircraft)
+        )
+        query = FlightController._filter_schedules(query, from_airport, to_airport, date, flight_number, sort_by,
+                                                   max_price, cabin_type, page_size, after_key, before_key)
+        schedules = query.all()
+        if before_key is not None:
+            schedules.reverse()
+        return schedules
+
+    @staticmethod
+    def _schedule_rows_query(session):
+        """Запрос строк ScheduleRow: расписание с кодами аэропортов и самолетом"""
+        departure_airport = aliased(Airport)
+        arrival_airport = aliased(Airport)
+        return session.query(
+            Schedule.id,
+            Schedule.date,
+            Schedule.time,
+            departure_airport.iata_code,
+            arrival_airport.iata_code,
+            Schedule.flight_number,
+            Aircraft.name,
+            Schedule.economy_price,
+            Schedule.business_price,
+            Schedule.first_class_price,
+            Schedule.confirmed
+        ).join(
+            Route, Schedule.route_id == Route.id
+        ).join(
+            departure_airport, Route.departure_airport_id == departure_airport.id
+        ).join(
+            arrival_airport, Route.arrival_airport_id == arrival_airport.id
+        ).join(
+            Aircraft, Schedule.aircraft_id == Aircraft.id
+        )
+
+    @staticmethod
+    def get_schedule_rows(from_airport=None, to_airport=None, date=None, flight_number=None, sort_by="date_time",
+                          max_price=None, cabin_type="Economy", page_size=None, after_key=None, before_key=None):
+        """Строки таблицы расписаний (ScheduleRow) одним запросом
+
+        Параметры как у get_filtered_schedules; коды аэропортов, название
+        самолета и базовые цены всех кабин выбираются вместе с расписанием.
+        """
+        session = get_fresh_session()
+        query = FlightController._schedule_rows_query(session)
+        query = FlightController._filter_schedules(query, from_airport, to_airport, date, flight_number, sort_by,
+                                                   max_price, cabin_type, page_size, after_key, before_key)
+        rows = [ScheduleRow(*row) for row in query]
+        if before_key is not None:
+            rows.reverse()
+        return rows
 
-        return query.all()
+    @staticmethod
+    def get_schedule_row(schedule_id):
+        """Строка таблицы расписаний для одного рейса (None, если рейса нет)
+
+        Используется окнами для обновления одной строки после изменения рейса.
+        """
+        session = get_fresh_session()
+        row = FlightController._schedule_rows_query(session).filter(Schedule.id == schedule_id).first()
+        return ScheduleRow(*row) if row else None
 
     @staticmethod
     def import_schedule_changes(file_content):
-        """Импорт изменений расписания из текстового файла"""
-        session = get_session()
+        """Импорт изменений расписания из текстового файла (содержимое строкой)
+
+        Все строки импортируются в одной транзакции.
+        """
+        return FlightController._import_schedule_lines(io.StringIO(file_content))
+
+    @staticmethod
+    def import_schedule_file(path, chunk_size=IMPORT_CHUNK_SIZE, progress=None, encoding=None):
+        """Потоковый импорт изменений расписания из файла
+
+        Файл читается построчно, изменения фиксируются пачками по
+        chunk_size строк, поэтому память не растет с размером файла.
+        progress(строк обработано, байт прочитано, размер файла)
+        вызывается после каждой пачки. При ошибке уже зафиксированные
+        пачки сохраняются.
+        """
+        try:
+            total_size = os.path.getsize(path)
+            with open(path, 'r', newline='', encoding=encoding) as file:
+                return FlightController._import_schedule_lines(file, chunk_size, progress, total_size)
+        except OSError as e:
+            return False, str(e)
+
+    @staticmethod
+    def _import_schedule_lines(lines, chunk_size=None, progress=None, total_size=None):
+        """Импорт строк CSV изменений расписания пачками по chunk_size (None - одной транзакцией)"""
+        session = get_fresh_session()
         results = {
             "success": 0,
             "duplicates": 0,
             "missing_fields": 0
         }
+        # Затронутые импортом рейсы (аэропорт вылета, аэропорт прилета, дата)
+        touched = set()
+        processed = 0
+        committed = 0
+        bytes_read = 0
+
+        def read_lines():
+            nonlocal bytes_read
+            for line in lines:
+                # Позиция в файле для индикатора (оценка по UTF-8)
+                bytes_read += len(line.encode('utf-8'))
+                yield line
 
         try:
+            # Справочники загружаются один раз: строки не выполняют запросов
+            lookups = FlightController._import_lookups(session)
+
             # Парсим CSV-файл
-            csv_reader = csv.reader(io.StringIO(file_content), delimiter=',')
-            header = next(csv_reader)  # Пропускаем заголовок
-
-            for row in csv_reader:
-                if len(row) < 7:  # Проверяем, что все необходимые поля присутствуют
-                    results["missing_fields"] += 1
-                    continue
-
-                operation, flight_number, from_code, to_code, date_str, time_str, price_str = row[:7]
-
-                # Проверяем обязательные поля
-                if not all([operation, flight_number, from_code, to_code, date_str, time_str, price_str]):
-                    results["missing_fields"] += 1
-                    continue
-
-                # Получаем аэропорты
-                from_airport = session.query(Airport).filter_by(iata_code=from_code).first()
-                to_airport = session.query(Airport).filter_by(iata_code=to_code).first()
-
-                if not from_airport or not to_airport:
-                    results["missing_fields"] += 1
-                    continue
-
-                # Парсим дату и время
-                try:
-                    day, month, year = map(int, date_str.split('/'))
-                    date = datetime.date(year, month, day)
-
-                    hour, minute = map(int, time_str.split(':'))
-                    time = datetime.time(hour, minute)
-
-                    price = float(price_str)
-                except (ValueError, IndexError):
-                    results["missing_fields"] += 1
-                    continue
-
-                # Получаем маршрут
-                route = session.query(Route).filter(
-                    Route.departure_airport_id == from_airport.id,
-                    Route.arrival_airport_id == to_airport.id
-                ).first()
-
-                if not route:
-                    results["missing_fields"] += 1
-                    continue
-
-                # Получаем самолет (берем первый доступный для примера)
-                aircraft = session.query(Aircraft).first()
-                if not aircraft:
-                    results["missing_fields"] += 1
-                    continue
-
-                if operation.upper() == "ADD":
-                    # Проверяем, существует ли уже такой рейс
-                    existing_schedule = session.query(Schedule).filter(
-                        Schedule.flight_number == flight_number,
-                        Schedule.date == date,
-                        Schedule.route_id == route.id
-                    ).first()
-
-                    if existing_schedule:
-                        results["duplicates"] += 1
-                        continue
-
-                    # Создаем новое расписание
-                    new_schedule = Schedule(
-                        route_id=route.id,
-                        aircraft_id=aircraft.id,
-                        date=date,
-                        time=time,
-                        flight_number=flight_number,
-                        economy_price=price,
-                        confirmed=True
-                    )
-
-                    session.add(new_schedule)
-                    results["success"] += 1
-
-                elif operation.upper() == "EDIT":
-                    # Ищем существующее расписание для редактирования
-                    existing_schedule = session.query(Schedule).filter(
-                        Schedule.flight_number == flight_number,
-                        Schedule.route_id == route.id
-                    ).first()
-
-                    if not existing_schedule:
-                        results["missing_fields"] += 1
-                        continue
-
-                    # Обновляем расписание
-                    existing_schedule.date = date
-                    existing_schedule.time = time
-                    existing_schedule.economy_price = price
-
-                    results["success"] += 1
-
-            session.commit()
+            csv_reader = csv.reader(read_lines(), delimiter=',')
+            next(csv_reader, None)  # Пропускаем заголовок
+
+            while True:
+                rows = list(itertools.islice(csv_reader, chunk_size))
+                if not rows:
+                    break
+
+                with session_scope():
+                    FlightController._preload_schedules(session, rows, lookups)
+                    for row in rows:
+                        FlightController._import_row(session, row, results, touched, lookups)
+                    # Счетчики мест новых рейсов фиксируются вместе с ними
+                    created = [obj for obj in session.new if isinstance(obj, Schedule)]
+                    if created:
+                        session.flush()
+                        InventoryController.ensure_inventory([schedule.id for schedule in created])
+
+                processed += len(rows)
+                committed = results["success"]
+
+                # Инвалидация по мере фиксации, чтобы набор не рос с размером файла
+                for from_code, to_code, date in touched:
+                    search_cache.invalidate(from_code, to_code, date)
+                    flight_graphs.invalidate(date)
+                touched.clear()
+
+                if progress:
+                    progress(processed, bytes_read, total_size)
+                if chunk_size is None:
+                    break
+
             return True, results
 
         except Exception as e:
-            session.rollback()
+            if committed:
+                return False, f"{e} (строк обработано: {processed}, сохранено изменений: {committed})"
             return False, str(e)
+
+    @staticmethod
+    def _import_lookups(session):
+        """Справочники импорта: код аэропорта -> ID, (ID вылета, ID прилета) -> ID маршрута, ID самолета"""
+        airports = {iata_code: airport_id for airport_id, iata_code in session.query(Airport.id, Airport.iata_code)}
+        routes = {
+            (departure_id, arrival_id): route_id
+            for route_id, departure_id, arrival_id in
+            session.query(Route.id, Route.departure_airport_id, Route.arrival_airport_id).order_by(Route.id.desc())
+        }
+        # Самолет - первый доступный, как и раньше
+        aircraft_id = session.query(Aircraft.id).order_by(Aircraft.id).limit(1).scalar()
+        return {"airports": airports, "routes": routes, "aircraft_id": aircraft_id}
+
+    @staticmethod
+    def _preload_schedules(session, rows, lookups):
+        """Загружает расписания с номерами рейсов из пачки строк
+
+        lookups["schedules"] - (номер рейса, ID маршрута) -> первое расписание
+        (для EDIT), lookups["keys"] - число расписаний по (номер рейса, дата,
+        ID маршрута) (для поиска дубликатов ADD).
+        """
+        flight_numbers = sorted({row[1] for row in rows if len(row) >= 7 and row[1]})
+
+        schedules = {}
+        keys = Counter()
+        for start in range(0, len(flight_numbers), BULK_UPDATE_BATCH):
+            batch = flight_numbers[start:start + BULK_UPDATE_BATCH]
+            for schedule in session.query(Schedule).filter(Schedule.flight_number.in_(batch)).order_by(Schedule.id):
+                schedules.setdefault((schedule.flight_number, schedule.route_id), schedule)
+                keys[(schedule.flight_number, schedule.date, schedule.route_id)] += 1
+
+        lookups["schedules"] = schedules
+        lookups["keys"] = keys
+
+    @staticmethod
+    def _import_row(session, row, results, touched, lookups):
+        """Применяет одну строку файла изменений расписания (без запросов к базе)"""
+        if len(row) < 7:  # Проверяем, что все необходимые поля присутствуют
+            results["missing_fields"] += 1
+            return
+
+        operation, flight_number, from_code, to_code, date_str, time_str, price_str = row[:7]
+
+        # Проверяем обязательные поля
+        if not all([operation, flight_number, from_code, to_code, date_str, time_str, price_str]):
+            results["missing_fields"] += 1
+            return
+
+        # Получаем аэропорты
+        from_airport_id = lookups["airports"].get(from_code)
+        to_airport_id = lookups["airports"].get(to_code)
+
+        if not from_airport_id or not to_airport_id:
+            results["missing_fields"] += 1
+            return
+
+        # Парсим дату и время
+        try:
+            day, month, year = map(int, date_str.split('/'))
+            date = datetime.date(year, month, day)
+
+            hour, minute = map(int, time_str.split(':'))
+            time = datetime.time(hour, minute)
+
+            price = float(price_str)
+        except (ValueError, IndexError):
+            results["missing_fields"] += 1
+            return
+
+        # Получаем маршрут
+        route_id = lookups["routes"].get((from_airport_id, to_airport_id))
+        if route_id is None:
+            results["missing_fields"] += 1
+            return
+
+        # Получаем самолет
+        aircraft_id = lookups["aircraft_id"]
+        if aircraft_id is None:
+            results["missing_fields"] += 1
+            return
+
+        schedules = lookups["schedules"]
+        keys = lookups["keys"]
+
+        if operation.upper() == "ADD":
+            # Проверяем, существует ли уже такой рейс
+            if keys[(flight_number, date, route_id)]:
+                results["duplicates"] += 1
+                return
+
+            # Создаем новое расписание
+            new_schedule = Schedule(
+                route_id=route_id,
+                aircraft_id=aircraft_id,
+                date=date,
+                time=time,
+                flight_number=flight_number,
+                economy_price=price,
+                confirmed=True
+            )
+
+            session.add(new_schedule)
+            schedules.setdefault((flight_number, route_id), new_schedule)
+            keys[(flight_number, date, route_id)] += 1
+            touched.add((from_code, to_code, date))
+            results["success"] += 1
+
+        elif operation.upper() == "EDIT":
+            # Ищем существующее расписание для редактирования
+            existing_schedule = schedules.get((flight_number, route_id))
+
+            if not existing_schedule:
+                results["missing_fields"] += 1
+                return
+
+            # Обновляем расписание
+            touched.add((from_code, to_code, existing_schedule.date))
+            touched.add((from_code, to_code, date))
+            keys[(flight_number, existing_schedule.date, route_id)] -= 1
+            keys[(flight_number, date, route_id)] += 1
+            existing_schedule.date = date
+            existing_schedule.time = time
+            existing_schedule.economy_price = price
+
+            results["success"] += 1
@@ -0,0 +1,178 @@
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from app.models import Schedule, Aircraft, CabinType, Ticket, SeatInventory
+from app.config.database import get_fresh_session, session_scope, run_in_transaction
+
+# Размер пачки идентификаторов в условии IN
+CHUNK_SIZE = 500
+
+def _chunks(ids):
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+class InventoryController:
+    """Контроллер счетчиков свободных мест (seat_inventory)
+
+    Счетчики создаются при импорте рейса (или сверкой для рейсов,
+    добавленных в обход импорта) по вместимости самолета за вычетом уже
+    проданных билетов, уменьшаются при бронировании и периодически
+    сверяются с таблицей tickets. Чтение мест счетчики не создает.
+    """
+
+    @staticmethod
+    def _count_inventory(session, schedule_ids=None):
+        """Вместимость и количество проданных мест для рейсов (None - для всех)
+
+        Возвращает словарь {(ID рейса, ID типа кабины): (вместимость, продано)}.
+        """
+        cabin_types = session.query(CabinType.id, CabinType.name).all()
+
+        capacity_query = session.query(
+            Schedule.id, Aircraft.total_seats, Aircraft.economy_seats, Aircraft.business_seats
+        ).join(Aircraft, Schedule.aircraft_id == Aircraft.id)
+        sold_query = session.query(
+            Ticket.schedule_id, Ticket.cabin_type_id, func.count()
+        ).group_by(Ticket.schedule_id, Ticket.cabin_type_id)
+
+        if schedule_ids is None:
+            capacity_rows = capacity_query.all()
+            sold_rows = sold_query.all()
+        else:
+            capacity_rows, sold_rows = [], []
+            for chunk in _chunks(schedule_ids):
+                capacity_rows.extend(capacity_query.filter(Schedule.id.in_(chunk)).all())
+                sold_rows.extend(sold_query.filter(Ticket.schedule_id.in_(chunk)).all())
+
+        sold = {(schedule_id, cabin_type_id): count for schedule_id, cabin_type_id, count in sold_rows}
+
+        counts = {}
+        for schedule_id, total_seats, economy_seats, business_seats in capacity_rows:
+            for cabin_type_id, cabin_type_name in cabin_types:
+                capacity = Aircraft.seats_for_cabin(total_seats, economy_seats, business_seats, cabin_type_name)
+                counts[(schedule_id, cabin_type_id)] = (capacity, sold.get((schedule_id, cabin_type_id), 0))
+        return counts
+
+    @staticmethod
+    def ensure_inventory(schedule_ids):
+        """Создает отсутствующие счетчики для рейсов (только на пути записи)"""
+        session = get_fresh_session()
+
+        existing = set()
+        for chunk in _chunks(schedule_ids):
+            existing.update(
+                schedule_id for (schedule_id,) in
+                session.query(SeatInventory.schedule_id).filter(SeatInventory.schedule_id.in_(chunk)).distinct()
+            )
+
+        missing = set(schedule_ids) - existing
+        if not missing:
+            return 0
+
+        rows = [
+            {
+                'schedule_id': schedule_id,
+                'cabin_type_id': cabin_type_id,
+                'capacity': capacity,
+                'seats_available': capacity - sold
+            }
+            for (schedule_id, cabin_type_id), (capacity, sold) in
+            InventoryController._count_inventory(session, missing).items()
+        ]
+        if rows:
+            with session_scope():
+                # Параллельный процесс мог уже создать счетчик - пропускаем такие строки
+                session.execute(insert(SeatInventory).on_conflict_do_nothing(), rows)
+        return len(rows)
+
+    @staticmethod
+    def get_available_seats(schedule_ids, cabin_type_id):
+        """Свободные места по счетчикам: {ID рейса: свободные места}"""
+        schedule_ids = set(schedule_ids)
+
+        session = get_fresh_session()
+        available = {}
+        for chunk in _chunks(schedule_ids):
+            available.update(session.query(SeatInventory.schedule_id, SeatInventory.seats_available).filter(
+                SeatInventory.schedule_id.in_(chunk),
+                SeatInventory.cabin_type_id == cabin_type_id
+            ).all())
+
+        # Рейсы без счетчика считаются по билетам без записи в базу:
+        # поиск не должен брать блокировку записи
+        missing = schedule_ids - available.keys()
+        if missing:
+            for (schedule_id, counted_cabin_id), (capacity, sold) in \
+                    InventoryController._count_inventory(session, missing).items():
+                if counted_cabin_id == cabin_type_id:
+                    available[schedule_id] = capacity - sold
+        return available
+
+    @staticmethod
+    def reserve_seats(schedule_id, cabin_type_id, count):
+        """Атомарно уменьшает счетчик, если мест достаточно
+
+        Выполняется в транзакции вызывающего кода (например, book_flight),
+        чтобы списание мест и создание билетов фиксировались вместе.
+        """
+        InventoryController.ensure_inventory([schedule_id])
+
+        session = get_fresh_session()
+        with session_scope():
+            result = session.query(SeatInventory).filter(
+                SeatInventory.schedule_id == schedule_id,
+                SeatInventory.cabin_type_id == cabin_type_id,
+                SeatInventory.seats_available >= count
+            ).update(
+                {SeatInventory.seats_available: SeatInventory.seats_available - count},
+                synchronize_session=False
+            )
+        return result == 1
+
+    @staticmethod
+    def reconcile(schedule_ids=None):
+        """Пересчитывает счетчики по таблице tickets (None - все рейсы)
+
+        Подсчет и запись выполняются в одной транзакции BEGIN IMMEDIATE:
+        бронирование не может зафиксироваться между ними, и его списание
+        мест не перезаписывается устаревшим значением.
+        Возвращает количество исправленных или созданных счетчиков.
+        """
+        def recount(session):
+            counts = InventoryController._count_inventory(session, schedule_ids)
+
+            current_query = session.query(
+                SeatInventory.schedule_id, SeatInventory.cabin_type_id,
+                SeatInventory.capacity, SeatInventory.seats_available
+            )
+            if schedule_ids is None:
+                current_rows = current_query.all()
+            else:
+                current_rows = []
+                for chunk in _chunks(schedule_ids):
+                    current_rows.extend(current_query.filter(SeatInventory.schedule_id.in_(chunk)).all())
+            current = {(row[0], row[1]): (row[2], row[3]) for row in current_rows}
+
+            rows = [
+                {
+                    'schedule_id': schedule_id,
+                    'cabin_type_id': cabin_type_id,
+                    'capacity': capacity,
+                    'seats_available': capacity - sold
+                }
+                for (schedule_id, cabin_type_id), (capacity, sold) in counts.items()
+                if current.get((schedule_id, cabin_type_id)) != (capacity, capacity - sold)
+            ]
+            if rows:
+                statement = insert(SeatInventory)
+                statement = statement.on_conflict_do_update(
+                    index_elements=[SeatInventory.schedule_id, SeatInventory.cabin_type_id],
+                    set_={
+                        'capacity': statement.excluded.capacity,
+                        'seats_available': statement.excluded.seats_available
+                    }
+                )
+                session.execute(statement, rows)
+            return len(rows)
+
+        return run_in_transaction(recount)
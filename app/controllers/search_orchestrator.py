@@ -0,0 +1,48 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from app.config.database import remove_session
+from app.controllers.flight_controller import FlightController
+
+# Параметры поиска одного направления (туда или обратно)
+SearchLeg = namedtuple('SearchLeg', ['from_airport_code', 'to_airport_code', 'date', 'cabin_type', 'with_calendar'])
+
+class SearchOrchestrator:
+    """Параллельный поиск нескольких направлений (туда и обратно)
+
+    Каждое направление выполняется в потоке пула со своей сессией
+    (scoped_session выдает сессию на поток): поиск рейсов, свободные
+    места и, при необходимости, календарь цен. Потоки возвращают только
+    простые данные, поэтому объекты ORM не пересекают границу потока.
+    Сессия потока закрывается после каждой задачи; результаты - простые
+    кортежи, не привязанные к сессии.
+    """
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="flight-search")
+
+    def search(self, *legs):
+        """Выполняет поиск по всем направлениям одновременно
+
+        Возвращает список результатов {"rows": [...], "calendar": {...} или None}
+        в порядке направлений; ошибка любого направления пробрасывается.
+        """
+        futures = [self._executor.submit(self._search_leg, leg) for leg in legs]
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def _search_leg(leg):
+        try:
+            calendar = None
+            if leg.with_calendar:
+                calendar = FlightController.get_fare_calendar(leg.from_airport_code, leg.to_airport_code, leg.date)
+            rows = FlightController.get_search_rows(leg.from_airport_code, leg.to_airport_code, leg.date, leg.cabin_type)
+            return {"rows": rows, "calendar": calendar}
+        finally:
+            remove_session()
+
+    def shutdown(self):
+        """Останавливает пул потоков"""
+        self._executor.shutdown(wait=True)
+
+# Общий пул для окон поиска
+search_orchestrator = SearchOrchestrator()
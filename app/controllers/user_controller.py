@@ -1,6 +1,6 @@
 import datetime
 from app.models import User, Role, Office, LoginAttempt, UserSession
-from app.config.database import get_session
+from app.config.database import get_fresh_session, session_scope
 
 class UserController:
     """Контроллер для работы с пользователями"""
@@ -8,59 +8,50 @@ class UserController:
     @staticmethod
     def authenticate(email, password):
         """Аутентификация пользователя"""
-        session = get_session()
+        session = get_fresh_session()
         user = session.query(User).filter_by(email=email).first()
 
         if user and user.password == password:
             if not user.active:
                 return None, "Ваша учетная запись отключена администратором"
 
-            # Записываем успешную попытку входа
-            login_attempt = LoginAttempt(
-                user_id=user.id,
-                timestamp=datetime.datetime.now(),
-                success=True
-            )
-            session.add(login_attempt)
-
-            # Создаем новый сеанс пользователя
-            user_session = UserSession(
-                user_id=user.id,
-                login_time=datetime.datetime.now()
-            )
-            session.add(user_session)
-            session.commit()
-
-            # Загружаем все необходимые связанные объекты
-            # чтобы избежать ошибки DetachedInstanceError
-            role = user.role
-            office = user.office
-
-            # Создаем новую сессию для дальнейшей работы
-            new_session = get_session()
-            # Загружаем пользователя в новую сессию
-            user_with_session = new_session.query(User).get(user.id)
-            user_session_with_session = new_session.query(UserSession).get(user_session.id)
-
-            return user_with_session, user_session_with_session
-        else:
-            # Записываем неудачную попытку входа
-            if user:
+            with session_scope():
+                # Записываем успешную попытку входа
                 login_attempt = LoginAttempt(
                     user_id=user.id,
                     timestamp=datetime.datetime.now(),
-                    success=False,
-                    error_message="Неверный пароль"
+                    success=True
                 )
                 session.add(login_attempt)
-                session.commit()
+
+                # Создаем новый сеанс пользователя
+                user_session = UserSession(
+                    user_id=user.id,
+                    login_time=datetime.datetime.now()
+                )
+                session.add(user_session)
+
+            # Сессия потока общая для всех контроллеров, поэтому объекты
+            # остаются привязанными к ней и доступны после фиксации
+            return user, user_session
+        else:
+            # Записываем неудачную попытку входа
+            if user:
+                with session_scope():
+                    login_attempt = LoginAttempt(
+                        user_id=user.id,
+                        timestamp=datetime.datetime.now(),
+                        success=False,
+                        error_message="Неверный пароль"
+                    )
+                    session.add(login_attempt)
 
             return None, "Неверный email или пароль"
 
     @staticmethod
     def get_all_users(office_filter=None):
         """Получение списка всех пользователей с возможностью фильтрации по офису"""
-        session = get_session()
+        session = get_fresh_session()
         query = session.query(User)
 
         if office_filter and office_filter != "All offices":
@@ -71,7 +62,7 @@ class UserController:
     @staticmethod
     def add_user(email, firstname, lastname, office_title, password, birthdate=None, role_title="user"):
         """Добавление нового пользователя"""
-        session = get_session()
+        session = get_fresh_session()
 
         # Проверяем, что пользователя с таким email еще нет
         existing_user = session.query(User).filter_by(email=email).first()
@@ -101,84 +92,80 @@ class UserController:
         )
 
         try:
-            session.add(user)
-            session.commit()
+            with session_scope():
+                session.add(user)
             return True, "User added successfully"
         except Exception as e:
-            session.rollback()
             return False, f"Error adding user: {str(e)}"
 
     @staticmethod
     def change_role(user_id, new_role_id):
         """Изменение роли пользователя"""
-        session = get_session()
+        session = get_fresh_session()
         user = session.query(User).get(user_id)
 
         if not user:
             return False, "Пользователь не найден"
 
         try:
-            user.role_id = new_role_id
-            session.commit()
+            with session_scope():
+                user.role_id = new_role_id
             return True, "Роль пользователя успешно изменена"
         except Exception as e:
-            session.rollback()
             return False, f"Ошибка при изменении роли: {str(e)}"
 
     @staticmethod
     def toggle_active(user_id):
         """Включение/отключение учетной записи пользователя"""
-        session = get_session()
+        session = get_fresh_session()
         user = session.query(User).get(user_id)
 
         if not user:
             return False, "Пользователь не найден"
 
         try:
-            user.active = not user.active
-            session.commit()
+            with session_scope():
+                user.active = not user.active
             status = "включена" if user.active else "отключена"
             return True, f"Учетная запись пользователя {status}"
         except Exception as e:
-            session.rollback()
             return False, f"Ошибка при изменении статуса: {str(e)}"
 
     @staticmethod
     def close_session(user_session):
         """Закрытие сеанса пользователя"""
-        session = get_session()
+        session = get_fresh_session()
 
         try:
-            user_session.logout_time = datetime.datetime.now()
-            session.add(user_session)
-            session.commit()
+            with session_scope():
+                user_session.logout_time = datetime.datetime.now()
+                session.add(user_session)
             return True
         except Exception as e:
-            session.rollback()
             return False
 
     @staticmethod
     def get_all_offices():
         """Получение списка всех офисов"""
-        session = get_session()
+        session = get_fresh_session()
         return session.query(Office).all()
 
     @staticmethod
     def get_user_by_id(user_id):
         """Получение пользователя по ID"""
-        session = get_session()
+        session = get_fresh_session()
         return session.query(User).get(user_id)
 
     @staticmethod
     def get_all_roles():
         """Получение списка всех ролей"""
-        session = get_session()
+        session = get_fresh_session()
         return session.query(Role).all()
 
     @staticmethod
     def change_user_role(user_id, role_id):
         """Изменение роли пользователя"""
-        session = get_session()
+        session = get_fresh_session()
         user = session.query(User).get(user_id)
 
         if not user:
@@ -190,9 +177,8 @@ class UserController:
             return False, "Role not found"
 
         try:
-            user.role_id = role_id
-            session.commit()
+            with session_scope():
+                user.role_id = role_id
             return True, f"Role successfully changed to {role.title}"
         except Exception as e:
-            session.rollback()
             return False, f"Error changing role: {str(e)}"
@@ -1,15 +1,21 @@
+import logging
 import sys
 import os
 
 # Добавляем родительскую директорию в путь поиска модулей
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.config.database import init_db
+from app.config.database import init_db, dispose_engine
 from app.config.init_db import initialize_database
+from app.controllers.search_orchestrator import search_orchestrator
 from app.views.login_view import LoginView
 
 def main():
     """Главная функция приложения"""
+    # Уровень журнала задается переменной окружения AMONIC_LOG_LEVEL
+    # (INFO выводит время выполнения фоновых запросов окон)
+    logging.basicConfig(level=os.environ.get('AMONIC_LOG_LEVEL', 'WARNING'))
+
     # Инициализируем базу данных
     init_db()
 
@@ -20,5 +26,9 @@ def main():
     app = LoginView()
     app.mainloop()
 
+    # Останавливаем потоки поиска, закрываем сессии и соединения с базой данных
+    search_orchestrator.shutdown()
+    dispose_engine()
+
 if __name__ == "__main__":
     main()
@@ -1,4 +1,4 @@
 # Инициализация пакета моделей
 from app.models.base import Base
 from app.models.user import Role, User, Office, Country, LoginAttempt, UserSession, SystemCrash
-from app.models.flight import Aircraft, Airport, Route, CabinType, Schedule, Ticket
+from app.models.flight import Aircraft, Airport, Route, CabinType, Schedule, Ticket, Booking, FareRule, SeatInventory, flight_number_index
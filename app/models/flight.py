@@ -1,7 +1,12 @@
-from sqlalchemy import Column, Integer, String, Date, Time, Float, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, Time, DateTime, Float, Boolean, ForeignKey, Index, cast, column, table
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from app.models.base import Base
 
+# Надбавки базовых тарифов: бизнес-класс к эконом-классу, первый класс к бизнес-классу
+BUSINESS_MARKUP = 1.35
+FIRST_CLASS_MARKUP = 1.3
+
 class Aircraft(Base):
     __tablename__ = 'aircrafts'
     id = Column(Integer, primary_key=True)
@@ -13,6 +18,20 @@ class Aircraft(Base):
 
     schedules = relationship('Schedule', back_populates='aircraft')
 
+    @staticmethod
+    def seats_for_cabin(total_seats, economy_seats, business_seats, cabin_type_name):
+        """Количество мест в кабине по вместимости самолета (без загрузки объекта)"""
+        if cabin_type_name == 'Economy':
+            return economy_seats
+        elif cabin_type_name == 'Business':
+            return business_seats
+        # Места первого класса = общее - эконом - бизнес
+        return total_seats - economy_seats - business_seats
+
+    def get_seats_by_cabin_type(self, cabin_type_name):
+        """Количество мест в кабине указанного типа"""
+        return Aircraft.seats_for_cabin(self.total_seats, self.economy_seats, self.business_seats, cabin_type_name)
+
 class Airport(Base):
     __tablename__ = 'airports'
     id = Column(Integer, primary_key=True)
@@ -26,6 +45,10 @@ class Airport(Base):
 
 class Route(Base):
     __tablename__ = 'routes'
+    __table_args__ = (
+        # Поиск маршрутов по паре аэропортов (поиск рейсов, импорт)
+        Index('ix_routes_departure_arrival', 'departure_airport_id', 'arrival_airport_id'),
+    )
     id = Column(Integer, primary_key=True)
     departure_airport_id = Column(Integer, ForeignKey('airports.id'))
     arrival_airport_id = Column(Integer, ForeignKey('airports.id'))
@@ -45,6 +68,12 @@ class CabinType(Base):
 
 class Schedule(Base):
     __tablename__ = 'schedules'
+    __table_args__ = (
+        # Поиск рейсов по маршруту и диапазону дат
+        Index('ix_schedules_route_date_time', 'route_id', 'date', 'time', 'confirmed'),
+        # Сортировка таблицы расписаний по дате и времени
+        Index('ix_schedules_date_time', 'date', 'time'),
+    )
     id = Column(Integer, primary_key=True)
     route_id = Column(Integer, ForeignKey('routes.id'))
     aircraft_id = Column(Integer, ForeignKey('aircrafts.id'))
@@ -58,29 +87,74 @@ class Schedule(Base):
     aircraft = relationship('Aircraft', back_populates='schedules')
     tickets = relationship('Ticket', back_populates='schedule')
 
-    @property
+    # Базовые цены бизнес- и первого класса вычисляются и в Python, и в SQL
+    # (CAST к INTEGER в SQLite отбрасывает дробную часть, как int()),
+    # поэтому по ним можно сортировать, фильтровать и агрегировать в запросе
+    @hybrid_property
     def business_price(self):
         # Бизнес-класс на 35% дороже эконом-класса
-        return int(self.economy_price * 1.35)
+        return int(self.economy_price * BUSINESS_MARKUP)
 
-    @property
+    @business_price.expression
+    def business_price(cls):
+        return cast(cls.economy_price * BUSINESS_MARKUP, Integer)
+
+    @hybrid_property
     def first_class_price(self):
         # Первый класс на 30% дороже бизнес-класса
-        return int(self.business_price * 1.3)
+        return int(self.business_price * FIRST_CLASS_MARKUP)
 
-    def get_price_by_cabin_type(self, cabin_type_name):
-        """Get price based on cabin type name"""
-        if cabin_type_name.lower() == 'economy':
-            return self.economy_price
-        elif cabin_type_name.lower() == 'business':
-            return self.business_price
+    @first_class_price.expression
+    def first_class_price(cls):
+        return cast(cls.business_price * FIRST_CLASS_MARKUP, Integer)
+
+    @staticmethod
+    def price_for_cabin(economy_price, cabin_type_name):
+        """Базовая цена по цене эконом-класса и названию типа кабины (без загрузки объекта)"""
+        if cabin_type_name.lower() == 'business':
+            return int(economy_price * BUSINESS_MARKUP)
         elif cabin_type_name.lower() == 'first class':
-            return self.first_class_price
-        else:
-            return self.economy_price  # Default to economy price
+            return int(int(economy_price * BUSINESS_MARKUP) * FIRST_CLASS_MARKUP)
+        return economy_price  # Эконом-класс и значение по умолчанию
+
+    @classmethod
+    def price_expression(cls, cabin_type_name, entity=None):
+        """SQL-выражение базовой цены для типа кабины
+
+        entity - псевдоним (aliased) расписания, если в запросе их несколько.
+        """
+        entity = entity if entity is not None else cls
+        if cabin_type_name.lower() == 'business':
+            return entity.business_price
+        elif cabin_type_name.lower() == 'first class':
+            return entity.first_class_price
+        return entity.economy_price  # Эконом-класс и значение по умолчанию
+
+    def get_price_by_cabin_type(self, cabin_type_name):
+        """Get price based on cabin type name (fare rules applied)"""
+        # Импорт здесь, чтобы модели не зависели от контроллеров при загрузке
+        from app.controllers.fare_rule_controller import fare_rules
+        base_price = Schedule.price_for_cabin(self.economy_price, cabin_type_name)
+        return fare_rules.apply(self.route_id, self.date, cabin_type_name, base_price)
+
+# Индекс номеров рейсов для поиска по подстроке: таблица SQLite FTS5
+# с триграммами поверх schedules. Виртуальная таблица и триггеры,
+# поддерживающие ее в актуальном состоянии, создаются init_db
+# (create_search_indexes); rowid совпадает с schedules.id
+flight_number_index = table(
+    'schedules_flight_number_fts',
+    column('rowid', Integer),
+    column('flight_number', String),
+)
 
 class Ticket(Base):
     __tablename__ = 'tickets'
+    __table_args__ = (
+        # Подсчет занятых мест по рейсу и типу кабины
+        Index('ix_tickets_schedule_cabin', 'schedule_id', 'cabin_type_id'),
+        # Поиск билетов бронирования по номеру
+        Index('ix_tickets_booking_reference', 'booking_reference'),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     schedule_id = Column(Integer, ForeignKey('schedules.id'))
@@ -98,3 +172,42 @@ class Ticket(Base):
     schedule = relationship('Schedule', back_populates='tickets')
     cabin_type = relationship('CabinType', back_populates='tickets')
     passport_country = relationship('Country')
+
+class Booking(Base):
+    """Бронирование: источник уникальных номеров бронирования"""
+    __tablename__ = 'bookings'
+    id = Column(Integer, primary_key=True)
+    # Заполняется после вставки по порядковому номеру id
+    reference = Column(String(10), unique=True)
+    created_at = Column(DateTime, nullable=False)
+
+class FareRule(Base):
+    """Правило тарифа: множитель и надбавка к базовой цене кабины
+
+    Пустые route_id, start_date и end_date означают правило для всех
+    маршрутов и без ограничения по дате.
+    """
+    __tablename__ = 'fare_rules'
+    id = Column(Integer, primary_key=True)
+    cabin_type_id = Column(Integer, ForeignKey('cabin_types.id'), nullable=False)
+    route_id = Column(Integer, ForeignKey('routes.id'))
+    start_date = Column(Date)
+    end_date = Column(Date)
+    multiplier = Column(Float, nullable=False, default=1.0)
+    surcharge = Column(Float, nullable=False, default=0.0)
+    priority = Column(Integer, nullable=False, default=0)
+    active = Column(Boolean, nullable=False, default=True)
+
+    cabin_type = relationship('CabinType')
+    route = relationship('Route')
+
+class SeatInventory(Base):
+    """Счетчик свободных мест по рейсу и типу кабины"""
+    __tablename__ = 'seat_inventory'
+    schedule_id = Column(Integer, ForeignKey('schedules.id'), primary_key=True)
+    cabin_type_id = Column(Integer, ForeignKey('cabin_types.id'), primary_key=True)
+    capacity = Column(Integer, nullable=False)
+    seats_available = Column(Integer, nullable=False)
+
+    schedule = relationship('Schedule')
+    cabin_type = relationship('CabinType')
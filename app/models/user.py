@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.models.base import Base
 
@@ -55,6 +55,10 @@ class LoginAttempt(Base):
 
 class UserSession(Base):
     __tablename__ = 'user_sessions'
+    __table_args__ = (
+        # Журнал активности пользователя, отсортированный по времени входа
+        Index('ix_user_sessions_user_login', 'user_id', 'login_time'),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'))
     login_time = Column(DateTime, nullable=False)
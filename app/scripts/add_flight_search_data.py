@@ -9,6 +9,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')
 
 from app.config.database import get_session
 from app.models import Country, Airport, Route, Aircraft, Schedule, CabinType, Ticket, User, Role
+from app.controllers.inventory_controller import InventoryController
 
 def add_flight_search_data():
     """Добавление данных для страницы поиска рейсов"""
@@ -218,6 +219,10 @@ def add_flight_search_data():
         session.commit()
         print(f"Добавлено билетов: {tickets_added}")
     
+    # Счетчики свободных мест для добавленных рейсов и билетов
+    if schedules_added or tickets_added:
+        InventoryController.reconcile()
+    
     print("Данные для поиска рейсов успешно добавлены!")
 
 if __name__ == "__main__":
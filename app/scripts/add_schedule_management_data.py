@@ -8,6 +8,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')
 
 from app.config.database import get_session
 from app.models import Country, Airport, Route, Aircraft, Schedule
+from app.controllers.inventory_controller import InventoryController
 
 def add_schedule_management_data():
     """Добавление данных для страницы управления расписанием"""
@@ -247,6 +248,8 @@ def add_schedule_management_data():
     if schedules_added > 0:
         session.commit()
         print(f"Добавлено расписаний: {schedules_added}")
+        # Счетчики свободных мест для добавленных рейсов
+        InventoryController.reconcile()
     
     print("Данные для управления расписанием успешно добавлены!")
 
@@ -0,0 +1,57 @@
+import sys
+import os
+import datetime
+import random
+import time
+
+# Добавляем путь к корневой директории проекта
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.utils.flight_graph import FlightGraph, make_leg
+
+NETWORK_SIZES = (1000, 5000, 20000)
+AIRPORTS = 30
+DAYS = 7
+REPEATS = 5
+
+def make_legs(count, seed=42):
+    """Случайная сеть рейсов на DAYS дней"""
+    rng = random.Random(seed)
+    first_day = datetime.date(2030, 1, 1)
+    legs = []
+    for schedule_id in range(count):
+        dep, arr = rng.sample(range(AIRPORTS), 2)
+        legs.append(make_leg(
+            schedule_id, f"B{schedule_id}", dep, arr,
+            first_day + datetime.timedelta(days=rng.randrange(DAYS)),
+            datetime.time(rng.randrange(24), rng.choice((0, 30))),
+            rng.randrange(60, 480), rng.randrange(100, 900)
+        ))
+    return legs, first_day + datetime.timedelta(days=DAYS // 2)
+
+def measure(work):
+    """Лучшее время выполнения work()"""
+    best = None
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        result = work()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def benchmark_flight_graph():
+    """Время построения графа и поиска маршрутов с двумя пересадками"""
+    print(f"{'Рейсов':>8} {'Граф, мс':>10} {'Поиск, мс':>10} {'Маршрутов':>10}")
+    for count in NETWORK_SIZES:
+        legs, day = make_legs(count)
+        build_time, graph = measure(lambda: FlightGraph(legs))
+        search_time, itineraries = measure(lambda: graph.find_itineraries(
+            1, 2,
+            datetime.datetime.combine(day, datetime.time.min),
+            datetime.datetime.combine(day, datetime.time.max),
+            max_stops=2
+        ))
+        print(f"{count:>8} {build_time * 1000:>10.2f} {search_time * 1000:>10.2f} {len(itineraries):>10}")
+
+if __name__ == "__main__":
+    benchmark_flight_graph()
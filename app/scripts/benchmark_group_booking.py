@@ -0,0 +1,58 @@
+import sys
+import os
+import time
+
+# Добавляем путь к корневой директории проекта
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.models import Base
+from app.controllers.flight_controller import FlightController
+
+GROUP_SIZES = (10, 100, 1000)
+REPEATS = 5
+
+def make_passengers(count):
+    """Данные пассажиров группы"""
+    return [
+        {
+            "firstname": f"Passenger{i}",
+            "lastname": "Group",
+            "email": f"passenger{i}@example.com",
+            "phone": "+1-555-0000",
+            "passport_number": f"GR{i:06d}",
+            "passport_country_id": 1
+        }
+        for i in range(count)
+    ]
+
+def measure(engine, issue, rows):
+    """Лучшее время создания билетов с фиксацией транзакции"""
+    best = None
+    for _ in range(REPEATS):
+        with Session(engine) as session:
+            started = time.perf_counter()
+            issue(session, rows)
+            session.commit()
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def benchmark_group_booking():
+    """Сравнение вставки билетов через ORM и пакетной вставки"""
+    # Отдельная база в памяти, чтобы не засорять рабочую
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+
+    print(f"{'Пассажиров':>10} {'ORM, мс':>10} {'Пакетно, мс':>12} {'Ускорение':>10}")
+    for count in GROUP_SIZES:
+        rows = FlightController._ticket_rows(1, 1, make_passengers(count), "BENCH1")
+        orm_time = measure(engine, FlightController._add_tickets, rows)
+        bulk_time = measure(engine, FlightController._insert_tickets, rows)
+        print(f"{count:>10} {orm_time * 1000:>10.2f} {bulk_time * 1000:>12.2f} {orm_time / bulk_time:>9.1f}x")
+
+    engine.dispose()
+
+if __name__ == "__main__":
+    benchmark_group_booking()
@@ -0,0 +1,19 @@
+import sys
+import os
+
+# Добавляем путь к корневой директории проекта
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.config.database import init_db
+from app.controllers.inventory_controller import InventoryController
+
+def reconcile_seat_inventory():
+    """Сверка счетчиков свободных мест с таблицей билетов"""
+    init_db()
+
+    print("Начало сверки счетчиков свободных мест...")
+    corrected = InventoryController.reconcile()
+    print(f"Исправлено или создано счетчиков: {corrected}")
+
+if __name__ == "__main__":
+    reconcile_seat_inventory()
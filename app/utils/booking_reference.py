@@ -0,0 +1,44 @@
+# Номера бронирования: порядковый номер из таблицы bookings в base32 Крокфорда
+# с контрольным символом. Номер уникален, пока уникален порядковый номер,
+# а длина (7 символов) отличает новые номера от старых случайных (6 символов).
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+DATA_LENGTH = 6
+CAPACITY = len(ALPHABET) ** DATA_LENGTH
+
+# Нечетный множитель - взаимно однозначное отображение по модулю 32^6,
+# чтобы соседние бронирования не получали похожие номера
+MULTIPLIER = 0x2F1D3B5
+
+def _checksum(data):
+    """Контрольный символ: взвешенная сумма цифр по модулю 32
+
+    Нечетные веса обратимы по модулю 32, поэтому замена любого одного
+    символа всегда меняет контрольный символ.
+    """
+    total = sum((2 * position + 1) * ALPHABET.index(char) for position, char in enumerate(data))
+    return ALPHABET[total % len(ALPHABET)]
+
+def encode_reference(number):
+    """Номер бронирования для порядкового номера (1 <= number < 32^6)"""
+    if not 0 < number < CAPACITY:
+        raise ValueError(f"Booking sequence number out of range: {number}")
+
+    value = (number * MULTIPLIER) % CAPACITY
+    chars = []
+    for _ in range(DATA_LENGTH):
+        value, digit = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    data = "".join(reversed(chars))
+    return data + _checksum(data)
+
+def normalize_reference(reference):
+    """Приведение введенного номера к каноническому виду"""
+    return (reference or "").strip().upper()
+
+def is_valid_reference(reference):
+    """Проверка формата и контрольного символа номера бронирования"""
+    reference = normalize_reference(reference)
+    if len(reference) != DATA_LENGTH + 1 or any(char not in ALPHABET for char in reference):
+        return False
+    return _checksum(reference[:-1]) == reference[-1]
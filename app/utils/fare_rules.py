@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import namedtuple
+
+# Правило тарифа: множитель и надбавка к базовой цене кабины.
+# route_id, start_date и end_date равны None, если правило действует
+# для всех маршрутов или без ограничения по дате.
+FareRuleEntry = namedtuple('FareRuleEntry', [
+    'id',
+    'cabin_type_name',
+    'route_id',
+    'start_date',
+    'end_date',
+    'multiplier',
+    'surcharge',
+    'priority',
+])
+
+class CompiledFareRules:
+    """Активные правила тарифов, разложенные по (кабина, маршрут)
+
+    Для рейса выбирается первое подходящее правило: сначала правила
+    маршрута, затем общие; среди них правила с датами раньше правил без
+    дат, затем по приоритету. Результат для (маршрут, дата, кабина)
+    запоминается, поэтому повторный расчет цены - поиск в словаре.
+    """
+
+    def __init__(self, rules):
+        self._rules = {}
+        for rule in rules:
+            key = (rule.cabin_type_name.lower(), rule.route_id)
+            self._rules.setdefault(key, []).append(rule)
+        for bucket in self._rules.values():
+            bucket.sort(key=lambda rule: (rule.start_date is not None or rule.end_date is not None, rule.priority, rule.id),
+                        reverse=True)
+        self._resolved = {}
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self._rules.values())
+
+    def lookup(self, route_id, date, cabin_type_name):
+        """Правило для рейса или None"""
+        key = (route_id, date, cabin_type_name.lower())
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+
+        rule = None
+        for bucket_key in ((key[2], route_id), (key[2], None)):
+            rule = next((candidate for candidate in self._rules.get(bucket_key, ())
+                         if (candidate.start_date is None or candidate.start_date <= date) and
+                         (candidate.end_date is None or date <= candidate.end_date)), None)
+            if rule:
+                break
+
+        self._resolved[key] = rule
+        return rule
+
+    def apply(self, route_id, date, cabin_type_name, base_price):
+        """Цена с учетом правила (без правила - базовая цена)"""
+        if not self._rules:
+            return base_price
+        rule = self.lookup(route_id, date, cabin_type_name)
+        if rule is None:
+            return base_price
+        return int(base_price * rule.multiplier + rule.surcharge)
+
+
+class FareRuleCache:
+    """Скомпилированные правила тарифов с перезагрузкой при изменении
+
+    loader() возвращает список FareRuleEntry. Правила загружаются при
+    первом обращении, после invalidate() и по истечении ttl секунд
+    (на случай изменений из другого процесса).
+    """
+
+    def __init__(self, loader, ttl=300.0, clock=time.monotonic):
+        self._loader = loader
+        self.ttl = ttl
+        self._clock = clock
+        self._compiled = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def rules(self):
+        """Текущие скомпилированные правила"""
+        with self._lock:
+            if self._compiled is None or self._clock() - self._loaded_at > self.ttl:
+                self._compiled = CompiledFareRules(self._loader())
+                self._loaded_at = self._clock()
+                self.loads += 1
+            return self._compiled
+
+    def invalidate(self):
+        """Сбрасывает правила; следующий расчет цены загрузит их заново"""
+        with self._lock:
+            self._compiled = None
+
+    def apply(self, route_id, date, cabin_type_name, base_price):
+        return self.rules().apply(route_id, date, cabin_type_name, base_price)
@@ -0,0 +1,155 @@
+import bisect
+import datetime
+from collections import defaultdict, namedtuple
+
+# Сегмент (рейс) графа: вылет и прилет уже приведены к datetime
+Leg = namedtuple('Leg', [
+    'schedule_id',
+    'flight_number',
+    'departure_airport_id',
+    'arrival_airport_id',
+    'departure',
+    'arrival',
+    'price',
+])
+
+class Itinerary(namedtuple('Itinerary', ['legs', 'departure', 'arrival', 'price', 'stops'])):
+    """Маршрут из одного или нескольких сегментов"""
+    __slots__ = ()
+
+    @classmethod
+    def from_legs(cls, legs):
+        return cls(tuple(legs), legs[0].departure, legs[-1].arrival, sum(leg.price for leg in legs), len(legs) - 1)
+
+    def extend(self, leg):
+        """Новый маршрут с дополнительным сегментом"""
+        return Itinerary(self.legs + (leg,), self.departure, leg.arrival, self.price + leg.price, self.stops + 1)
+
+    @property
+    def schedule_ids(self):
+        return tuple(leg.schedule_id for leg in self.legs)
+
+    def dominates(self, other):
+        """Не хуже по всем критериям: вылет позже, прилет раньше, цена и пересадки меньше"""
+        return (self.departure >= other.departure and
+                self.arrival <= other.arrival and
+                self.price <= other.price and
+                self.stops <= other.stops)
+
+
+def make_leg(schedule_id, flight_number, departure_airport_id, arrival_airport_id, date, time, flight_time, price):
+    """Создание сегмента по данным расписания (flight_time в минутах)"""
+    departure = datetime.datetime.combine(date, time)
+    arrival = departure + datetime.timedelta(minutes=flight_time)
+    return Leg(schedule_id, flight_number, departure_airport_id, arrival_airport_id, departure, arrival, price)
+
+
+class FlightGraph:
+    """Граф рейсов, развернутый во времени
+
+    Узлы графа - вылеты из аэропорта, упорядоченные по времени (ожидание
+    в аэропорту - переход к более позднему вылету), ребра - рейсы до
+    прилета в следующий аэропорт.
+    """
+
+    def __init__(self, legs, min_connection=datetime.timedelta(minutes=60),
+                 max_connection=datetime.timedelta(hours=24)):
+        self.min_connection = min_connection
+        self.max_connection = max_connection
+
+        # Вылеты из каждого аэропорта, отсортированные по времени
+        departures = defaultdict(list)
+        for leg in legs:
+            departures[leg.departure_airport_id].append(leg)
+
+        self._departures = {}
+        self._departure_times = {}
+        for airport_id, airport_legs in departures.items():
+            airport_legs.sort(key=lambda leg: leg.departure)
+            self._departures[airport_id] = airport_legs
+            self._departure_times[airport_id] = [leg.departure for leg in airport_legs]
+
+    def __len__(self):
+        return sum(len(legs) for legs in self._departures.values())
+
+    def departures_between(self, airport_id, earliest, latest=None):
+        """Вылеты из аэропорта в интервале [earliest, latest]"""
+        times = self._departure_times.get(airport_id)
+        if not times:
+            return []
+        start = bisect.bisect_left(times, earliest)
+        end = len(times) if latest is None else bisect.bisect_right(times, latest)
+        return self._departures[airport_id][start:end]
+
+    def find_itineraries(self, origin_id, destination_id, earliest_departure, latest_departure, max_stops=2):
+        """Парето-оптимальные маршруты (вылет, прилет, цена, пересадки)
+
+        Поиск выполняется раундами, как в RAPTOR: в раунде k маршруты
+        продлеваются на один сегмент, так что после max_stops + 1 раундов
+        найдены все маршруты не более чем с max_stops пересадками.
+        В каждом аэропорту хранятся только недоминируемые метки.
+        """
+        labels = defaultdict(list)
+        targets = labels[destination_id]
+        frontier = []
+
+        # Раунд 0: вылеты из аэропорта отправления
+        for leg in self.departures_between(origin_id, earliest_departure, latest_departure):
+            if leg.arrival_airport_id == origin_id:
+                continue
+            itinerary = Itinerary.from_legs((leg,))
+            if self._insert_label(labels[leg.arrival_airport_id], itinerary):
+                frontier.append(itinerary)
+
+        for _ in range(max_stops):
+            next_frontier = []
+            for itinerary in frontier:
+                last_leg = itinerary.legs[-1]
+                airport_id = last_leg.arrival_airport_id
+                if airport_id == destination_id:
+                    continue
+
+                visited = {origin_id}
+                visited.update(leg.arrival_airport_id for leg in itinerary.legs)
+
+                connections = self.departures_between(
+                    airport_id,
+                    last_leg.arrival + self.min_connection,
+                    last_leg.arrival + self.max_connection
+                )
+                for leg in connections:
+                    if leg.arrival_airport_id in visited:
+                        continue
+                    extended = itinerary.extend(leg)
+                    # Отсечение по цели: продолжение маршрута не улучшит ни
+                    # прилет, ни цену, ни число пересадок
+                    if leg.arrival_airport_id != destination_id and self._is_dominated(targets, extended):
+                        continue
+                    if self._insert_label(labels[leg.arrival_airport_id], extended):
+                        next_frontier.append(extended)
+
+            # Метки, вытесненные в этом же раунде, дальше не продлеваем
+            frontier = [itinerary for itinerary in next_frontier
+                        if any(label is itinerary for label in labels[itinerary.legs[-1].arrival_airport_id])]
+            if not frontier:
+                break
+
+        return sorted(labels[destination_id], key=lambda itinerary: (itinerary.departure, itinerary.arrival, itinerary.price))
+
+    @staticmethod
+    def _is_dominated(bucket, itinerary):
+        departure, arrival, price, stops = itinerary.departure, itinerary.arrival, itinerary.price, itinerary.stops
+        for existing in bucket:
+            if (existing.departure >= departure and existing.arrival <= arrival and
+                    existing.price <= price and existing.stops <= stops):
+                return True
+        return False
+
+    @classmethod
+    def _insert_label(cls, bucket, itinerary):
+        """Добавляет метку, если она не доминируется; удаляет доминируемые ею метки"""
+        if cls._is_dominated(bucket, itinerary):
+            return False
+        bucket[:] = [existing for existing in bucket if not itinerary.dominates(existing)]
+        bucket.append(itinerary)
+        return True
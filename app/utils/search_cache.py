@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+
+class SearchCache:
+    """LRU-кэш результатов поиска рейсов с ограниченным временем жизни
+
+    Ключ записи - (аэропорт вылета, аэропорт прилета, начало диапазона дат,
+    конец диапазона дат, расширенный поиск). Значения - строки без объектов
+    ORM: они не привязаны к сессии и общие для всех потоков.
+    Запись зависит от рейсов, вылетающих из аэропорта отправления или
+    прилетающих в аэропорт назначения в пределах диапазона дат, поэтому
+    изменение рейса инвалидирует только такие записи.
+    """
+
+    def __init__(self, max_entries=128, ttl=60.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(from_code, to_code, start_date, end_date, extended_search):
+        return (from_code, to_code, start_date, end_date, bool(extended_search))
+
+    def get(self, key):
+        """Возвращает результат из кэша или None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            if self._clock() - stored_at > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Сохраняет результат, вытесняя самые старые записи"""
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, from_code, to_code, date):
+        """Удаляет записи, на которые влияет рейс from_code -> to_code в дату date"""
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if key[2] <= date <= key[3] and (key[0] == from_code or key[1] == to_code)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        """Полная очистка кэша"""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        """Счетчики для мониторинга"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class FlightGraphCache(SearchCache):
+    """Кэш графов рейсов для поиска маршрутов с пересадками
+
+    Ключ - (начало и конец загруженного диапазона дат, класс обслуживания,
+    минимальное время стыковки, скомпилированные правила тарифов). Новый
+    набор правил после их изменения дает новый ключ, а ссылка на него
+    в ключе не позволяет повторно использовать id объекта. Изменение
+    любого рейса в дату из диапазона инвалидирует граф.
+    """
+
+    def __init__(self, max_entries=16, ttl=60.0, clock=time.monotonic):
+        super().__init__(max_entries=max_entries, ttl=ttl, clock=clock)
+
+    @staticmethod
+    def make_key(start_date, end_date, cabin_type, min_connection_minutes, compiled_rules):
+        return (start_date, end_date, cabin_type, min_connection_minutes, compiled_rules)
+
+    def invalidate(self, date):
+        """Удаляет графы, в диапазон которых попадает дата date"""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] <= date <= key[1]]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
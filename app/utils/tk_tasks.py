@@ -0,0 +1,146 @@
+import functools
+import logging
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.config.database import remove_session
+
+logger = logging.getLogger(__name__)
+
+# Общий пул потоков для фоновых задач всех окон
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tk-task")
+
+class TaskRunner:
+    """Выполнение вызовов контроллеров в фоновых потоках для окна Tk
+
+    Функция задачи выполняется в потоке пула со своей сессией (сессия
+    закрывается после задачи), поэтому она должна возвращать простые
+    данные, а не объекты ORM. Результаты передаются в главный поток через
+    очередь, которую окно опрашивает через after(); обработчики
+    on_success/on_error вызываются в главном потоке.
+
+    Если задан on_progress, функция получает аргумент progress: его
+    вызовы из фонового потока передаются в on_progress в главном потоке.
+
+    Задачи с одинаковым ключом вытесняют друг друга: результат
+    устаревшего запроса отбрасывается, а еще не начатый запрос не
+    выполняется. Пока есть незавершенные задачи, у окна курсор ожидания.
+    """
+
+    def __init__(self, widget, poll_interval=50, on_busy=None, executor=None):
+        self.widget = widget
+        self.poll_interval = poll_interval
+        self.on_busy = on_busy
+        self._executor = executor or _executor
+        self._results = queue.Queue()
+        self._progress = queue.Queue()
+        self._generations = {}
+        self._pending = 0
+        self._polling = False
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def submit(self, key, func, *args, on_success=None, on_error=None, on_progress=None):
+        """Запускает func(*args) в фоновом потоке, вытесняя прежний запрос с ключом key"""
+        generation = self._generations.get(key, 0) + 1
+        self._generations[key] = generation
+
+        if on_progress:
+            func = functools.partial(func, progress=self._reporter(key, generation, on_progress))
+
+        self._pending += 1
+        if self._pending == 1:
+            self._set_busy(True)
+
+        self._executor.submit(self._run, key, generation, func, args, on_success, on_error)
+        self._schedule_poll()
+        return generation
+
+    def cancel(self, key):
+        """Отменяет текущий запрос с ключом key (результат будет отброшен)"""
+        self._generations[key] = self._generations.get(key, 0) + 1
+
+    def _reporter(self, key, generation, on_progress):
+        """Функция для передачи хода выполнения из фонового потока в очередь"""
+        def report(*values):
+            self._progress.put((key, generation, values, on_progress))
+        return report
+
+    def _is_current(self, key, generation):
+        return self._generations.get(key) == generation
+
+    def _run(self, key, generation, func, args, on_success, on_error):
+        # Выполняется в потоке пула
+        started = time.perf_counter()
+        result, error = None, None
+        try:
+            if self._is_current(key, generation):
+                result = func(*args)
+        except Exception as e:
+            error = e
+        finally:
+            remove_session()
+        elapsed = time.perf_counter() - started
+        self._results.put((key, generation, result, error, elapsed, on_success, on_error))
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.poll_interval, self.poll)
+
+    def poll(self):
+        """Обрабатывает готовые результаты (вызывается в главном потоке)"""
+        self._polling = False
+        if not self._alive():
+            # Окно закрыто: результаты больше некуда выводить
+            return
+
+        # Ход выполнения поступает раньше результата той же задачи
+        while True:
+            try:
+                key, generation, values, on_progress = self._progress.get_nowait()
+            except queue.Empty:
+                break
+            if self._is_current(key, generation):
+                on_progress(*values)
+
+        while True:
+            try:
+                key, generation, result, error, elapsed, on_success, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            self._pending -= 1
+            current = self._is_current(key, generation)
+            logger.info("Task %s finished in %.1f ms%s", key, elapsed * 1000, "" if current else " (superseded)")
+            if not current:
+                continue
+
+            if error is not None:
+                logger.error("Task %s failed: %s", key, error, exc_info=error)
+                if on_error:
+                    on_error(error)
+            elif on_success:
+                on_success(result)
+
+        if self._pending:
+            self._schedule_poll()
+        else:
+            self._set_busy(False)
+
+    def _alive(self):
+        try:
+            return bool(self.widget.winfo_exists())
+        except Exception:
+            return False
+
+    def _set_busy(self, busy):
+        try:
+            self.widget.configure(cursor="watch" if busy else "")
+        except Exception:
+            # Окно уже закрыто
+            pass
+        if self.on_busy:
+            self.on_busy(busy)
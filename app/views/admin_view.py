@@ -2,6 +2,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 from app.controllers.user_controller import UserController
+from app.utils.tk_tasks import TaskRunner
 # Импортируем внутри методов, чтобы избежать циклических импортов
 
 class AdminView(tk.Toplevel):
@@ -17,6 +18,9 @@ class AdminView(tk.Toplevel):
         self.office_var = tk.StringVar(value="All offices")
         self.selected_user = None
 
+        # Запросы к базе выполняются в фоновых потоках
+        self.tasks = TaskRunner(self)
+
         self.title("AMONIC Airlines Automation System")
         self.geometry("800x600")
 
@@ -160,16 +164,52 @@ class AdminView(tk.Toplevel):
         self.enable_disable_button.pack(side=tk.LEFT, padx=5)
 
     def load_users(self):
-        """Загрузка пользователей в таблицу"""
-        # Очищаем таблицу
-        for item in self.users_tree.get_children():
-            self.users_tree.delete(item)
-
+        """Загрузка пользователей в таблицу (в фоновом потоке)"""
         # Получаем выбранный офис
         office_filter = self.office_var.get()
 
         # Загружаем пользователей с фильтрацией по офису
+        self.tasks.submit("users", self.fetch_user_rows, office_filter, on_success=self.show_users,
+                          on_error=lambda error: messagebox.showerror("Error", str(error)))
+
+    @staticmethod
+    def fetch_user_rows(office_filter):
+        """Строки таблицы пользователей (выполняется в фоновом потоке)"""
         users = UserController.get_all_users(office_filter)
+        return [AdminView.user_row(user) for user in users]
+
+    @staticmethod
+    def fetch_user_row(user_id):
+        """Строка таблицы для одного пользователя (выполняется в фоновом потоке)"""
+        user = UserController.get_user_by_id(user_id)
+        return AdminView.user_row(user) if user else None
+
+    @staticmethod
+    def user_row(user):
+        """Значения столбцов таблицы и признак активности пользователя"""
+        # Вычисляем возраст пользователя в годах
+        age = ""
+        if user.birthdate:
+            today = datetime.now().date()
+            born = user.birthdate.date() if isinstance(user.birthdate, datetime) else user.birthdate
+            age = today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+        return ((
+            user.id,
+            user.firstname,
+            user.lastname,
+            user.email,
+            user.office.title if user.office else "",
+            user.role.title if user.role else "",
+            age,
+            "Yes" if user.active else "No"
+        ), user.active)
+
+    def show_users(self, rows):
+        """Вывод загруженных пользователей в таблицу"""
+        # Очищаем таблицу
+        for item in self.users_tree.get_children():
+            self.users_tree.delete(item)
 
         # Создаем теги для отключенных пользователей
         # Вариант 1: только текст красным
@@ -178,29 +218,14 @@ class AdminView(tk.Toplevel):
         self.users_tree.tag_configure('inactive_bg', background='#ffcccc')
 
         # Добавляем пользователей в таблицу
-        for user in users:
-            # Вычисляем возраст пользователя в годах
-            age = ""
-            if user.birthdate:
-                today = datetime.now().date()
-                born = user.birthdate.date() if isinstance(user.birthdate, datetime) else user.birthdate
-                age = today.year - born.year - ((today.month, today.day) < (born.month, born.day))
-
+        for values, active in rows:
             # Определяем тег для строки (красный для неактивных пользователей)
             # Используем вариант с красным фоном для лучшей видимости
-            tags = ('inactive_bg',) if not user.active else ()
-
-            # Добавляем строку в таблицу с соответствующим тегом
-            self.users_tree.insert("", tk.END, values=(
-                user.id,
-                user.firstname,
-                user.lastname,
-                user.email,
-                user.office.title if user.office else "",
-                user.role.title if user.role else "",
-                age,
-                "Yes" if user.active else "No"
-            ), tags=tags)
+            tags = ('inactive_bg',) if not active else ()
+
+            # Добавляем строку в таблицу с соответствующим тегом; ID
+            # пользователя - идентификатор строки для точечного обновления
+            self.users_tree.insert("", tk.END, values=values, tags=tags, iid=str(values[0]))
 
         # Сбрасываем выбранного пользователя
         self.selected_user = None
@@ -266,11 +291,12 @@ class AdminView(tk.Toplevel):
         from app.views.change_role_window import ChangeRoleWindow
 
         # Открываем окно изменения роли
-        change_role_window = ChangeRoleWindow(self, self.selected_user)
+        user_id = self.selected_user
+        change_role_window = ChangeRoleWindow(self, user_id)
 
-        # После закрытия окна обновляем список пользователей
+        # После закрытия окна обновляем строку пользователя
         self.wait_window(change_role_window)
-        self.load_users()
+        self.refresh_user(user_id)
 
     def toggle_active(self):
         """Включение/отключение учетной записи пользователя"""
@@ -289,11 +315,29 @@ class AdminView(tk.Toplevel):
 
         if success:
             messagebox.showinfo("Success", message)
-            # Обновляем список пользователей
-            self.load_users()
+            # Обновляем только строку измененного пользователя
+            self.refresh_user(self.selected_user)
         else:
             messagebox.showerror("Error", message)
 
+    def refresh_user(self, user_id):
+        """Обновление одной строки таблицы после изменения пользователя (в фоновом потоке)"""
+        self.tasks.submit(f"user_{user_id}", self.fetch_user_row, user_id,
+                          on_success=lambda row: self.patch_user(str(user_id), row),
+                          on_error=lambda error: messagebox.showerror("Error", str(error)))
+
+    def patch_user(self, iid, row):
+        """Замена значений строки пользователя; строка удаляется, если его больше нет"""
+        if not self.users_tree.exists(iid):
+            return
+        if row is None:
+            self.users_tree.delete(iid)
+            return
+        values, active = row
+        self.users_tree.item(iid, values=values, tags=('inactive_bg',) if not active else ())
+        # Кнопки зависят от роли выбранного пользователя
+        self.on_user_select(None)
+
     def open_schedule_management(self):
         """Открытие окна управления расписаниями"""
         # Импортируем здесь, чтобы избежать циклических импортов
@@ -181,35 +181,31 @@ class BookingConfirmationView(tk.Toplevel):
     def load_data(self):
         """Загрузка данных"""
         # Загружаем информацию о рейсе туда
-        if isinstance(self.outbound_flight, str) and self.outbound_flight.startswith("direct_"):
-            # Прямой рейс
-            flight_id = int(self.outbound_flight.split("_")[1])
-            flight = FlightController.get_flight_by_id(flight_id)
-            
-            if flight:
-                self.outbound_from_label.config(text=flight.route.departure_airport.iata_code)
-                self.outbound_to_label.config(text=flight.route.arrival_airport.iata_code)
-                self.outbound_cabin_label.config(text=self.cabin_type)
-                self.outbound_date_label.config(text=flight.date.strftime("%d/%m/%Y"))
-                self.outbound_flight_number_label.config(text=flight.flight_number)
-        
+        self.show_trip(self.outbound_flight, self.outbound_from_label, self.outbound_to_label,
+                       self.outbound_cabin_label, self.outbound_date_label, self.outbound_flight_number_label)
+
         # Загружаем информацию о рейсе обратно (если есть)
-        if self.return_flight and isinstance(self.return_flight, str) and self.return_flight.startswith("direct_"):
-            # Прямой рейс
-            flight_id = int(self.return_flight.split("_")[1])
-            flight = FlightController.get_flight_by_id(flight_id)
-            
-            if flight:
-                self.return_from_label.config(text=flight.route.departure_airport.iata_code)
-                self.return_to_label.config(text=flight.route.arrival_airport.iata_code)
-                self.return_cabin_label.config(text=self.cabin_type)
-                self.return_date_label.config(text=flight.date.strftime("%d/%m/%Y"))
-                self.return_flight_number_label.config(text=flight.flight_number)
-        
+        if self.return_flight:
+            self.show_trip(self.return_flight, self.return_from_label, self.return_to_label,
+                           self.return_cabin_label, self.return_date_label, self.return_flight_number_label)
+
         # Загружаем список стран для выпадающего списка
         countries = FlightController.get_all_countries()
         self.passport_country_combo['values'] = [country.name for country in countries]
     
+    def show_trip(self, selection, from_label, to_label, cabin_label, date_label, flight_number_label):
+        """Вывод информации о прямом рейсе или рейсе с пересадкой"""
+        flights = [FlightController.get_flight_by_id(flight_id)
+                   for flight_id in FlightController.parse_flight_selection(selection)]
+        if not flights or not all(flights):
+            return
+
+        from_label.config(text=flights[0].route.departure_airport.iata_code)
+        to_label.config(text=flights[-1].route.arrival_airport.iata_code)
+        cabin_label.config(text=self.cabin_type)
+        date_label.config(text=flights[0].date.strftime("%d/%m/%Y"))
+        flight_number_label.config(text=" - ".join(flight.flight_number for flight in flights))
+
     def add_passenger(self):
         """Добавление пассажира в список"""
         # Проверяем, что все обязательные поля заполнены
@@ -350,26 +346,15 @@ class BookingConfirmationView(tk.Toplevel):
                 'email': ''  # Можно добавить поле для email в форму
             })
         
-        # Бронируем рейс туда
-        if isinstance(self.outbound_flight, str) and self.outbound_flight.startswith("direct_"):
-            # Прямой рейс
-            flight_id = int(self.outbound_flight.split("_")[1])
-            success, message = FlightController.book_flight(flight_id, self.cabin_type, passengers_data, user_id)
-            
-            if not success:
-                messagebox.showerror("Error", message)
-                return
-        
-        # Бронируем рейс обратно (если есть)
-        if self.return_flight and isinstance(self.return_flight, str) and self.return_flight.startswith("direct_"):
-            # Прямой рейс
-            flight_id = int(self.return_flight.split("_")[1])
-            success, message = FlightController.book_flight(flight_id, self.cabin_type, passengers_data, user_id)
-            
-            if not success:
-                messagebox.showerror("Error", message)
-                return
-        
+        # Бронируем все сегменты поездки (туда и обратно) одной транзакцией
+        flight_ids = FlightController.parse_flight_selection(self.outbound_flight)
+        flight_ids += FlightController.parse_flight_selection(self.return_flight)
+        success, message = FlightController.book_itinerary(flight_ids, self.cabin_type, passengers_data, user_id)
+
+        if not success:
+            messagebox.showerror("Error", message)
+            return
+
         # Показываем сообщение об успешном бронировании
         messagebox.showinfo("Success", "Booking confirmed successfully!")
         
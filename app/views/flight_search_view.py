@@ -2,6 +2,8 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import datetime
 from app.controllers.flight_controller import FlightController
+from app.controllers.search_orchestrator import SearchLeg, search_orchestrator
+from app.utils.tk_tasks import TaskRunner
 
 class FlightSearchView(tk.Toplevel):
     """Окно поиска рейсов"""
@@ -15,6 +17,9 @@ class FlightSearchView(tk.Toplevel):
         self.geometry("800x600")
         self.resizable(True, True)
 
+        # Запросы к базе выполняются в фоновых потоках
+        self.tasks = TaskRunner(self)
+
         # Инициализация переменных
         self.selected_outbound_flight = None
         self.selected_return_flight = None
@@ -92,8 +97,11 @@ class FlightSearchView(tk.Toplevel):
                         variable=self.outbound_extended_search_var,
                         command=self.search_flights).pack(anchor=tk.W, padx=5, pady=5)
 
+        # Календарь минимальных цен (показывается при поиске +/- 3 дня)
+        self.outbound_calendar_frame = ttk.Frame(self.outbound_frame)
+
         # Таблица рейсов вылета
-        columns = ("From", "To", "Date", "Time", "Flight Number(s)", "Cabin Price", "Number of stops")
+        columns = ("From", "To", "Date", "Time", "Flight Number(s)", "Cabin Price", "Number of stops", "Seats left")
         self.outbound_tree = ttk.Treeview(self.outbound_frame, columns=columns, show='headings', height=6)
 
         # Настройка столбцов
@@ -103,7 +111,7 @@ class FlightSearchView(tk.Toplevel):
                 self.outbound_tree.column(col, width=150)
             elif col == "Cabin Price":
                 self.outbound_tree.column(col, width=100, anchor=tk.CENTER)
-            elif col == "Number of stops":
+            elif col in ("Number of stops", "Seats left"):
                 self.outbound_tree.column(col, width=100, anchor=tk.CENTER)
             else:
                 self.outbound_tree.column(col, width=100)
@@ -128,6 +136,9 @@ class FlightSearchView(tk.Toplevel):
                         variable=self.return_extended_search_var,
                         command=self.search_flights).pack(anchor=tk.W, padx=5, pady=5)
 
+        # Календарь минимальных цен (показывается при поиске +/- 3 дня)
+        self.return_calendar_frame = ttk.Frame(self.return_frame)
+
         # Таблица рейсов возвращения
         self.return_tree = ttk.Treeview(self.return_frame, columns=columns, show='headings', height=6)
 
@@ -138,7 +149,7 @@ class FlightSearchView(tk.Toplevel):
                 self.return_tree.column(col, width=150)
             elif col == "Cabin Price":
                 self.return_tree.column(col, width=100, anchor=tk.CENTER)
-            elif col == "Number of stops":
+            elif col in ("Number of stops", "Seats left"):
                 self.return_tree.column(col, width=100, anchor=tk.CENTER)
             else:
                 self.return_tree.column(col, width=100)
@@ -193,14 +204,6 @@ class FlightSearchView(tk.Toplevel):
 
     def search_flights(self):
         """Поиск рейсов по заданным параметрам"""
-        # Очищаем предыдущие результаты
-        for item in self.outbound_tree.get_children():
-            self.outbound_tree.delete(item)
-
-        if hasattr(self, 'return_tree'):
-            for item in self.return_tree.get_children():
-                self.return_tree.delete(item)
-
         # Получаем параметры поиска
         from_airport_code = self.from_var.get()
         to_airport_code = self.to_var.get()
@@ -225,125 +228,106 @@ class FlightSearchView(tk.Toplevel):
             messagebox.showerror("Invalid Input", "Please enter outbound date in format DD/MM/YYYY")
             return
 
-        # Ищем рейсы вылета
-        self.search_outbound_flights(from_airport_code, to_airport_code, outbound_date, cabin_type)
+        legs = [SearchLeg(from_airport_code, to_airport_code, outbound_date, cabin_type,
+                          self.outbound_extended_search_var.get())]
 
-        # Если это поездка туда-обратно, ищем рейсы возвращения
+        # Если это поездка туда-обратно, ищем и рейсы возвращения
         if trip_type == "return":
             try:
                 return_date_str = self.return_date_var.get()
                 day, month, year = map(int, return_date_str.split('/'))
                 return_date = datetime.date(year, month, day)
-
-                if return_date < outbound_date:
-                    messagebox.showerror("Invalid Input", "Return date cannot be before outbound date")
-                    return
-
-                # Показываем фрейм рейсов возвращения
-                self.return_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
-
-                # Ищем рейсы возвращения
-                self.search_return_flights(to_airport_code, from_airport_code, return_date, cabin_type)
             except:
                 messagebox.showerror("Invalid Input", "Please enter return date in format DD/MM/YYYY")
                 return
-        else:
-            # Скрываем фрейм рейсов возвращения для поездок в одну сторону
-            self.return_frame.pack_forget()
 
-    def search_outbound_flights(self, from_airport_code, to_airport_code, date, cabin_type):
-        """Поиск рейсов вылета"""
-        # Ищем рейсы через контроллер
-        flights = FlightController.search_flights(
-            from_airport_code,
-            to_airport_code,
-            date,
-            self.outbound_extended_search_var.get()
-        )
+            if return_date < outbound_date:
+                messagebox.showerror("Invalid Input", "Return date cannot be before outbound date")
+                return
 
-        # Добавляем прямые рейсы в таблицу
-        for flight in flights['direct']:
-            price = flight.get_price_by_cabin_type(cabin_type)
+            legs.append(SearchLeg(to_airport_code, from_airport_code, return_date, cabin_type,
+                                  self.return_extended_search_var.get()))
 
-            values = (
-                from_airport_code,
-                to_airport_code,
-                flight.date.strftime("%d/%m/%Y"),
-                flight.time.strftime("%H:%M"),
-                flight.flight_number,
-                f"${int(price)}",
-                "0"  # Прямой рейс имеет 0 пересадок
-            )
+        # Направления ищутся параллельно в фоновом потоке: время поиска
+        # туда-обратно определяется более медленным направлением, а окно
+        # не блокируется
+        self.tasks.submit("search", search_orchestrator.search, *legs,
+                          on_success=lambda results: self.show_search_results(legs, results),
+                          on_error=lambda error: messagebox.showerror("Error", str(error)))
 
-            # Вставляем в таблицу с ID рейса в качестве идентификатора
-            self.outbound_tree.insert('', tk.END, values=values, iid=f"direct_{flight.id}")
+    def show_search_results(self, legs, results):
+        """Вывод результатов поиска по всем направлениям"""
+        # Очищаем предыдущие результаты
+        for tree in (self.outbound_tree, self.return_tree):
+            for item in tree.get_children():
+                tree.delete(item)
+
+        # Рейсы вылета
+        self.show_search_result(self.outbound_tree, self.outbound_calendar_frame, self.outbound_date_var,
+                                legs[0], results[0])
+
+        if len(legs) > 1:
+            # Показываем фрейм рейсов возвращения
+            self.return_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+            self.show_search_result(self.return_tree, self.return_calendar_frame, self.return_date_var,
+                                    legs[1], results[1])
+        else:
+            # Скрываем фрейм рейсов возвращения для поездок в одну сторону
+            self.return_frame.pack_forget()
 
-        # Добавляем рейсы с пересадкой в таблицу
-        for i, (first_leg, second_leg) in enumerate(flights['connecting']):
-            # Рассчитываем общую цену
-            first_leg_price = first_leg.get_price_by_cabin_type(cabin_type)
-            second_leg_price = second_leg.get_price_by_cabin_type(cabin_type)
-            total_price = first_leg_price + second_leg_price
+    def show_search_result(self, tree, calendar_frame, date_var, leg, result):
+        """Вывод результатов поиска одного направления"""
+        # При поиске +/- 3 дня сначала показываем календарь цен,
+        # а полные результаты загружаются только за выбранный день
+        self.update_fare_calendar(calendar_frame, tree, result["calendar"], date_var, leg.date, leg.cabin_type)
+        self.fill_flights_tree(tree, result["rows"])
 
-            values = (
-                from_airport_code,
-                to_airport_code,
-                first_leg.date.strftime("%d/%m/%Y"),
-                first_leg.time.strftime("%H:%M"),
-                f"{first_leg.flight_number} - {second_leg.flight_number}",
-                f"${int(total_price)}",
-                "1"  # Одна пересадка
-            )
+    def update_fare_calendar(self, frame, tree, calendar, date_var, date, cabin_type):
+        """Полоса календаря с минимальной ценой на каждый день (date +/- 3 дня)"""
+        for child in frame.winfo_children():
+            child.destroy()
 
-            # Вставляем в таблицу с уникальным ID
-            self.outbound_tree.insert('', tk.END, values=values, iid=f"connecting_{i}_{first_leg.id}_{second_leg.id}")
-
-    def search_return_flights(self, from_airport_code, to_airport_code, date, cabin_type):
-        """Поиск рейсов возвращения"""
-        # Аналогично search_outbound_flights, но для рейсов возвращения
-        flights = FlightController.search_flights(
-            from_airport_code,
-            to_airport_code,
-            date,
-            self.return_extended_search_var.get()
-        )
+        if calendar is None:
+            frame.pack_forget()
+            return
 
-        # Добавляем прямые рейсы в таблицу
-        for flight in flights['direct']:
-            price = flight.get_price_by_cabin_type(cabin_type)
+        for offset in range(-3, 4):
+            day = date + datetime.timedelta(days=offset)
 
-            values = (
-                from_airport_code,
-                to_airport_code,
-                flight.date.strftime("%d/%m/%Y"),
-                flight.time.strftime("%H:%M"),
-                flight.flight_number,
-                f"${int(price)}",
-                "0"  # Прямой рейс имеет 0 пересадок
-            )
+            # Минимум среди прямых рейсов и рейсов с пересадкой
+            fares = calendar.get(day, {})
+            prices = [kind[cabin_type] for kind in fares.values() if kind.get(cabin_type) is not None]
+            price_text = f"${int(min(prices))}" if prices else "-"
 
-            # Вставляем в таблицу с ID рейса в качестве идентификатора
-            self.return_tree.insert('', tk.END, values=values, iid=f"direct_{flight.id}")
+            button = ttk.Button(frame, text=f"{day.strftime('%a %d/%m')}\n{price_text}", width=10,
+                                command=lambda day=day: self.select_calendar_day(date_var, day))
+            if day == date:
+                button.state(['disabled'])
+            button.pack(side=tk.LEFT, padx=2, pady=2)
 
-        # Добавляем рейсы с пересадкой в таблицу
-        for i, (first_leg, second_leg) in enumerate(flights['connecting']):
-            # Рассчитываем общую цену
-            first_leg_price = first_leg.get_price_by_cabin_type(cabin_type)
-            second_leg_price = second_leg.get_price_by_cabin_type(cabin_type)
-            total_price = first_leg_price + second_leg_price
+        frame.pack(fill=tk.X, padx=5, before=tree)
 
+    def select_calendar_day(self, date_var, day):
+        """Выбор дня в календаре цен"""
+        date_var.set(day.strftime("%d/%m/%Y"))
+        self.search_flights()
+
+    def fill_flights_tree(self, tree, rows):
+        """Заполнение таблицы найденными рейсами"""
+        for row in rows:
             values = (
-                from_airport_code,
-                to_airport_code,
-                first_leg.date.strftime("%d/%m/%Y"),
-                first_leg.time.strftime("%H:%M"),
-                f"{first_leg.flight_number} - {second_leg.flight_number}",
-                f"${int(total_price)}",
-                "1"  # Одна пересадка
+                row.from_code,
+                row.to_code,
+                row.date.strftime("%d/%m/%Y"),
+                row.time.strftime("%H:%M"),
+                row.flight_numbers,
+                f"${int(row.price)}",
+                str(row.stops),
+                row.seats_left
             )
 
-            # Вставляем в таблицу с уникальным ID
-            self.return_tree.insert('', tk.END, values=values, iid=f"connecting_{i}_{first_leg.id}_{second_leg.id}")
+            # Вставляем в таблицу с ID рейса (рейсов) в качестве идентификатора
+            tree.insert('', tk.END, values=values, iid=row.iid)
 
     def on_outbound_select(self, event):
         """Обработка выбора рейса вылета"""
@@ -405,23 +389,17 @@ class FlightSearchView(tk.Toplevel):
         """Проверка наличия свободных мест"""
         cabin_type = self.cabin_type_var.get()
 
-        # Проверяем рейс вылета
-        if self.selected_outbound_flight.startswith("direct_"):
-            # Прямой рейс
-            flight_id = int(self.selected_outbound_flight.split("_")[1])
-            if not FlightController.check_seat_availability(flight_id, cabin_type, self.passengers_count):
-                return False
-
-        # Для рейсов с пересадкой нужно проверить оба сегмента
-        # Это упрощенная версия
+        # Проверяем все сегменты рейса вылета (включая пересадки)
+        flight_ids = FlightController.parse_flight_selection(self.selected_outbound_flight)
 
         # Проверяем рейс возвращения, если применимо
         if self.trip_type_var.get() == "return" and self.selected_return_flight:
-            if self.selected_return_flight.startswith("direct_"):
-                # Прямой рейс
-                flight_id = int(self.selected_return_flight.split("_")[1])
-                if not FlightController.check_seat_availability(flight_id, cabin_type, self.passengers_count):
-                    return False
+            flight_ids += FlightController.parse_flight_selection(self.selected_return_flight)
+
+        remaining = FlightController.get_remaining_seats(flight_ids, cabin_type)
+        for flight_id in flight_ids:
+            if remaining.get(flight_id, 0) < self.passengers_count:
+                return False
 
         return True
 
@@ -1,7 +1,123 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import datetime
+import functools
+from collections import deque
 from app.controllers.flight_controller import FlightController
+from app.utils.tk_tasks import TaskRunner
+
+class VirtualTreeview:
+    """Прокрутка таблицы с загрузкой строк страницами по мере необходимости
+
+    В таблице хранится не больше max_pages страниц: при прокрутке к концу
+    загружается следующая страница и удаляется первая, при прокрутке
+    к началу - наоборот. Страница запрашивается функцией
+    fetch_page(page_size, after_key, before_key) в фоновом потоке и
+    состоит из строк (iid, values, tags, key), где key - ключ строки
+    для постраничной выборки.
+    """
+
+    def __init__(self, tree, scrollbar, tasks, page_size=200, max_pages=5, threshold=0.1, on_error=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.tasks = tasks
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.threshold = threshold
+        self.on_error = on_error
+
+        self.fetch_page = None
+        # Загруженные страницы: (ключ первой строки, ключ последней строки, iid строк)
+        self.pages = deque()
+        self.more_before = False
+        self.more_after = False
+        self.loading = False
+
+        self.tree.configure(yscrollcommand=self.on_scroll)
+
+    def reset(self, fetch_page):
+        """Загрузка первой страницы новой выборки (например, после смены фильтров)"""
+        self.fetch_page = fetch_page
+        self._load(None, None, reset=True)
+
+    def on_scroll(self, first, last):
+        """Обработчик прокрутки: догружает страницу у края загруженных строк"""
+        self.scrollbar.set(first, last)
+        if self.loading or not self.pages:
+            return
+
+        if float(last) >= 1 - self.threshold and self.more_after:
+            self._load(self.pages[-1][1], None)
+        elif float(first) <= self.threshold and self.more_before:
+            self._load(None, self.pages[0][0])
+
+    def _load(self, after_key, before_key, reset=False):
+        self.loading = True
+        self.tasks.submit("page", self.fetch_page, self.page_size, after_key, before_key,
+                          on_success=lambda rows: self._show_page(rows, before_key is not None, reset),
+                          on_error=self._failed)
+
+    def _failed(self, error):
+        self.loading = False
+        if self.on_error:
+            self.on_error(error)
+
+    def _show_page(self, rows, backward, reset):
+        self.loading = False
+        if reset:
+            self.tree.delete(*self.tree.get_children())
+            self.pages.clear()
+            self.more_before = False
+            self.more_after = False
+
+        # Неполная страница - край выборки
+        if backward:
+            self.more_before = len(rows) == self.page_size
+        else:
+            self.more_after = len(rows) == self.page_size
+        if not rows:
+            return
+
+        anchor = None if reset else self._top_item()
+
+        # Строка могла переместиться между страницами после изменения данных
+        new_rows = [row for row in rows if not self.tree.exists(row[0])]
+        for index, (iid, values, tags, key) in enumerate(new_rows):
+            self.tree.insert('', index if backward else tk.END, iid=iid, values=values, tags=tags)
+        page = (rows[0][3], rows[-1][3], [row[0] for row in new_rows])
+
+        if backward:
+            self.pages.appendleft(page)
+        else:
+            self.pages.append(page)
+
+        # Удаляем страницу с противоположного края
+        if len(self.pages) > self.max_pages:
+            if backward:
+                dropped = self.pages.pop()
+                self.more_after = True
+            else:
+                dropped = self.pages.popleft()
+                self.more_before = True
+            self.tree.delete(*dropped[2])
+
+        if anchor is not None:
+            self._scroll_to(anchor)
+
+    def _top_item(self):
+        """Первая видимая строка таблицы"""
+        children = self.tree.get_children()
+        if not children:
+            return None
+        first, _ = self.tree.yview()
+        return children[min(len(children) - 1, round(first * len(children)))]
+
+    def _scroll_to(self, item):
+        """Прокрутка, при которой item снова первая видимая строка"""
+        if not self.tree.exists(item):
+            return
+        self.tree.yview_moveto(self.tree.index(item) / len(self.tree.get_children()))
+
 
 class ScheduleManagementView(tk.Toplevel):
     """Окно управления расписанием рейсов"""
@@ -16,6 +132,10 @@ class ScheduleManagementView(tk.Toplevel):
 
         # Инициализация переменных
         self.selected_schedule = None
+        self.selected_schedules = []
+
+        # Запросы к базе выполняются в фоновых потоках
+        self.tasks = TaskRunner(self)
 
         # Создаем интерфейс
         self.create_widgets()
@@ -43,7 +163,7 @@ class ScheduleManagementView(tk.Toplevel):
         ttk.Label(airport_frame, text="Sort by").grid(row=0, column=4, padx=5, pady=5)
         self.sort_by_var = tk.StringVar(value="Date-Time")
         self.sort_by_combo = ttk.Combobox(airport_frame, textvariable=self.sort_by_var, width=15)
-        self.sort_by_combo['values'] = ["Date-Time", "Economy Price", "Confirmation Status"]
+        self.sort_by_combo['values'] = ["Date-Time", "Economy Price", "Business Price", "First Class Price", "Confirmation Status"]
         self.sort_by_combo.grid(row=0, column=5, padx=5, pady=5)
 
         # Фильтры по дате и номеру рейса
@@ -72,8 +192,19 @@ class ScheduleManagementView(tk.Toplevel):
 
         ttk.Button(button_frame, text="Cancel Flight", command=self.toggle_flight_status).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Edit Flight", command=self.edit_flight).pack(side=tk.LEFT, padx=5)
+
+        # Массовые операции над выделенными рейсами (Ctrl/Shift + щелчок)
+        ttk.Button(button_frame, text="Cancel Selected",
+                   command=lambda: self.set_selected_status(False)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Confirm Selected",
+                   command=lambda: self.set_selected_status(True)).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="Reprice Selected", command=self.reprice_selected).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Import Changes", command=self.import_changes).pack(side=tk.RIGHT, padx=5)
 
+        # Ход импорта изменений
+        self.import_status_var = tk.StringVar()
+        ttk.Label(button_frame, textvariable=self.import_status_var).pack(side=tk.RIGHT, padx=5)
+
     def create_schedule_table(self):
         # Фрейм для таблицы
         table_frame = ttk.Frame(self)
@@ -81,7 +212,7 @@ class ScheduleManagementView(tk.Toplevel):
 
         # Создаем таблицу
         columns = ("Date", "Time", "From", "To", "Flight number", "Aircraft", "Economy price", "Business price", "First class price")
-        self.schedule_tree = ttk.Treeview(table_frame, columns=columns, show='headings')
+        self.schedule_tree = ttk.Treeview(table_frame, columns=columns, show='headings', selectmode='extended')
 
         # Настройка столбцов
         for col in columns:
@@ -91,7 +222,14 @@ class ScheduleManagementView(tk.Toplevel):
         # Добавляем скроллбары
         vsb = ttk.Scrollbar(table_frame, orient="vertical", command=self.schedule_tree.yview)
         hsb = ttk.Scrollbar(table_frame, orient="horizontal", command=self.schedule_tree.xview)
-        self.schedule_tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        self.schedule_tree.configure(xscrollcommand=hsb.set)
+
+        # Строки загружаются страницами по мере прокрутки
+        self.schedule_pages = VirtualTreeview(self.schedule_tree, vsb, self.tasks,
+                                              on_error=lambda error: messagebox.showerror("Error", str(error)))
+
+        # Настраиваем тег для отмененных рейсов
+        self.schedule_tree.tag_configure('cancelled', background='#ffcccc')
 
         # Размещаем элементы
         self.schedule_tree.grid(row=0, column=0, sticky='nsew')
@@ -110,60 +248,53 @@ class ScheduleManagementView(tk.Toplevel):
         # Загружаем аэропорты
         airports = FlightController.get_all_airports()
 
-        # Добавляем аэропорты в комбо-боксы
-        self.from_combo['values'] = [airport.iata_code for airport in airports]
-        self.to_combo['values'] = [airport.iata_code for airport in airports]
+        # Добавляем аэропорты в комбо-боксы; ID по коду сохраняем для фильтров
+        self.airport_ids = {airport.iata_code: airport.id for airport in airports}
+        self.from_combo['values'] = list(self.airport_ids)
+        self.to_combo['values'] = list(self.airport_ids)
 
         # Загружаем расписания
         self.load_schedules()
 
     def load_schedules(self, from_airport=None, to_airport=None, date=None, flight_number=None, sort_by="date_time"):
-        """Загрузка расписаний с применением фильтров"""
-        # Очищаем таблицу
-        for item in self.schedule_tree.get_children():
-            self.schedule_tree.delete(item)
-
-        # Получаем расписания
-        schedules = FlightController.get_filtered_schedules(from_airport, to_airport, date, flight_number, sort_by)
-
-        # Заполняем таблицу
-        for schedule in schedules:
-            # Получаем данные о маршруте и самолете
-            from_code = schedule.route.departure_airport.iata_code
-            to_code = schedule.route.arrival_airport.iata_code
-            aircraft_name = schedule.aircraft.name
-
-            # Форматируем дату и время
-            date_str = schedule.date.strftime("%d/%m/%Y")
-            time_str = schedule.time.strftime("%H:%M")
-
-            # Рассчитываем цены для разных классов
-            economy_price = schedule.economy_price
-            business_price = schedule.business_price
-            first_class_price = schedule.first_class_price
-
-            # Добавляем строку в таблицу
-            values = (
-                date_str,
-                time_str,
-                from_code,
-                to_code,
-                schedule.flight_number,
-                aircraft_name,
-                f"${int(economy_price)}",
-                f"${int(business_price)}",
-                f"${int(first_class_price)}"
-            )
-
-            # Вставляем в таблицу с ID расписания в качестве идентификатора
-            item_id = self.schedule_tree.insert('', tk.END, values=values, iid=str(schedule.id))
-
-            # Если рейс отменен, выделяем его красным цветом
-            if not schedule.confirmed:
-                self.schedule_tree.item(item_id, tags=('cancelled',))
+        """Загрузка расписаний с применением фильтров (страницами, в фоновом потоке)"""
+        self.schedule_pages.reset(functools.partial(self.fetch_schedule_rows, from_airport, to_airport, date,
+                                                    flight_number, sort_by))
+
+    @staticmethod
+    def fetch_schedule_rows(from_airport, to_airport, date, flight_number, sort_by, page_size, after_key=None,
+                            before_key=None):
+        """Страница строк таблицы расписаний (выполняется в фоновом потоке)"""
+        # Получаем строки расписаний одним запросом (без объектов ORM)
+        schedules = FlightController.get_schedule_rows(from_airport, to_airport, date, flight_number, sort_by,
+                                                       page_size=page_size, after_key=after_key,
+                                                       before_key=before_key)
+
+        return [
+            (str(schedule.id), ScheduleManagementView.schedule_values(schedule),
+             ScheduleManagementView.schedule_tags(schedule), FlightController.schedule_page_key(schedule, sort_by))
+            for schedule in schedules
+        ]
+
+    @staticmethod
+    def schedule_values(schedule):
+        """Значения столбцов таблицы для строки ScheduleRow"""
+        return (
+            schedule.date.strftime("%d/%m/%Y"),
+            schedule.time.strftime("%H:%M"),
+            schedule.from_code,
+            schedule.to_code,
+            schedule.flight_number,
+            schedule.aircraft_name,
+            f"${int(schedule.economy_price)}",
+            f"${int(schedule.business_price)}",
+            f"${int(schedule.first_class_price)}"
+        )
 
-        # Настраиваем тег для отмененных рейсов
-        self.schedule_tree.tag_configure('cancelled', background='#ffcccc')
+    @staticmethod
+    def schedule_tags(schedule):
+        """Теги строки: отмененные рейсы выделяются красным цветом"""
+        return () if schedule.confirmed else ('cancelled',)
 
     def apply_filters(self):
         """Применение фильтров к списку расписаний"""
@@ -178,20 +309,16 @@ class ScheduleManagementView(tk.Toplevel):
         sort_by = "date_time"  # По умолчанию
         if sort_by_text == "Economy Price":
             sort_by = "economy_price"
+        elif sort_by_text == "Business Price":
+            sort_by = "business_price"
+        elif sort_by_text == "First Class Price":
+            sort_by = "first_class_price"
         elif sort_by_text == "Confirmation Status":
             sort_by = "confirmed"
 
-        # Получаем объекты аэропортов
-        from_airport = None
-        to_airport = None
-
-        if from_code:
-            airports = FlightController.get_all_airports()
-            from_airport = next((a for a in airports if a.iata_code == from_code), None)
-
-        if to_code:
-            airports = FlightController.get_all_airports()
-            to_airport = next((a for a in airports if a.iata_code == to_code), None)
+        # Получаем ID аэропортов (загружены вместе со списком кодов)
+        from_airport = self.airport_ids.get(from_code)
+        to_airport = self.airport_ids.get(to_code)
 
         # Парсим дату, если указана
         date = None
@@ -209,6 +336,7 @@ class ScheduleManagementView(tk.Toplevel):
     def on_schedule_select(self, event):
         """Обработка выбора расписания в таблице"""
         selected_items = self.schedule_tree.selection()
+        self.selected_schedules = [int(item) for item in selected_items]  # ID расписаний
         if selected_items:
             self.selected_schedule = selected_items[0]  # ID расписания
 
@@ -226,11 +354,77 @@ class ScheduleManagementView(tk.Toplevel):
 
         if success:
             messagebox.showinfo("Success", message)
-            # Обновляем список расписаний
-            self.apply_filters()
+            # Обновляем только строку измененного рейса
+            self.refresh_schedule(schedule_id)
         else:
             messagebox.showerror("Error", message)
 
+    def refresh_schedule(self, schedule_id):
+        """Обновление одной строки таблицы после изменения рейса (в фоновом потоке)"""
+        self.tasks.submit(f"schedule_{schedule_id}", self.fetch_schedule_row, schedule_id,
+                          on_success=lambda row: self.patch_schedule(str(schedule_id), row),
+                          on_error=lambda error: messagebox.showerror("Error", str(error)))
+
+    @staticmethod
+    def fetch_schedule_row(schedule_id):
+        """Значения и теги строки рейса (выполняется в фоновом потоке)"""
+        schedule = FlightController.get_schedule_row(schedule_id)
+        if schedule is None:
+            return None
+        return ScheduleManagementView.schedule_values(schedule), ScheduleManagementView.schedule_tags(schedule)
+
+    def patch_schedule(self, iid, row):
+        """Замена значений строки рейса; строка удаляется, если рейса больше нет"""
+        if not self.schedule_tree.exists(iid):
+            # Строка не загружена (страница за пределами прокрутки)
+            return
+        if row is None:
+            self.schedule_tree.delete(iid)
+            return
+        values, tags = row
+        self.schedule_tree.item(iid, values=values, tags=tags)
+
+    def set_selected_status(self, confirmed):
+        """Подтверждение или отмена всех выделенных рейсов одной операцией"""
+        if not self.selected_schedules:
+            messagebox.showerror("No Selection", "Please select flights")
+            return
+
+        action = "confirm" if confirmed else "cancel"
+        if not messagebox.askyesno("Confirm", f"Do you want to {action} {len(self.selected_schedules)} flight(s)?"):
+            return
+
+        self.run_bulk_operation(FlightController.set_flights_status, confirmed,
+                                schedule_ids=list(self.selected_schedules))
+
+    def reprice_selected(self):
+        """Изменение цены эконом-класса выделенных рейсов на заданный процент"""
+        if not self.selected_schedules:
+            messagebox.showerror("No Selection", "Please select flights")
+            return
+
+        percent = simpledialog.askfloat("Reprice",
+                                        f"Change economy price of {len(self.selected_schedules)} flight(s) by, %:",
+                                        parent=self)
+        if percent is None:
+            return
+
+        self.run_bulk_operation(FlightController.reprice_flights, percent,
+                                schedule_ids=list(self.selected_schedules))
+
+    def run_bulk_operation(self, operation, *args, **kwargs):
+        """Выполнение массовой операции в фоновом потоке и перезагрузка таблицы"""
+        def done(result):
+            success, result = result
+            if success:
+                messagebox.showinfo("Success", f"Flights updated: {result}")
+                self.apply_filters()
+            else:
+                messagebox.showerror("Error", result)
+
+        self.tasks.submit("bulk", functools.partial(operation, *args, **kwargs), on_success=done,
+                          on_error=lambda error: messagebox.showerror("Error", str(error)))
+
     def edit_flight(self):
         """Редактирование выбранного рейса"""
         if not self.selected_schedule:
@@ -254,29 +448,39 @@ class ScheduleManagementView(tk.Toplevel):
         if not file_path:
             return
 
-        try:
-            # Читаем содержимое файла
-            with open(file_path, 'r') as file:
-                file_content = file.read()
+        # Файл импортируется потоково в фоновом потоке, пачками строк
+        self.import_status_var.set("Importing...")
+        self.tasks.submit("import", FlightController.import_schedule_file, file_path,
+                          on_progress=self.show_import_progress,
+                          on_success=self.show_import_results,
+                          on_error=self.show_import_error)
 
-            # Импортируем изменения
-            success, result = FlightController.import_schedule_changes(file_content)
+    def show_import_progress(self, rows, bytes_read, total_size):
+        """Вывод хода импорта"""
+        percent = f" ({min(100, bytes_read * 100 // total_size)}%)" if total_size else ""
+        self.import_status_var.set(f"Imported rows: {rows}{percent}")
 
-            if success:
-                # Показываем результаты
-                message = f"Successful Changes Applied: {result['success']}\n"
-                message += f"Duplicate Records Discarded: {result['duplicates']}\n"
-                message += f"Records with missing fields discarded: {result['missing_fields']}"
+    def show_import_results(self, result):
+        """Вывод результатов импорта и обновление списка расписаний"""
+        success, result = result
+        self.import_status_var.set("")
+
+        if success:
+            # Показываем результаты
+            message = f"Successful Changes Applied: {result['success']}\n"
+            message += f"Duplicate Records Discarded: {result['duplicates']}\n"
+            message += f"Records with missing fields discarded: {result['missing_fields']}"
 
-                messagebox.showinfo("Import Results", message)
+            messagebox.showinfo("Import Results", message)
+        else:
+            messagebox.showerror("Import Error", str(result))
 
-                # Обновляем список расписаний
-                self.apply_filters()
-            else:
-                messagebox.showerror("Import Error", str(result))
+        # Обновляем список расписаний (часть пачек могла быть сохранена и при ошибке)
+        self.apply_filters()
 
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+    def show_import_error(self, error):
+        self.import_status_var.set("")
+        messagebox.showerror("Error", f"An error occurred: {str(error)}")
 
 
 class EditScheduleDialog(tk.Toplevel):
@@ -375,8 +579,8 @@ class EditScheduleDialog(tk.Toplevel):
 
             if success:
                 messagebox.showinfo("Success", message)
-                # Обновляем список расписаний в родительском окне
-                self.parent.apply_filters()
+                # Обновляем строку рейса в родительском окне
+                self.parent.refresh_schedule(self.schedule_id)
                 self.destroy()
             else:
                 messagebox.showerror("Error", message)
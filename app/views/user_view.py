@@ -1,11 +1,12 @@
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, messagebox
 import datetime
 from datetime import timedelta
 from sqlalchemy import func
 from app.config.database import get_session
 from app.models import UserSession, SystemCrash
 from app.controllers.user_controller import UserController
+from app.utils.tk_tasks import TaskRunner
 # Импортируем внутри методов, чтобы избежать циклических импортов
 
 class UserView(tk.Toplevel):
@@ -17,6 +18,9 @@ class UserView(tk.Toplevel):
         self.user = user
         self.user_session = user_session
 
+        # Запросы к базе выполняются в фоновых потоках
+        self.tasks = TaskRunner(self)
+
         self.title("AMONIC Airlines Automation System")
         self.geometry("800x600")
 
@@ -95,16 +99,17 @@ class UserView(tk.Toplevel):
         self.activity_tree.tag_configure('crash', background='#ffcccc')
 
     def load_activity_data(self):
-        """Загрузка данных активности пользователя"""
-        # Очищаем таблицу
-        for item in self.activity_tree.get_children():
-            self.activity_tree.delete(item)
+        """Загрузка данных активности пользователя (в фоновом потоке)"""
+        self.tasks.submit("activity", self.fetch_activity_rows, self.user.id, on_success=self.show_activity,
+                          on_error=lambda error: messagebox.showerror("Error", str(error)))
 
+    def fetch_activity_rows(self, user_id):
+        """Строки таблицы активности (выполняется в фоновом потоке)"""
         # Получаем сессии пользователя
         session = get_session()
-        user_sessions = session.query(UserSession).filter_by(user_id=self.user.id).order_by(UserSession.login_time.desc()).all()
+        user_sessions = session.query(UserSession).filter_by(user_id=user_id).order_by(UserSession.login_time.desc()).all()
 
-        # Добавляем сессии в таблицу
+        rows = []
         for user_session in user_sessions:
             # Форматируем дату и время входа
             login_date = user_session.login_time.strftime("%d/%m/%Y")
@@ -119,17 +124,28 @@ class UserView(tk.Toplevel):
             # Определяем, был ли сбой
             crash_status = "Yes" if user_session.crash else "No"
 
-            # Определяем тег для строки (красный для сессий со сбоем)
-            tags = ('crash',) if user_session.crash else ()
-
-            # Добавляем строку в таблицу
-            self.activity_tree.insert("", tk.END, values=(
+            rows.append(((
                 login_date,
                 login_time,
                 logout_time,
                 time_spent,
                 crash_status
-            ), tags=tags)
+            ), bool(user_session.crash)))
+        return rows
+
+    def show_activity(self, rows):
+        """Вывод загруженной активности в таблицу"""
+        # Очищаем таблицу
+        for item in self.activity_tree.get_children():
+            self.activity_tree.delete(item)
+
+        # Добавляем сессии в таблицу
+        for values, crash in rows:
+            # Определяем тег для строки (красный для сессий со сбоем)
+            tags = ('crash',) if crash else ()
+
+            # Добавляем строку в таблицу
+            self.activity_tree.insert("", tk.END, values=values, tags=tags)
 
     def calculate_time_spent(self):
         """Расчет времени, проведенного в системе за последние 30 дней"""
@@ -1 +1,28 @@
 # Initialize tests package
+import sys
+import os
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+from app.config.database import get_engine, init_db
+
+# Приводим схему тестовой базы к актуальной (новые таблицы и индексы)
+init_db()
+
+@contextmanager
+def capture_statements(kind=None, engine=None):
+    """Список SQL-инструкций, выполненных в блоке (kind - только "SELECT", "UPDATE" и т.п.)"""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if kind is None or statement.lstrip().upper().startswith(kind):
+            statements.append(statement)
+
+    engine = engine or get_engine()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
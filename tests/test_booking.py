@@ -0,0 +1,412 @@
+import unittest
+import sys
+import os
+import datetime
+import threading
+import sqlite3
+from unittest import mock
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError, OperationalError
+from tests import capture_statements
+from app.controllers import flight_controller
+from app.controllers.flight_controller import FlightController
+from app.models import Airport, Country, Route, Aircraft, Schedule, CabinType, Ticket, Booking, SeatInventory
+from app.controllers.inventory_controller import InventoryController
+from app.config.database import get_engine, get_session, remove_session
+from app.utils.booking_reference import is_valid_reference
+
+class BookingTestCase(unittest.TestCase):
+    """Общие тестовые данные: небольшой самолет и несколько рейсов"""
+
+    AIRPORT_CODES = ("XBA", "XBB")
+    FLIGHTS_COUNT = 5
+
+    def setUp(self):
+        """Подготовка перед каждым тестом"""
+        self.session = get_session()
+
+        self.country = self.session.query(Country).first()
+        if not self.country:
+            self.country = Country(name="Test Country")
+            self.session.add(self.country)
+            self.session.commit()
+
+        for name in ("Economy", "Business", "First Class"):
+            if not self.session.query(CabinType).filter_by(name=name).first():
+                self.session.add(CabinType(name=name))
+        self.session.commit()
+
+        # 6 мест эконом, 3 бизнес, 1 первый класс
+        self.aircraft = Aircraft(name="Booking Test", make_model="Test", total_seats=10, economy_seats=6, business_seats=3)
+        self.airports = [
+            Airport(country_id=self.country.id, iata_code=code, name=f"Booking Test {code}")
+            for code in self.AIRPORT_CODES
+        ]
+        self.session.add(self.aircraft)
+        self.session.add_all(self.airports)
+        self.session.commit()
+
+        self.route = Route(departure_airport_id=self.airports[0].id, arrival_airport_id=self.airports[1].id,
+                           distance=500, flight_time=60)
+        self.session.add(self.route)
+        self.session.commit()
+
+        self.schedules = [
+            Schedule(route_id=self.route.id, aircraft_id=self.aircraft.id, date=datetime.date(2030, 2, 1),
+                     time=datetime.time(8 + i, 0), flight_number=f"XB{i}", economy_price=100.0, confirmed=True)
+            for i in range(self.FLIGHTS_COUNT)
+        ]
+        self.session.add_all(self.schedules)
+        self.session.commit()
+
+        self.schedule_ids = [schedule.id for schedule in self.schedules]
+        self.route_id = self.route.id
+        self.aircraft_id = self.aircraft.id
+
+    def tearDown(self):
+        """Очистка после каждого теста"""
+        self.session.rollback()
+        references = self.session.query(Ticket.booking_reference).filter(Ticket.schedule_id.in_(self.schedule_ids))
+        self.session.query(Booking).filter(Booking.reference.in_(references.scalar_subquery())).delete(synchronize_session=False)
+        self.session.query(Ticket).filter(Ticket.schedule_id.in_(self.schedule_ids)).delete(synchronize_session=False)
+        self.session.query(SeatInventory).filter(SeatInventory.schedule_id.in_(self.schedule_ids)).delete(synchronize_session=False)
+        self.session.query(Schedule).filter(Schedule.id.in_(self.schedule_ids)).delete(synchronize_session=False)
+        self.session.query(Route).filter_by(id=self.route_id).delete(synchronize_session=False)
+        self.session.query(Airport).filter(Airport.iata_code.in_(self.AIRPORT_CODES)).delete(synchronize_session=False)
+        self.session.query(Aircraft).filter_by(id=self.aircraft_id).delete(synchronize_session=False)
+        self.session.commit()
+        self.session.expunge_all()
+
+    def passengers(self, count):
+        """Данные пассажиров для бронирования"""
+        return [
+            {
+                "firstname": f"Passenger{i}",
+                "lastname": "Test",
+                "email": f"passenger{i}@example.com",
+                "phone": "+1-555-0000",
+                "passport_number": f"PT{i:06d}",
+                "passport_country_id": self.country.id
+            }
+            for i in range(count)
+        ]
+
+
+class TestSeatAvailability(BookingTestCase):
+    """Тесты для проверки свободных мест"""
+
+    def test_remaining_seats_for_many_flights(self):
+        """Свободные места для набора рейсов"""
+        success, _ = FlightController.book_flight(self.schedule_ids[0], "Economy", self.passengers(2))
+        self.assertTrue(success)
+        success, _ = FlightController.book_flight(self.schedule_ids[1], "Business", self.passengers(1))
+        self.assertTrue(success)
+
+        economy = FlightController.get_remaining_seats(self.schedule_ids, "Economy")
+        self.assertEqual(economy[self.schedule_ids[0]], 4)
+        self.assertEqual(economy[self.schedule_ids[1]], 6)
+
+        business = FlightController.get_remaining_seats(self.schedule_ids, "Business")
+        self.assertEqual(business[self.schedule_ids[1]], 2)
+
+        first_class = FlightController.get_remaining_seats(self.schedule_ids, "First Class")
+        self.assertEqual(set(first_class.values()), {1})
+
+        self.assertEqual(FlightController.get_remaining_seats([], "Economy"), {})
+        self.assertEqual(FlightController.get_remaining_seats(self.schedule_ids, "Unknown"), {})
+
+    def test_remaining_seats_query_count(self):
+        """Количество запросов не зависит от числа рейсов"""
+        # Счетчики уже созданы - дальше только чтение по первичному ключу
+        InventoryController.ensure_inventory(self.schedule_ids)
+
+        with capture_statements() as statements:
+            FlightController.get_remaining_seats(self.schedule_ids, "Economy")
+
+        # Тип кабины и чтение счетчиков
+        self.assertEqual(len(statements), 2)
+
+    def test_remaining_seats_without_inventory_is_read_only(self):
+        """Для рейсов без счетчиков места считаются по билетам без записи в базу"""
+        with capture_statements() as statements:
+            remaining = FlightController.get_remaining_seats(self.schedule_ids, "Economy")
+
+        self.assertEqual(set(remaining.values()), {6})
+        self.assertTrue(all(statement.lstrip().upper().startswith("SELECT") for statement in statements))
+        self.assertEqual(
+            self.session.query(SeatInventory).filter(SeatInventory.schedule_id.in_(self.schedule_ids)).count(), 0
+        )
+
+    def test_check_seat_availability(self):
+        """Проверка наличия мест для одного рейса"""
+        flight_id = self.schedule_ids[0]
+        self.assertTrue(FlightController.check_seat_availability(flight_id, "Economy", 6))
+        self.assertFalse(FlightController.check_seat_availability(flight_id, "Economy", 7))
+        self.assertFalse(FlightController.check_seat_availability(flight_id, "First Class", 2))
+        self.assertFalse(FlightController.check_seat_availability(9999999, "Economy", 1))
+
+
+class TestSeatInventory(BookingTestCase):
+    """Тесты для счетчиков свободных мест"""
+
+    def economy_id(self):
+        return self.session.query(CabinType).filter_by(name="Economy").first().id
+
+    def inventory(self, schedule_id):
+        """Текущее значение счетчика эконом-класса"""
+        self.session.expire_all()
+        return self.session.query(SeatInventory).get((schedule_id, self.economy_id())).seats_available
+
+    def test_inventory_seeded_from_aircraft(self):
+        """Счетчики создаются по вместимости самолета для всех типов кабин"""
+        InventoryController.ensure_inventory(self.schedule_ids)
+
+        rows = self.session.query(SeatInventory).filter(SeatInventory.schedule_id.in_(self.schedule_ids)).all()
+        cabin_types_count = self.session.query(CabinType).count()
+        self.assertEqual(len(rows), self.FLIGHTS_COUNT * cabin_types_count)
+        self.assertEqual(self.inventory(self.schedule_ids[0]), 6)
+
+    def test_booking_decrements_inventory(self):
+        """Бронирование уменьшает счетчик, перебронирование отклоняется"""
+        flight_id = self.schedule_ids[0]
+
+        success, _ = FlightController.book_flight(flight_id, "Economy", self.passengers(4))
+        self.assertTrue(success)
+        self.assertEqual(self.inventory(flight_id), 2)
+
+        success, message = FlightController.book_flight(flight_id, "Economy", self.passengers(3))
+        self.assertFalse(success)
+        self.assertEqual(message, "Недостаточно свободных мест")
+        self.assertEqual(self.inventory(flight_id), 2)
+        self.assertEqual(self.session.query(Ticket).filter_by(schedule_id=flight_id).count(), 4)
+
+    def test_reconcile(self):
+        """Сверка восстанавливает счетчики по таблице tickets"""
+        flight_id = self.schedule_ids[0]
+        InventoryController.ensure_inventory(self.schedule_ids)
+        FlightController.book_flight(flight_id, "Economy", self.passengers(2))
+
+        # Имитируем расхождение: билеты удалены в обход счетчиков
+        self.session.query(Ticket).filter_by(schedule_id=flight_id).delete(synchronize_session=False)
+        self.session.commit()
+        self.assertEqual(self.inventory(flight_id), 4)
+
+        corrected = InventoryController.reconcile(self.schedule_ids)
+        self.assertEqual(corrected, 1)
+        self.assertEqual(self.inventory(flight_id), 6)
+
+        # Повторная сверка ничего не меняет
+        self.assertEqual(InventoryController.reconcile(self.schedule_ids), 0)
+
+    def test_reconcile_with_concurrent_booking(self):
+        """Бронирование во время сверки не теряет списанные места"""
+        flight_id = self.schedule_ids[0]
+        InventoryController.ensure_inventory(self.schedule_ids)
+        FlightController.book_flight(flight_id, "Economy", self.passengers(2))
+
+        original = InventoryController._count_inventory
+        booked = []
+
+        def book_in_thread():
+            try:
+                booked.append(FlightController.book_flight(flight_id, "Economy", self.passengers(3)))
+            finally:
+                remove_session()
+
+        booking_thread = threading.Thread(target=book_in_thread)
+
+        def count_then_book(session, schedule_ids=None):
+            counts = original(session, schedule_ids)
+            # Бронирование в другом потоке сразу после подсчета билетов
+            booking_thread.start()
+            booking_thread.join(0.5)
+            return counts
+
+        with mock.patch.object(InventoryController, "_count_inventory", side_effect=count_then_book):
+            InventoryController.reconcile(self.schedule_ids)
+        booking_thread.join(10)
+
+        self.assertEqual(len(booked), 1)
+        self.assertTrue(booked[0][0])
+        self.assertEqual(self.session.query(Ticket).filter_by(schedule_id=flight_id).count(), 5)
+        self.assertEqual(self.inventory(flight_id), 1)
+
+
+class TestGroupBooking(BookingTestCase):
+    """Тесты для пакетной вставки билетов групповых бронирований"""
+
+    def test_group_booking_uses_bulk_insert(self):
+        """Группа создается пакетами с одним номером бронирования"""
+        flight_id = self.schedule_ids[0]
+        passengers = self.passengers(5)
+
+        with mock.patch.object(flight_controller, "BULK_BOOKING_THRESHOLD", 3), \
+                mock.patch.object(flight_controller, "TICKET_INSERT_BATCH", 2), \
+                mock.patch.object(FlightController, "_add_tickets") as add_tickets:
+            success, message = FlightController.book_flight(flight_id, "Economy", passengers)
+
+        self.assertTrue(success, message)
+        add_tickets.assert_not_called()
+
+        tickets = self.session.query(Ticket).filter_by(schedule_id=flight_id).order_by(Ticket.id).all()
+        self.assertEqual([ticket.passport_number for ticket in tickets],
+                         [passenger["passport_number"] for passenger in passengers])
+        self.assertEqual(len({ticket.booking_reference for ticket in tickets}), 1)
+        self.assertTrue(message.endswith(tickets[0].booking_reference))
+        self.assertTrue(all(ticket.confirmed for ticket in tickets))
+
+        remaining = FlightController.get_remaining_seats([flight_id], "Economy")
+        self.assertEqual(remaining[flight_id], 1)
+
+    def test_small_booking_uses_orm(self):
+        """Небольшие бронирования создаются через объекты ORM"""
+        with mock.patch.object(FlightController, "_insert_tickets") as insert_tickets:
+            success, _ = FlightController.book_flight(self.schedule_ids[0], "Economy", self.passengers(2))
+
+        self.assertTrue(success)
+        insert_tickets.assert_not_called()
+        self.assertEqual(self.session.query(Ticket).filter_by(schedule_id=self.schedule_ids[0]).count(), 2)
+
+
+class TestItineraryBooking(BookingTestCase):
+    """Тесты для бронирования поездки из нескольких сегментов"""
+
+    def test_parse_flight_selection(self):
+        """Разбор идентификаторов строк результатов поиска"""
+        self.assertEqual(FlightController.parse_flight_selection("direct_12"), [12])
+        self.assertEqual(FlightController.parse_flight_selection("connecting_3_12_40"), [12, 40])
+        self.assertEqual(FlightController.parse_flight_selection(None), [])
+        with self.assertRaises(ValueError):
+            FlightController.parse_flight_selection("unknown_1")
+
+    def test_itinerary_booked_in_one_commit(self):
+        """Все сегменты бронируются одной транзакцией с одним номером"""
+        InventoryController.ensure_inventory(self.schedule_ids)
+        flight_ids = self.schedule_ids[:3]
+        commits = []
+
+        def count_commit(conn):
+            commits.append(conn)
+
+        engine = get_engine()
+        event.listen(engine, "commit", count_commit)
+        try:
+            success, message = FlightController.book_itinerary(flight_ids, "Economy", self.passengers(2))
+        finally:
+            event.remove(engine, "commit", count_commit)
+
+        self.assertTrue(success, message)
+        self.assertEqual(len(commits), 1)
+
+        tickets = self.session.query(Ticket).filter(Ticket.schedule_id.in_(self.schedule_ids)).all()
+        self.assertEqual(len(tickets), 6)
+        self.assertEqual({ticket.schedule_id for ticket in tickets}, set(flight_ids))
+        self.assertEqual(len({ticket.booking_reference for ticket in tickets}), 1)
+
+        remaining = FlightController.get_remaining_seats(flight_ids, "Economy")
+        self.assertEqual(set(remaining.values()), {4})
+
+    def test_no_partial_booking(self):
+        """Нехватка мест на одном сегменте отменяет бронирование всех"""
+        full_flight_id = self.schedule_ids[1]
+        success, _ = FlightController.book_flight(full_flight_id, "Economy", self.passengers(5))
+        self.assertTrue(success)
+
+        flight_ids = [self.schedule_ids[0], full_flight_id, self.schedule_ids[2]]
+        success, message = FlightController.book_itinerary(flight_ids, "Economy", self.passengers(2))
+
+        self.assertFalse(success)
+        self.assertEqual(message, "Недостаточно свободных мест на рейсе XB1")
+        self.assertEqual(self.session.query(Ticket).filter(Ticket.schedule_id.in_(self.schedule_ids)).count(), 5)
+
+        remaining = FlightController.get_remaining_seats(flight_ids, "Economy")
+        self.assertEqual(remaining, {self.schedule_ids[0]: 6, full_flight_id: 1, self.schedule_ids[2]: 6})
+
+        success, message = FlightController.book_itinerary([self.schedule_ids[0], 999999], "Economy", self.passengers(1))
+        self.assertFalse(success)
+        self.assertEqual(message, "Рейс не найден")
+
+    def test_locked_reads_are_retried(self):
+        """Блокировка базы при чтении рейсов повторяет транзакцию, а не выбрасывает исключение"""
+        flight_id = self.schedule_ids[0]
+        InventoryController.ensure_inventory(self.schedule_ids)
+        locked = []
+
+        def lock_schedule_read(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().startswith("SELECT schedules.id") and len(locked) < 2:
+                locked.append(statement)
+                raise OperationalError(statement, parameters, sqlite3.OperationalError("database is locked"))
+
+        engine = get_engine()
+        event.listen(engine, "before_cursor_execute", lock_schedule_read)
+        try:
+            success, message = FlightController.book_flight(flight_id, "Economy", self.passengers(1))
+        finally:
+            event.remove(engine, "before_cursor_execute", lock_schedule_read)
+
+        self.assertTrue(success, message)
+        self.assertEqual(len(locked), 2)
+
+        with mock.patch.object(flight_controller, "run_in_transaction",
+                               side_effect=OperationalError("SELECT", {}, Exception("database is locked"))):
+            success, message = FlightController.book_flight(flight_id, "Economy", self.passengers(1))
+        self.assertFalse(success)
+        self.assertIn("database is locked", message)
+
+
+class TestBookingLookup(BookingTestCase):
+    """Тесты для номеров бронирования и поиска бронирования"""
+
+    def booking_reference(self, message):
+        return message.split(": ")[1]
+
+    def test_references_are_unique_and_valid(self):
+        """Каждое бронирование получает новый корректный номер"""
+        references = set()
+        for flight_id in self.schedule_ids:
+            success, message = FlightController.book_flight(flight_id, "Economy", self.passengers(1))
+            self.assertTrue(success)
+            references.add(self.booking_reference(message))
+
+        self.assertEqual(len(references), self.FLIGHTS_COUNT)
+        self.assertTrue(all(is_valid_reference(reference) for reference in references))
+
+    def test_reference_unique_constraint(self):
+        """Повторный номер отклоняется базой данных"""
+        success, message = FlightController.book_flight(self.schedule_ids[0], "Economy", self.passengers(1))
+        self.assertTrue(success)
+
+        self.session.add(Booking(reference=self.booking_reference(message), created_at=datetime.datetime.now()))
+        with self.assertRaises(IntegrityError):
+            self.session.flush()
+        self.session.rollback()
+
+    def test_get_booking_in_one_query(self):
+        """Билеты и сегменты бронирования загружаются одним запросом"""
+        flight_ids = [self.schedule_ids[2], self.schedule_ids[0]]
+        success, message = FlightController.book_itinerary(flight_ids, "Business", self.passengers(2))
+        self.assertTrue(success)
+        reference = self.booking_reference(message)
+        self.session.expunge_all()
+
+        with capture_statements() as statements:
+            booking = FlightController.get_booking(f" {reference.lower()} ")
+            segments = [(segment.flight_number, segment.route.departure_airport.iata_code) for segment in booking["segments"]]
+            cabins = {ticket.cabin_type.name for ticket in booking["tickets"]}
+
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(booking["reference"], reference)
+        self.assertEqual(len(booking["tickets"]), 4)
+        self.assertEqual(segments, [("XB0", "XBA"), ("XB2", "XBA")])
+        self.assertEqual(cabins, {"Business"})
+
+        self.assertIsNone(FlightController.get_booking("ZZZZZZZ"))
+        self.assertIsNone(FlightController.get_booking(""))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import unittest
+import sys
+import os
+import datetime
+import multiprocessing
+import shutil
+import tempfile
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.models import Base, Country, Airport, Route, Aircraft, Schedule, CabinType, Ticket, SeatInventory
+from app.config.database import run_in_transaction, set_journal_mode
+
+WORKERS = 6
+ATTEMPTS_PER_WORKER = 15
+ECONOMY_SEATS = 40
+
+def book_repeatedly(flight_id, country_id, worker_number, results):
+    """Процесс-агент: бронирует по 1-3 места, пока есть попытки"""
+    # База берется из AMONIC_DATABASE_URL, унаследованной от родителя
+    from app.controllers.flight_controller import FlightController
+
+    outcome = {"booked_seats": 0, "sold_out": 0, "errors": []}
+    for attempt in range(ATTEMPTS_PER_WORKER):
+        count = 1 + (worker_number + attempt) % 3
+        passengers = [
+            {
+                "firstname": f"W{worker_number}",
+                "lastname": f"A{attempt}P{i}",
+                "passport_number": f"S{worker_number:02d}{attempt:03d}{i}",
+                "passport_country_id": country_id
+            }
+            for i in range(count)
+        ]
+        success, message = FlightController.book_flight(flight_id, "Economy", passengers)
+        if success:
+            outcome["booked_seats"] += count
+        elif message == "Недостаточно свободных мест":
+            outcome["sold_out"] += 1
+        else:
+            outcome["errors"].append(message)
+    results.put(outcome)
+
+class TestConcurrentBooking(unittest.TestCase):
+    """Нагрузочный тест бронирования несколькими процессами"""
+
+    def setUp(self):
+        """Создаем отдельную базу с одним рейсом"""
+        self.directory = tempfile.mkdtemp()
+        self.url = f"sqlite:///{os.path.join(self.directory, 'stress.db')}"
+        self.engine = create_engine(self.url)
+        # Как после init_db: процессы-агенты не переключают режим журнала сами
+        set_journal_mode(self.engine, {'journal_mode': 'WAL'})
+        Base.metadata.create_all(self.engine)
+
+        with Session(self.engine) as session:
+            country = Country(name="Stress Country")
+            session.add(country)
+            session.add_all([CabinType(name=name) for name in ("Economy", "Business", "First Class")])
+            aircraft = Aircraft(name="Stress", make_model="Stress", total_seats=ECONOMY_SEATS + 10,
+                                economy_seats=ECONOMY_SEATS, business_seats=10)
+            session.add(aircraft)
+            session.flush()
+
+            origin = Airport(country_id=country.id, iata_code="SSA", name="Stress A")
+            destination = Airport(country_id=country.id, iata_code="SSB", name="Stress B")
+            session.add_all([origin, destination])
+            session.flush()
+
+            route = Route(departure_airport_id=origin.id, arrival_airport_id=destination.id, distance=100, flight_time=60)
+            session.add(route)
+            session.flush()
+
+            schedule = Schedule(route_id=route.id, aircraft_id=aircraft.id, date=datetime.date(2030, 3, 1),
+                                time=datetime.time(9, 0), flight_number="SS1", economy_price=100.0, confirmed=True)
+            session.add(schedule)
+            session.commit()
+
+            self.flight_id = schedule.id
+            self.country_id = country.id
+
+        self.previous_url = os.environ.get('AMONIC_DATABASE_URL')
+        os.environ['AMONIC_DATABASE_URL'] = self.url
+
+    def tearDown(self):
+        """Удаляем временную базу"""
+        if self.previous_url is None:
+            del os.environ['AMONIC_DATABASE_URL']
+        else:
+            os.environ['AMONIC_DATABASE_URL'] = self.previous_url
+        self.engine.dispose()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_no_oversell(self):
+        """Параллельные агенты не продают больше мест, чем есть в кабине"""
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        processes = [
+            context.Process(target=book_repeatedly, args=(self.flight_id, self.country_id, number, results))
+            for number in range(WORKERS)
+        ]
+        for process in processes:
+            process.start()
+        outcomes = [results.get(timeout=120) for _ in processes]
+        for process in processes:
+            process.join(timeout=30)
+
+        booked_seats = sum(outcome["booked_seats"] for outcome in outcomes)
+        errors = [error for outcome in outcomes for error in outcome["errors"]]
+
+        with Session(self.engine) as session:
+            tickets = session.query(func.count(Ticket.id)).filter_by(schedule_id=self.flight_id).scalar()
+            economy = session.query(CabinType).filter_by(name="Economy").one()
+            inventory = session.query(SeatInventory).get((self.flight_id, economy.id))
+
+        self.assertEqual(errors, [])
+        # Спрос превышает предложение: продано ровно столько мест, сколько есть
+        self.assertEqual(tickets, booked_seats)
+        self.assertLessEqual(tickets, ECONOMY_SEATS)
+        self.assertGreater(sum(outcome["sold_out"] for outcome in outcomes), 0)
+        self.assertEqual(inventory.seats_available, ECONOMY_SEATS - tickets)
+
+
+class TestRunInTransaction(unittest.TestCase):
+    """Повторы транзакции при блокировке базы"""
+
+    def test_retries_when_locked(self):
+        """Блокировка базы приводит к повтору, другие ошибки - нет"""
+        calls = []
+
+        def work(session):
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError("BEGIN IMMEDIATE", {}, Exception("database is locked"))
+            return "done"
+
+        self.assertEqual(run_in_transaction(work, backoff=0.001), "done")
+        self.assertEqual(len(calls), 3)
+
+        def failing(session):
+            raise OperationalError("SELECT", {}, Exception("no such table: missing"))
+
+        with self.assertRaises(OperationalError):
+            run_in_transaction(failing, backoff=0.001)
+
+    def test_gives_up_after_retries(self):
+        """Количество повторов ограничено"""
+        calls = []
+
+        def always_locked(session):
+            calls.append(1)
+            raise OperationalError("BEGIN IMMEDIATE", {}, Exception("database is locked"))
+
+        with self.assertRaises(OperationalError):
+            run_in_transaction(always_locked, retries=2, backoff=0.001)
+        self.assertEqual(len(calls), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import sys
+import os
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.booking_reference import (
+    ALPHABET, CAPACITY, encode_reference, is_valid_reference, normalize_reference
+)
+
+class TestBookingReference(unittest.TestCase):
+    """Тесты для номеров бронирования"""
+
+    def test_encode_is_unique(self):
+        """Разные порядковые номера дают разные номера бронирования"""
+        references = [encode_reference(number) for number in range(1, 20001)]
+        self.assertEqual(len(set(references)), len(references))
+        self.assertTrue(all(len(reference) == 7 for reference in references))
+        self.assertEqual(len({encode_reference(CAPACITY - 1), encode_reference(1)}), 2)
+
+    def test_out_of_range(self):
+        """Порядковый номер вне диапазона"""
+        with self.assertRaises(ValueError):
+            encode_reference(0)
+        with self.assertRaises(ValueError):
+            encode_reference(CAPACITY)
+
+    def test_checksum_detects_single_substitution(self):
+        """Замена любого символа обнаруживается контрольным символом"""
+        reference = encode_reference(12345)
+        self.assertTrue(is_valid_reference(reference))
+        for position in range(len(reference) - 1):
+            for char in ALPHABET:
+                if char == reference[position]:
+                    continue
+                corrupted = reference[:position] + char + reference[position + 1:]
+                self.assertFalse(is_valid_reference(corrupted), corrupted)
+
+    def test_validation(self):
+        """Проверка формата номера"""
+        reference = encode_reference(42)
+        self.assertTrue(is_valid_reference(f" {reference.lower()} "))
+        self.assertEqual(normalize_reference(f" {reference.lower()} "), reference)
+        self.assertFalse(is_valid_reference("ABC123"))
+        self.assertFalse(is_valid_reference("ILOU000"))
+        self.assertFalse(is_valid_reference(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
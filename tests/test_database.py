@@ -0,0 +1,157 @@
+import unittest
+import sys
+import os
+import threading
+import shutil
+import sqlite3
+import tempfile
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models import Country
+from sqlalchemy import create_engine, inspect, text
+from app.config.database import (get_engine, get_session, get_fresh_session, session_scope, remove_session,
+                                 get_sqlite_pragmas, apply_sqlite_pragmas, set_journal_mode)
+
+class TestDatabaseSessions(unittest.TestCase):
+    """Тесты для движка и реестра сессий"""
+
+    def tearDown(self):
+        """Очистка после каждого теста"""
+        session = get_session()
+        session.query(Country).filter_by(name="Session Scope Country").delete()
+        session.commit()
+
+    def test_engine_is_created_once(self):
+        """Движок создается один раз на процесс"""
+        self.assertIs(get_engine(), get_engine())
+
+    def test_session_is_shared_within_thread(self):
+        """В пределах потока возвращается одна и та же сессия"""
+        self.assertIs(get_session(), get_session())
+
+    def test_session_is_separate_per_thread(self):
+        """Каждый поток получает собственную сессию"""
+        sessions = []
+
+        def worker():
+            sessions.append(get_session())
+            remove_session()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(sessions[0], get_session())
+
+    def test_session_scope_commits(self):
+        """session_scope фиксирует изменения при успешном завершении"""
+        with session_scope() as session:
+            session.add(Country(name="Session Scope Country"))
+
+        self.assertFalse(get_session().new)
+        count = get_session().query(Country).filter_by(name="Session Scope Country").count()
+        self.assertEqual(count, 1)
+
+    def test_session_scope_rolls_back_on_error(self):
+        """session_scope откатывает изменения при исключении"""
+        with self.assertRaises(RuntimeError):
+            with session_scope() as session:
+                session.add(Country(name="Session Scope Country"))
+                raise RuntimeError("boom")
+
+        count = get_session().query(Country).filter_by(name="Session Scope Country").count()
+        self.assertEqual(count, 0)
+
+    def test_fresh_session_expires_loaded_objects(self):
+        """get_fresh_session завершает транзакцию чтения, но не теряет изменения"""
+        with session_scope() as session:
+            session.add(Country(name="Session Scope Country"))
+
+        session = get_session()
+        country = session.query(Country).filter_by(name="Session Scope Country").one()
+
+        self.assertIs(get_fresh_session(), session)
+        self.assertIn("name", inspect(country).expired_attributes)
+
+        # Отправленные в базу, но не зафиксированные изменения сохраняются
+        session.add(Country(name="Session Scope Country"))
+        session.flush()
+        get_fresh_session()
+        self.assertEqual(session.query(Country).filter_by(name="Session Scope Country").count(), 2)
+        session.commit()
+
+    def test_remove_session_closes_thread_session(self):
+        """remove_session закрывает сессию потока, следующий вызов создает новую"""
+        session = get_session()
+        remove_session()
+        self.assertIsNot(session, get_session())
+
+
+class TestSqlitePragmas(unittest.TestCase):
+    """Тесты для профилей настройки SQLite"""
+
+    def test_performance_profile_applied_on_connect(self):
+        """PRAGMA профиля performance применяются к новым соединениям"""
+        with get_engine().connect() as connection:
+            journal_mode = connection.execute(text("PRAGMA journal_mode")).scalar()
+            synchronous = connection.execute(text("PRAGMA synchronous")).scalar()
+            temp_store = connection.execute(text("PRAGMA temp_store")).scalar()
+            busy_timeout = connection.execute(text("PRAGMA busy_timeout")).scalar()
+
+        self.assertEqual(journal_mode.lower(), "wal")
+        self.assertEqual(synchronous, 1)  # NORMAL
+        self.assertEqual(temp_store, 2)  # MEMORY
+        self.assertEqual(busy_timeout, 5000)
+
+    def test_connect_while_database_is_locked(self):
+        """Соединение открывается, пока другой клиент держит блокировку записи
+
+        Режим журнала не переключается при соединении, а устанавливается
+        один раз (init_db) и сохраняется в файле базы.
+        """
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "locked.db")
+        engine = create_engine(f"sqlite:///{path}")
+        apply_sqlite_pragmas(engine, get_sqlite_pragmas('performance'))
+
+        other = sqlite3.connect(path, isolation_level=None)
+        try:
+            other.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+            other.execute("BEGIN IMMEDIATE")
+            other.execute("INSERT INTO items VALUES (1)")
+
+            with engine.connect() as connection:
+                self.assertEqual(connection.exec_driver_sql("PRAGMA journal_mode").scalar(), "delete")
+                self.assertEqual(connection.exec_driver_sql("PRAGMA busy_timeout").scalar(), 5000)
+                self.assertEqual(connection.exec_driver_sql("SELECT COUNT(*) FROM items").scalar(), 0)
+
+            other.execute("COMMIT")
+            self.assertEqual(set_journal_mode(engine).lower(), "wal")
+            engine.dispose()
+            with engine.connect() as connection:
+                self.assertEqual(connection.exec_driver_sql("PRAGMA journal_mode").scalar(), "wal")
+        finally:
+            other.close()
+            engine.dispose()
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def test_profiles(self):
+        """Профили default и strict"""
+        self.assertEqual(get_sqlite_pragmas('default'), {})
+        self.assertEqual(get_sqlite_pragmas('strict')['foreign_keys'], 'ON')
+        with self.assertRaises(ValueError):
+            get_sqlite_pragmas('unknown')
+
+    def test_environment_override(self):
+        """Отдельные параметры переопределяются переменными окружения"""
+        os.environ['AMONIC_DB_MMAP_SIZE'] = '0'
+        try:
+            self.assertEqual(get_sqlite_pragmas('performance')['mmap_size'], '0')
+        finally:
+            del os.environ['AMONIC_DB_MMAP_SIZE']
+
+
+if __name__ == '__main__':
+    unittest.main()
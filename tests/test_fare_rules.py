@@ -0,0 +1,157 @@
+import unittest
+import sys
+import os
+import datetime
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tests import capture_statements
+from app.controllers.fare_rule_controller import FareRuleController, fare_rules
+from app.models import Schedule, FareRule
+from app.config.database import get_session
+from app.utils.fare_rules import FareRuleEntry, CompiledFareRules, FareRuleCache
+
+DAY = datetime.date(2030, 5, 10)
+
+def rule(rule_id, cabin="Business", route_id=None, start_date=None, end_date=None, multiplier=1.0, surcharge=0.0, priority=0):
+    return FareRuleEntry(rule_id, cabin, route_id, start_date, end_date, multiplier, surcharge, priority)
+
+class TestCompiledFareRules(unittest.TestCase):
+    """Тесты для выбора и применения правил тарифов"""
+
+    def test_no_rules_keeps_base_price(self):
+        """Без правил цена не меняется"""
+        compiled = CompiledFareRules([])
+        self.assertEqual(compiled.apply(1, DAY, "Business", 135), 135)
+        self.assertIsNone(compiled.lookup(1, DAY, "Business"))
+
+    def test_most_specific_rule_wins(self):
+        """Правило маршрута важнее общего, правило с датами - правила без дат"""
+        compiled = CompiledFareRules([
+            rule(1, multiplier=2.0),
+            rule(2, route_id=7, multiplier=3.0),
+            rule(3, route_id=7, start_date=DAY, end_date=DAY, surcharge=10),
+            rule(4, cabin="Economy", surcharge=5),
+        ])
+
+        self.assertEqual(compiled.apply(7, DAY, "business", 100), 110)
+        self.assertEqual(compiled.apply(7, DAY + datetime.timedelta(days=1), "Business", 100), 300)
+        self.assertEqual(compiled.apply(8, DAY, "Business", 100), 200)
+        self.assertEqual(compiled.apply(8, DAY, "Economy", 100.0), 105)
+        self.assertEqual(compiled.apply(8, DAY, "First Class", 175), 175)
+
+    def test_priority_and_open_ranges(self):
+        """Открытые диапазоны дат и приоритет"""
+        compiled = CompiledFareRules([
+            rule(1, start_date=DAY, multiplier=1.5),
+            rule(2, end_date=DAY, multiplier=0.5, priority=1),
+        ])
+
+        self.assertEqual(compiled.lookup(1, DAY, "Business").id, 2)
+        self.assertEqual(compiled.lookup(1, DAY + datetime.timedelta(days=1), "Business").id, 1)
+        self.assertEqual(compiled.lookup(1, DAY - datetime.timedelta(days=1), "Business").id, 2)
+
+    def test_cache_reload(self):
+        """Правила перезагружаются после invalidate и по истечении ttl"""
+        now = [0.0]
+        loaded = []
+
+        def loader():
+            loaded.append(1)
+            return [rule(1, multiplier=2.0)]
+
+        cache = FareRuleCache(loader, ttl=10, clock=lambda: now[0])
+        self.assertEqual(cache.apply(1, DAY, "Business", 100), 200)
+        self.assertEqual(cache.apply(2, DAY, "Business", 100), 200)
+        self.assertEqual(len(loaded), 1)
+
+        cache.invalidate()
+        cache.rules()
+        self.assertEqual(len(loaded), 2)
+
+        now[0] = 11
+        cache.rules()
+        self.assertEqual(len(loaded), 3)
+
+
+class TestFareRuleController(unittest.TestCase):
+    """Тесты для правил тарифов в базе данных"""
+
+    def setUp(self):
+        """Подготовка перед каждым тестом"""
+        self.session = get_session()
+        self.schedule = self.session.query(Schedule).first()
+        fare_rules.invalidate()
+
+    def tearDown(self):
+        """Очистка после каждого теста"""
+        self.session.rollback()
+        self.session.query(FareRule).delete(synchronize_session=False)
+        self.session.commit()
+        fare_rules.invalidate()
+
+    def test_rule_changes_price(self):
+        """Правило меняет цену рейса, изменение и удаление сбрасывают кэш"""
+        base_price = self.schedule.business_price
+        self.assertEqual(self.schedule.get_price_by_cabin_type("Business"), base_price)
+
+        success, rule_id = FareRuleController.add_rule("Business", multiplier=2.0, surcharge=15,
+                                                       route_id=self.schedule.route_id)
+        self.assertTrue(success)
+        self.assertEqual(self.schedule.get_price_by_cabin_type("Business"), int(base_price * 2.0 + 15))
+        self.assertEqual(self.schedule.get_price_by_cabin_type("Economy"), self.schedule.economy_price)
+
+        success, _ = FareRuleController.update_rule(rule_id, active=False)
+        self.assertTrue(success)
+        self.assertEqual(self.schedule.get_price_by_cabin_type("Business"), base_price)
+
+        success, _ = FareRuleController.update_rule(rule_id, active=True, multiplier=0.5, surcharge=0)
+        self.assertTrue(success)
+        self.assertEqual(self.schedule.get_price_by_cabin_type("Business"), int(base_price * 0.5))
+
+        success, _ = FareRuleController.delete_rule(rule_id)
+        self.assertTrue(success)
+        self.assertEqual(self.schedule.get_price_by_cabin_type("Business"), base_price)
+
+    def test_invalid_rules(self):
+        """Некорректные правила отклоняются"""
+        self.assertEqual(FareRuleController.add_rule("Unknown"), (False, "Тип кабины не найден"))
+        success, _ = FareRuleController.add_rule("Business", multiplier=-1)
+        self.assertFalse(success)
+        success, _ = FareRuleController.add_rule("Business", start_date=DAY, end_date=DAY - datetime.timedelta(days=1))
+        self.assertFalse(success)
+        self.assertEqual(FareRuleController.update_rule(999999, multiplier=2), (False, "Правило не найдено"))
+
+        success, rule_id = FareRuleController.add_rule("Business")
+        success, message = FareRuleController.update_rule(rule_id, cabin_type_id=1)
+        self.assertFalse(success)
+
+        # Изменение проверяется так же, как добавление
+        self.assertEqual(FareRuleController.update_rule(rule_id, multiplier=-1),
+                         (False, "Множитель не может быть отрицательным"))
+        success, _ = FareRuleController.update_rule(rule_id, start_date=DAY, end_date=DAY - datetime.timedelta(days=1))
+        self.assertFalse(success)
+        success, _ = FareRuleController.update_rule(rule_id, end_date=DAY)
+        self.assertTrue(success)
+        success, _ = FareRuleController.update_rule(rule_id, start_date=DAY + datetime.timedelta(days=1))
+        self.assertFalse(success)
+        self.session.expire_all()
+        rule = self.session.get(FareRule, rule_id)
+        self.assertEqual((rule.multiplier, rule.start_date, rule.end_date), (1.0, None, DAY))
+
+    def test_pricing_many_rows_without_queries(self):
+        """Цены для многих рейсов считаются без запросов к базе"""
+        FareRuleController.add_rule("First Class", multiplier=1.1)
+        schedules = self.session.query(Schedule).all()
+        fare_rules.rules()
+
+        with capture_statements() as statements:
+            prices = [schedule.get_price_by_cabin_type("First Class") for schedule in schedules]
+
+        self.assertEqual(statements, [])
+        self.assertEqual(prices, [int(schedule.first_class_price * 1.1) for schedule in schedules])
+
+
+if __name__ == '__main__':
+    unittest.main()
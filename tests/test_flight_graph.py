@@ -0,0 +1,137 @@
+import unittest
+import sys
+import os
+import datetime
+import random
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.flight_graph import FlightGraph, Itinerary, make_leg
+
+DAY = datetime.date(2030, 1, 1)
+NEXT_DAY = DAY + datetime.timedelta(days=1)
+
+def leg(schedule_id, dep, arr, date, hour, minute=0, flight_time=60, price=100):
+    """Короткая запись сегмента для тестов"""
+    return make_leg(schedule_id, f"T{schedule_id}", dep, arr, date, datetime.time(hour, minute), flight_time, price)
+
+def window(date):
+    """Интервал вылетов на весь день"""
+    return datetime.datetime.combine(date, datetime.time.min), datetime.datetime.combine(date, datetime.time.max)
+
+class TestFlightGraph(unittest.TestCase):
+    """Тесты для поиска маршрутов по графу рейсов"""
+
+    def test_direct_flight(self):
+        """Прямой рейс находится без пересадок"""
+        graph = FlightGraph([leg(1, 1, 2, DAY, 8)])
+        itineraries = graph.find_itineraries(1, 2, *window(DAY))
+
+        self.assertEqual(len(itineraries), 1)
+        self.assertEqual(itineraries[0].schedule_ids, (1,))
+        self.assertEqual(itineraries[0].stops, 0)
+
+    def test_minimum_connection_time(self):
+        """Стыковка короче минимального времени не допускается"""
+        legs = [
+            leg(1, 1, 2, DAY, 8),          # прилет в 9:00
+            leg(2, 2, 3, DAY, 9, 30),      # 30 минут на пересадку - мало
+            leg(3, 2, 3, DAY, 10, 30),     # 90 минут - достаточно
+        ]
+        graph = FlightGraph(legs, min_connection=datetime.timedelta(minutes=60))
+        itineraries = graph.find_itineraries(1, 3, *window(DAY))
+
+        self.assertEqual([it.schedule_ids for it in itineraries], [(1, 3)])
+
+    def test_overnight_connection(self):
+        """Стыковка через полночь"""
+        legs = [
+            leg(1, 1, 2, DAY, 22),
+            leg(2, 2, 3, NEXT_DAY, 7),
+        ]
+        itineraries = FlightGraph(legs).find_itineraries(1, 3, *window(DAY))
+
+        self.assertEqual(len(itineraries), 1)
+        self.assertEqual(itineraries[0].arrival, datetime.datetime.combine(NEXT_DAY, datetime.time(8, 0)))
+
+    def test_max_stops(self):
+        """Число пересадок ограничено max_stops"""
+        legs = [
+            leg(1, 1, 2, DAY, 6),
+            leg(2, 2, 3, DAY, 8),
+            leg(3, 3, 4, DAY, 10),
+        ]
+        graph = FlightGraph(legs)
+
+        self.assertEqual(graph.find_itineraries(1, 4, *window(DAY), max_stops=1), [])
+        self.assertEqual([it.stops for it in graph.find_itineraries(1, 4, *window(DAY), max_stops=2)], [2])
+
+    def test_pareto_front(self):
+        """Остаются только недоминируемые маршруты"""
+        legs = [
+            leg(1, 1, 3, DAY, 8, flight_time=120, price=500),  # быстро, дорого
+            leg(2, 1, 2, DAY, 8, price=100),
+            leg(3, 2, 3, DAY, 10, price=100),                  # дешево, с пересадкой
+            leg(4, 2, 3, DAY, 12, price=300),                  # хуже варианта 2-3 по всем критериям
+        ]
+        itineraries = FlightGraph(legs).find_itineraries(1, 3, *window(DAY))
+
+        self.assertEqual({it.schedule_ids for it in itineraries}, {(1,), (2, 3)})
+
+    def test_no_cycles(self):
+        """Маршрут не возвращается в уже посещенный аэропорт"""
+        legs = [
+            leg(1, 1, 2, DAY, 6),
+            leg(2, 2, 1, DAY, 8),
+            leg(3, 1, 3, DAY, 10),
+        ]
+        itineraries = FlightGraph(legs).find_itineraries(1, 3, *window(DAY))
+
+        self.assertEqual([it.schedule_ids for it in itineraries], [(3,)])
+
+    def test_large_graph_matches_exhaustive_search(self):
+        """На случайной сети результат совпадает с фронтом Парето полного перебора"""
+        rng = random.Random(42)
+        legs = []
+        for schedule_id in range(1500):
+            dep, arr = rng.sample(range(12), 2)
+            legs.append(leg(schedule_id, dep, arr, DAY + datetime.timedelta(days=rng.randrange(3)),
+                            rng.randrange(24), rng.choice((0, 30)), rng.randrange(60, 480), rng.randrange(100, 900)))
+
+        graph = FlightGraph(legs)
+        earliest, latest = window(NEXT_DAY)
+        itineraries = graph.find_itineraries(1, 2, earliest, latest, max_stops=2)
+
+        # Полный перебор маршрутов с теми же ограничениями стыковок
+        candidates = []
+
+        def extend(itinerary, visited):
+            last_leg = itinerary.legs[-1]
+            if last_leg.arrival_airport_id == 2:
+                candidates.append(itinerary)
+                return
+            if itinerary.stops == 2:
+                return
+            for next_leg in graph.departures_between(last_leg.arrival_airport_id,
+                                                     last_leg.arrival + graph.min_connection,
+                                                     last_leg.arrival + graph.max_connection):
+                if next_leg.arrival_airport_id not in visited:
+                    extend(itinerary.extend(next_leg), visited | {next_leg.arrival_airport_id})
+
+        for first_leg in graph.departures_between(1, earliest, latest):
+            extend(Itinerary.from_legs((first_leg,)), {1, first_leg.arrival_airport_id})
+
+        def criteria(itinerary):
+            return itinerary.departure, itinerary.arrival, itinerary.price, itinerary.stops
+
+        pareto = {
+            criteria(candidate) for candidate in candidates
+            if not any(other.dominates(candidate) and criteria(other) != criteria(candidate) for other in candidates)
+        }
+        self.assertTrue(itineraries)
+        self.assertGreater(len(candidates), len(itineraries))
+        self.assertEqual({criteria(itinerary) for itinerary in itineraries}, pareto)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,297 @@
+import unittest
+import sys
+import os
+import datetime
+import threading
+from unittest import mock
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tests import capture_statements
+from app.controllers.flight_controller import FlightController, search_cache, flight_graphs
+from app.controllers.fare_rule_controller import FareRuleController, fare_rules
+from app.controllers.inventory_controller import InventoryController
+from app.controllers.search_orchestrator import SearchLeg, SearchOrchestrator
+from app.models import Airport, Country, Route, Aircraft, Schedule, FareRule, SeatInventory
+from app.config.database import get_session
+
+class TestFlightSearch(unittest.TestCase):
+    """Тесты для поиска рейсов с пересадкой"""
+
+    AIRPORT_CODES = ("XSA", "XSH", "XSB")
+
+    def setUp(self):
+        """Подготовка перед каждым тестом"""
+        self.session = get_session()
+        self.date = datetime.date(2030, 1, 15)
+        search_cache.clear()
+        flight_graphs.clear()
+
+        country = self.session.query(Country).first()
+        if not country:
+            country = Country(name="Test Country")
+            self.session.add(country)
+            self.session.commit()
+
+        aircraft = self.session.query(Aircraft).first()
+        if not aircraft:
+            aircraft = Aircraft(
+                name="Test Aircraft",
+                make_model="Test Model",
+                total_seats=180,
+                economy_seats=150,
+                business_seats=30
+            )
+            self.session.add(aircraft)
+            self.session.commit()
+
+        # Аэропорты: отправление, хаб, назначение
+        self.airports = []
+        for code in self.AIRPORT_CODES:
+            airport = Airport(country_id=country.id, iata_code=code, name=f"Search Test {code}")
+            self.session.add(airport)
+            self.airports.append(airport)
+        self.session.commit()
+
+        origin, hub, destination = self.airports
+        self.to_hub = Route(departure_airport_id=origin.id, arrival_airport_id=hub.id, distance=500, flight_time=60)
+        self.from_hub = Route(departure_airport_id=hub.id, arrival_airport_id=destination.id, distance=500, flight_time=60)
+        self.session.add_all([self.to_hub, self.from_hub])
+        self.session.commit()
+
+        self.schedules = []
+        # Много вылетов в хаб и из хаба
+        for hour in range(6, 18):
+            self.schedules.append(Schedule(
+                route_id=self.to_hub.id, aircraft_id=aircraft.id, date=self.date,
+                time=datetime.time(hour, 0), flight_number=f"XA{hour}", economy_price=100.0, confirmed=True
+            ))
+        for hour in (12, 20):
+            self.schedules.append(Schedule(
+                route_id=self.from_hub.id, aircraft_id=aircraft.id, date=self.date,
+                time=datetime.time(hour, 0), flight_number=f"XB{hour}", economy_price=50.0, confirmed=True
+            ))
+        # Отмененный рейс не должен попасть в результаты
+        self.schedules.append(Schedule(
+            route_id=self.from_hub.id, aircraft_id=aircraft.id, date=self.date,
+            time=datetime.time(22, 0), flight_number="XB22", economy_price=50.0, confirmed=False
+        ))
+        self.session.add_all(self.schedules)
+        self.session.commit()
+
+        self.schedule_ids = [schedule.id for schedule in self.schedules]
+        self.route_ids = [self.to_hub.id, self.from_hub.id]
+        self.airport_ids = [airport.id for airport in self.airports]
+
+    def tearDown(self):
+        """Очистка после каждого теста"""
+        self.session.rollback()
+        self.session.query(SeatInventory).filter(SeatInventory.schedule_id.in_(self.schedule_ids)).delete(synchronize_session=False)
+        self.session.query(Schedule).filter(Schedule.id.in_(self.schedule_ids)).delete(synchronize_session=False)
+        self.session.query(Route).filter(Route.id.in_(self.route_ids)).delete(synchronize_session=False)
+        self.session.query(Airport).filter(Airport.id.in_(self.airport_ids)).delete(synchronize_session=False)
+        self.session.commit()
+        self.session.expunge_all()
+        search_cache.clear()
+        flight_graphs.clear()
+
+    def test_connecting_pairs(self):
+        """Пары сегментов с пересадкой в тот же день"""
+        flights = FlightController.search_flights("XSA", "XSB", self.date)
+
+        self.assertEqual(flights['direct'], [])
+
+        pairs = {(first.flight_number, second.flight_number) for first, second in flights['connecting']}
+        # Рейс XB12 доступен для вылетов до 12:00, XB20 - для всех
+        expected = {(f"XA{hour}", "XB12") for hour in range(6, 12)}
+        expected |= {(f"XA{hour}", "XB20") for hour in range(6, 18)}
+        self.assertEqual(pairs, expected)
+
+    def test_connecting_search_query_count(self):
+        """Количество SQL-запросов не зависит от числа вылетов из хаба"""
+        # Очищаем карту идентичности, чтобы связанные объекты не брались из нее
+        self.session.expunge_all()
+
+        with capture_statements() as statements:
+            flights = FlightController.search_flights("XSA", "XSB", self.date)
+            # Коды аэропортов загружены вместе с рейсами
+            for first, second in flights['connecting']:
+                self.assertEqual(first.route.arrival_airport.iata_code, "XSH")
+                self.assertEqual(second.route.arrival_airport.iata_code, "XSB")
+
+        # Два аэропорта, прямые рейсы и один запрос для стыковок
+        self.assertEqual(len(statements), 4)
+
+    def test_search_itineraries(self):
+        """Маршруты с пересадкой по графу рейсов"""
+        itineraries = FlightController.search_itineraries("XSA", "XSB", self.date, max_stops=1)
+
+        self.assertTrue(itineraries)
+        for itinerary in itineraries:
+            self.assertEqual(itinerary.stops, 1)
+            first, second = itinerary.legs
+            # Минимальное время стыковки - 60 минут после прилета (полет 60 минут)
+            self.assertGreaterEqual(second.departure - first.arrival, datetime.timedelta(minutes=60))
+            self.assertNotEqual(second.flight_number, "XB22")
+
+        # Самый поздний вылет XA17 успевает только на XB20
+        self.assertEqual(itineraries[-1].legs[0].flight_number, "XA17")
+
+        self.assertEqual(FlightController.search_itineraries("XSA", "???", self.date), [])
+
+    def test_search_itineraries_reuses_graph(self):
+        """Граф рейсов берется из кэша до изменения рейса в его диапазоне"""
+        FlightController.search_itineraries("XSA", "XSB", self.date, max_stops=1)
+
+        with capture_statements("SELECT") as statements:
+            itineraries = FlightController.search_itineraries("XSA", "XSB", self.date, max_stops=1)
+        # Только аэропорты; рейсы повторно не загружаются
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(itineraries[-1].legs[0].flight_number, "XA17")
+
+        # Отмена рейса XA17 инвалидирует граф
+        latest = next(schedule for schedule in self.schedules if schedule.flight_number == "XA17")
+        success, _ = FlightController.toggle_flight_status(latest.id)
+        self.assertTrue(success)
+
+        itineraries = FlightController.search_itineraries("XSA", "XSB", self.date, max_stops=1)
+        self.assertTrue(itineraries)
+        self.assertNotIn("XA17", [itinerary.legs[0].flight_number for itinerary in itineraries])
+
+
+    def expected_calendar(self, from_code, to_code, cabins=("Economy", "Business", "First Class")):
+        """Минимальные цены, посчитанные по полным результатам поиска"""
+        flights = FlightController.search_flights(from_code, to_code, self.date)
+        expected = {}
+        if flights['direct']:
+            expected["direct"] = {cabin: min(flight.get_price_by_cabin_type(cabin) for flight in flights['direct'])
+                                  for cabin in cabins}
+        if flights['connecting']:
+            expected["connecting"] = {
+                cabin: min(first.get_price_by_cabin_type(cabin) + second.get_price_by_cabin_type(cabin)
+                           for first, second in flights['connecting'])
+                for cabin in cabins
+            }
+        return expected
+
+    def test_fare_calendar(self):
+        """Календарь цен строится одним запросом и совпадает с результатами поиска"""
+        fare_rules.rules()
+
+        with capture_statements() as statements:
+            calendar = FlightController.get_fare_calendar("XSA", "XSB", self.date)
+
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(list(calendar), [self.date])
+        self.assertEqual(calendar[self.date]["direct"], {})
+        self.assertEqual(calendar[self.date]["connecting"], {"Economy": 150.0, "Business": 202, "First Class": 262})
+        self.assertEqual(calendar[self.date]["connecting"], self.expected_calendar("XSA", "XSB")["connecting"])
+
+        direct = FlightController.get_fare_calendar("XSA", "XSH", self.date)
+        self.assertEqual(direct[self.date]["direct"], self.expected_calendar("XSA", "XSH")["direct"])
+
+        self.assertEqual(FlightController.get_fare_calendar("XSA", "XSB", self.date + datetime.timedelta(days=4)), {})
+
+    def test_fare_calendar_with_rules(self):
+        """Правила тарифов учитываются в календаре так же, как в цене рейса"""
+        FareRuleController.add_rule("Business", multiplier=1.5, surcharge=7, route_id=self.to_hub.id)
+        FareRuleController.add_rule("Business", multiplier=3, route_id=self.to_hub.id,
+                                    start_date=self.date + datetime.timedelta(days=1))
+        FareRuleController.add_rule("Economy", surcharge=-10)
+        try:
+            calendar = FlightController.get_fare_calendar("XSA", "XSB", self.date)
+            self.assertEqual(calendar[self.date]["connecting"], self.expected_calendar("XSA", "XSB")["connecting"])
+            self.assertEqual(calendar[self.date]["connecting"]["Business"], int(135 * 1.5 + 7) + 67)
+        finally:
+            self.session.query(FareRule).delete(synchronize_session=False)
+            self.session.commit()
+            fare_rules.invalidate()
+
+
+    def test_search_rows(self):
+        """Строки результатов содержат цены, места и идентификаторы для бронирования"""
+        rows = FlightController.get_search_rows("XSA", "XSB", self.date, "Business")
+        self.assertEqual(len(rows), 18)
+
+        row = next(row for row in rows if row.flight_numbers == "XA6 - XB12")
+        self.assertEqual(row.price, 135 + 67)
+        self.assertEqual(row.stops, 1)
+        flight_ids = FlightController.parse_flight_selection(row.iid)
+        seats_left = FlightController.get_remaining_seats(flight_ids, "Business")
+        self.assertEqual(row.seats_left, min(seats_left.values()))
+
+    def test_search_rows_match_orm_search(self):
+        """Строки-проекции совпадают с результатами поиска по объектам ORM"""
+        flights = FlightController.search_flights("XSA", "XSB", self.date)
+        expected = {
+            f"connecting_{i}_{first.id}_{second.id}":
+                first.get_price_by_cabin_type("First Class") + second.get_price_by_cabin_type("First Class")
+            for i, (first, second) in enumerate(flights['connecting'])
+        }
+
+        rows = FlightController.get_search_rows("XSA", "XSB", self.date, "First Class")
+
+        self.assertEqual({row.iid: row.price for row in rows}, expected)
+        self.assertTrue(all(row.from_code == "XSA" and row.to_code == "XSB" for row in rows))
+
+    def test_search_rows_query_count(self):
+        """Строки поиска без ленивой загрузки: число запросов не зависит от числа рейсов"""
+        # Счетчики мест создаются вместе с рейсами (при импорте)
+        InventoryController.ensure_inventory(self.schedule_ids)
+        self.session.expunge_all()
+
+        FlightController.get_search_rows("XSA", "XSB", self.date, "Economy")
+        search_cache.clear()
+        with capture_statements("SELECT") as statements:
+            rows = FlightController.get_search_rows("XSA", "XSB", self.date, "Economy")
+
+        self.assertEqual(len(rows), 18)
+        # Прямые рейсы, стыковки, тип кабины и счетчики мест
+        self.assertLessEqual(len(statements), 5)
+
+    def test_orchestrator_runs_legs_in_parallel(self):
+        """Направления ищутся в потоках пула одновременно"""
+        orchestrator = SearchOrchestrator()
+        threads = set()
+        original = FlightController.get_search_rows
+        # Оба направления должны дойти до барьера одновременно, иначе он сломается по таймауту
+        barrier = threading.Barrier(2, timeout=10)
+
+        def parallel_search(*args):
+            threads.add(threading.get_ident())
+            barrier.wait()
+            return original(*args)
+
+        legs = [
+            SearchLeg("XSA", "XSB", self.date, "Economy", True),
+            SearchLeg("XSA", "XSH", self.date, "Economy", False),
+        ]
+        try:
+            with mock.patch.object(FlightController, "get_search_rows", side_effect=parallel_search):
+                outbound, inbound = orchestrator.search(*legs)
+        finally:
+            orchestrator.shutdown()
+
+        self.assertFalse(barrier.broken)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.get_ident(), threads)
+
+        self.assertEqual(outbound["rows"], FlightController.get_search_rows("XSA", "XSB", self.date, "Economy"))
+        self.assertEqual(outbound["calendar"], FlightController.get_fare_calendar("XSA", "XSB", self.date))
+        self.assertEqual(len(inbound["rows"]), 12)
+        self.assertIsNone(inbound["calendar"])
+
+    def test_orchestrator_propagates_errors(self):
+        """Ошибка поиска направления передается вызывающему"""
+        orchestrator = SearchOrchestrator()
+        try:
+            with mock.patch.object(FlightController, "get_search_rows", side_effect=RuntimeError("boom")):
+                with self.assertRaises(RuntimeError):
+                    orchestrator.search(SearchLeg("XSA", "XSB", self.date, "Economy", False))
+        finally:
+            orchestrator.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
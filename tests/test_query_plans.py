@@ -0,0 +1,161 @@
+import unittest
+import sys
+import os
+import datetime
+import sqlite3
+from unittest import mock
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, event, func, inspect, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateTable
+from app.models import Base, Schedule, Route, Ticket, UserSession
+from app.config import database
+from app.config.database import create_indexes, create_search_indexes, has_search_index
+from app.controllers.flight_controller import FlightController
+
+class TestQueryPlans(unittest.TestCase):
+    """Проверка того, что горячие запросы используют индексы (EXPLAIN QUERY PLAN)"""
+
+    def setUp(self):
+        """Подготовка перед каждым тестом"""
+        self.engine = create_engine('sqlite://')
+        Base.metadata.create_all(self.engine)
+
+    def tearDown(self):
+        """Очистка после каждого теста"""
+        database._search_indexes.pop(self.engine, None)
+        self.engine.dispose()
+
+    def explain(self, statement):
+        """Возвращает строки плана выполнения запроса"""
+        compiled = statement.compile(self.engine, compile_kwargs={"literal_binds": True})
+        with self.engine.connect() as connection:
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").fetchall()
+        return [row[-1] for row in rows]
+
+    def assertNoTableScan(self, statement, *indexes):
+        """Проверяет, что в плане нет полного сканирования и используются указанные индексы"""
+        plan = self.explain(statement)
+        for line in plan:
+            self.assertFalse(line.startswith("SCAN"), f"Table scan in plan: {plan}")
+        for index in indexes:
+            self.assertTrue(any(index in line for line in plan), f"{index} not used: {plan}")
+
+    def test_direct_flight_search(self):
+        """Поиск прямых рейсов"""
+        today = datetime.date.today()
+        statement = select(Schedule).join(Route).where(
+            Route.departure_airport_id == 1,
+            Route.arrival_airport_id == 2,
+            Schedule.date >= today,
+            Schedule.date <= today + datetime.timedelta(days=3),
+            Schedule.confirmed == True
+        )
+        self.assertNoTableScan(statement, "ix_routes_departure_arrival", "ix_schedules_route_date_time")
+
+    def test_connecting_second_leg_search(self):
+        """Поиск второго сегмента стыковочного рейса"""
+        statement = select(Schedule).join(Route).where(
+            Route.departure_airport_id == 3,
+            Route.arrival_airport_id == 2,
+            Schedule.date == datetime.date.today(),
+            Schedule.time > datetime.time(12, 0),
+            Schedule.confirmed == True
+        )
+        # Планировщик может выбрать любой из индексов расписаний, главное - без сканирования
+        self.assertNoTableScan(statement)
+
+    def test_seat_availability_count(self):
+        """Подсчет занятых мест по рейсу и типу кабины"""
+        statement = select(func.count(Ticket.id)).where(
+            Ticket.schedule_id == 1,
+            Ticket.cabin_type_id == 1
+        )
+        self.assertNoTableScan(statement, "ix_tickets_schedule_cabin")
+
+    def test_booking_lookup(self):
+        """Поиск билетов по номеру бронирования"""
+        statement = select(Ticket).where(Ticket.booking_reference == "1F3MXN7")
+        self.assertNoTableScan(statement, "ix_tickets_booking_reference")
+
+    def test_user_activity(self):
+        """Журнал активности пользователя"""
+        statement = select(UserSession).where(
+            UserSession.user_id == 1
+        ).order_by(UserSession.login_time.desc())
+        self.assertNoTableScan(statement, "ix_user_sessions_user_login")
+
+        plan = self.explain(statement)
+        self.assertFalse(any("TEMP B-TREE" in line for line in plan), plan)
+
+    def test_flight_number_search(self):
+        """Поиск номера рейса по подстроке через индекс триграмм"""
+        self.assertTrue(create_search_indexes(self.engine))
+        with mock.patch("app.controllers.flight_controller.has_search_index", return_value=True):
+            statement = select(Schedule).where(FlightController._flight_number_condition("AA1"))
+
+        plan = self.explain(statement)
+        self.assertIn("SEARCH schedules USING INTEGER PRIMARY KEY (rowid=?)", plan)
+        self.assertTrue(any("VIRTUAL TABLE INDEX" in line for line in plan), plan)
+        self.assertFalse(any(line.startswith("SCAN schedules ") or line == "SCAN schedules" for line in plan), plan)
+
+    def fail_fts5(self, message):
+        """Имитирует ошибку SQLite при создании таблиц FTS5; возвращает обработчик"""
+        def fail(conn, cursor, statement, parameters, context, executemany):
+            if "fts5" in statement:
+                raise OperationalError(statement, parameters, sqlite3.OperationalError(message))
+        event.listen(self.engine, "before_cursor_execute", fail)
+        return fail
+
+    def test_search_index_unsupported(self):
+        """Без FTS5 индекс не создается, и поиск номеров рейсов использует LIKE"""
+        self.fail_fts5("no such module: fts5")
+        self.assertFalse(create_search_indexes(self.engine))
+        self.assertFalse(has_search_index(self.engine))
+
+    def test_search_index_locked_database(self):
+        """Блокировка базы не считается отсутствием поддержки FTS5"""
+        fail = self.fail_fts5("database is locked")
+        with self.assertRaises(OperationalError):
+            create_search_indexes(self.engine)
+        self.assertNotIn(self.engine, database._search_indexes)
+
+        event.remove(self.engine, "before_cursor_execute", fail)
+        self.assertTrue(create_search_indexes(self.engine))
+        self.assertTrue(has_search_index(self.engine))
+
+    def test_search_index_probes_support(self):
+        """Таблица индекса есть, но сборка SQLite без FTS5 - индекс не используется"""
+        self.assertTrue(create_search_indexes(self.engine))
+        database._search_indexes.pop(self.engine)
+
+        self.fail_fts5("no such module: fts5")
+        self.assertFalse(has_search_index(self.engine))
+
+    def test_create_indexes_on_existing_database(self):
+        """Индексы создаются в базе, созданной без них"""
+        engine = create_engine('sqlite://')
+        try:
+            with engine.begin() as connection:
+                for table in Base.metadata.sorted_tables:
+                    # Создаем таблицы без индексов, как в старой базе
+                    connection.execute(CreateTable(table))
+
+            created = create_indexes(engine)
+            self.assertIn("ix_schedules_route_date_time", created)
+            self.assertIn("ix_tickets_schedule_cabin", created)
+
+            index_names = {index['name'] for index in inspect(engine).get_indexes('schedules')}
+            self.assertIn("ix_schedules_route_date_time", index_names)
+
+            # Повторный вызов ничего не создает
+            self.assertEqual(create_indexes(engine), [])
+        finally:
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
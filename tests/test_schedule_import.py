@@ -0,0 +1,157 @@
+import unittest
+import sys
+import os
+import datetime
+import tempfile
+from unittest import mock
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import event
+from tests import capture_statements
+from app.controllers.flight_controller import FlightController
+from app.models import Schedule, Route, Airport, CabinType, SeatInventory
+from app.config.database import get_engine, get_session
+
+class TestScheduleImport(unittest.TestCase):
+    """Тесты импорта изменений расписания из файла"""
+
+    ROWS = 25
+
+    def setUp(self):
+        """Подготовка перед каждым тестом"""
+        self.session = get_session()
+        route = self.session.query(Route).first()
+        self.from_code = self.session.get(Airport, route.departure_airport_id).iata_code
+        self.to_code = self.session.get(Airport, route.arrival_airport_id).iata_code
+        self.date = datetime.date(2032, 5, 1)
+
+        lines = ["Operation,Flight number,From,To,Date,Time,Price"]
+        for i in range(self.ROWS):
+            day = self.date + datetime.timedelta(days=i)
+            lines.append(f"ADD,IMP{i},{self.from_code},{self.to_code},{day.strftime('%d/%m/%Y')},10:30,{100 + i}")
+        # Дубликат и строка без полей
+        lines.append(f"ADD,IMP0,{self.from_code},{self.to_code},{self.date.strftime('%d/%m/%Y')},10:30,100")
+        lines.append(f"ADD,IMP99,{self.from_code}")
+        self.content = "\n".join(lines) + "\n"
+
+        handle, self.path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w", newline="") as file:
+            file.write(self.content)
+
+    def tearDown(self):
+        """Очистка после каждого теста"""
+        os.remove(self.path)
+        self.session.rollback()
+        self.delete_imported()
+
+    def delete_imported(self):
+        imported_ids = self.session.query(Schedule.id).filter(Schedule.flight_number.like("IMP%"))
+        self.session.query(SeatInventory).filter(SeatInventory.schedule_id.in_(imported_ids)).delete(synchronize_session=False)
+        self.session.query(Schedule).filter(Schedule.flight_number.like("IMP%")).delete(synchronize_session=False)
+        self.session.commit()
+
+    def inventory_rows(self):
+        imported_ids = self.session.query(Schedule.id).filter(Schedule.flight_number.like("IMP%"))
+        return self.session.query(SeatInventory).filter(SeatInventory.schedule_id.in_(imported_ids)).count()
+
+    def imported(self):
+        return self.session.query(Schedule).filter(Schedule.flight_number.like("IMP%")).count()
+
+    def test_file_import_commits_in_chunks(self):
+        """Файл импортируется пачками: фиксация после каждой пачки и вызов progress"""
+        commits = []
+        progress = []
+
+        def count_commit(connection):
+            commits.append(connection)
+
+        engine = get_engine()
+        event.listen(engine, "commit", count_commit)
+        try:
+            success, results = FlightController.import_schedule_file(
+                self.path, chunk_size=10, progress=lambda *values: progress.append(values)
+            )
+        finally:
+            event.remove(engine, "commit", count_commit)
+
+        self.assertTrue(success)
+        self.assertEqual(results, {"success": self.ROWS, "duplicates": 1, "missing_fields": 1})
+        self.assertEqual(self.imported(), self.ROWS)
+        # Счетчики мест созданы вместе с рейсами
+        self.assertEqual(self.inventory_rows(), self.ROWS * self.session.query(CabinType).count())
+
+        # 27 строк данных: пачки 10, 10 и 7
+        self.assertEqual([rows for rows, _, _ in progress], [10, 20, 27])
+        self.assertEqual(len(commits), 3)
+        total_size = os.path.getsize(self.path)
+        self.assertTrue(all(size == total_size for _, _, size in progress))
+        self.assertEqual(progress[-1][1], total_size)
+
+    def test_same_results_as_string_import(self):
+        """Потоковый импорт дает тот же результат, что и импорт из строки"""
+        success, results = FlightController.import_schedule_changes(self.content)
+        self.assertTrue(success)
+        self.delete_imported()
+
+        self.assertEqual(FlightController.import_schedule_file(self.path, chunk_size=7), (True, results))
+
+    def test_error_keeps_committed_chunks(self):
+        """Ошибка откатывает только текущую пачку"""
+        original = FlightController._import_row
+        calls = []
+
+        def failing_row(session, row, results, touched, lookups):
+            calls.append(row)
+            if len(calls) == 15:
+                raise RuntimeError("disk error")
+            original(session, row, results, touched, lookups)
+
+        with mock.patch.object(FlightController, "_import_row", side_effect=failing_row):
+            success, message = FlightController.import_schedule_file(self.path, chunk_size=10)
+
+        self.assertFalse(success)
+        self.assertIn("disk error", message)
+        self.assertEqual(self.imported(), 10)
+        self.assertEqual(self.inventory_rows(), 10 * self.session.query(CabinType).count())
+
+    def test_lookups_do_not_query_per_row(self):
+        """Число запросов SELECT зависит от числа пачек, а не от числа строк"""
+        with capture_statements("SELECT") as selects:
+            success, results = FlightController.import_schedule_file(self.path, chunk_size=100)
+
+        self.assertTrue(success)
+        self.assertEqual(results, {"success": self.ROWS, "duplicates": 1, "missing_fields": 1})
+        # Аэропорты, маршруты, самолет, расписания и счетчики мест единственной пачки
+        self.assertEqual(len(selects), 8)
+
+    def test_edit_in_same_file(self):
+        """EDIT находит рейс, добавленный выше в том же файле, и в следующей пачке"""
+        new_date = (self.date + datetime.timedelta(days=100)).strftime('%d/%m/%Y')
+        lines = self.content.splitlines()[:3] + [
+            f"EDIT,IMP0,{self.from_code},{self.to_code},{new_date},11:45,555",
+            f"ADD,IMP0,{self.from_code},{self.to_code},{new_date},11:45,555",
+            f"EDIT,IMP1,{self.from_code},{self.to_code},{new_date},12:00,600",
+        ]
+        with open(self.path, "w", newline="") as file:
+            file.write("\n".join(lines) + "\n")
+
+        success, results = FlightController.import_schedule_file(self.path, chunk_size=3)
+
+        self.assertTrue(success)
+        self.assertEqual(results, {"success": 4, "duplicates": 1, "missing_fields": 0})
+        edited = self.session.query(Schedule).filter_by(flight_number="IMP0").one()
+        self.assertEqual(edited.date, self.date + datetime.timedelta(days=100))
+        self.assertEqual(edited.time, datetime.time(11, 45))
+        self.assertEqual(edited.economy_price, 555)
+        self.assertEqual(self.session.query(Schedule).filter_by(flight_number="IMP1").one().economy_price, 600)
+
+    def test_missing_file(self):
+        """Отсутствующий файл - ошибка без исключения"""
+        success, message = FlightController.import_schedule_file(self.path + ".missing")
+        self.assertFalse(success)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,13 +2,15 @@ import unittest
 import sys
 import os
 import datetime
+import threading
 
 # Добавляем корневую директорию проекта в путь поиска модулей
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from tests import capture_statements
 from app.controllers.flight_controller import FlightController
 from app.models import Schedule, Route, Airport
-from app.config.database import get_session
+from app.config.database import get_session, remove_session
 
 class TestScheduleManagement(unittest.TestCase):
     """Тесты для функций управления расписанием рейсов"""
@@ -70,6 +72,107 @@ class TestScheduleManagement(unittest.TestCase):
         self.session.refresh(self.schedule)
         self.assertEqual(self.schedule.confirmed, initial_status)
 
+    def test_get_schedule_rows(self):
+        """Строки таблицы расписаний совпадают с данными объектов ORM"""
+        self.assertIsNotNone(self.schedule)
+
+        rows = FlightController.get_schedule_rows(flight_number=self.schedule.flight_number)
+        row = next(row for row in rows if row.id == self.schedule.id)
+
+        self.assertEqual(row.from_code, self.schedule.route.departure_airport.iata_code)
+        self.assertEqual(row.to_code, self.schedule.route.arrival_airport.iata_code)
+        self.assertEqual(row.aircraft_name, self.schedule.aircraft.name)
+        self.assertEqual(row.business_price, self.schedule.business_price)
+        self.assertEqual(row.first_class_price, self.schedule.first_class_price)
+        self.assertEqual(row.confirmed, self.schedule.confirmed)
+
+        # Порядок и фильтры те же, что у get_filtered_schedules
+        self.assertEqual(
+            [row.id for row in FlightController.get_schedule_rows(sort_by="business_price")],
+            [schedule.id for schedule in FlightController.get_filtered_schedules(sort_by="business_price")]
+        )
+
+    def count_statements(self, work):
+        """Количество SQL-запросов при выполнении work() с пустой картой идентичности"""
+        self.session.expunge_all()
+        with capture_statements() as statements:
+            work()
+        return len(statements)
+
+    def test_filtered_schedules_query_count(self):
+        """Маршрут, аэропорты и самолет загружаются без запросов на каждую строку"""
+        self.assertIsNotNone(self.schedule)
+        schedule_id = self.schedule.id
+        schedule_date = self.schedule.date
+
+        def show(schedules):
+            # Те же связи, что выводит таблица расписаний
+            for schedule in schedules:
+                (schedule.route.departure_airport.iata_code, schedule.route.arrival_airport.iata_code,
+                 schedule.aircraft.name)
+
+        counts = {
+            "all": self.count_statements(lambda: show(FlightController.get_filtered_schedules())),
+            "date": self.count_statements(lambda: show(FlightController.get_filtered_schedules(date=schedule_date))),
+            "by_id": self.count_statements(lambda: show([FlightController.get_flight_by_id(schedule_id)])),
+        }
+
+        self.assertEqual(counts, {"all": 1, "date": 1, "by_id": 1})
+
+    def test_keyset_pagination(self):
+        """Страницы по ключу в сумме дают тот же порядок, что и полный список"""
+        for sort_by in ("date_time", "business_price", "confirmed"):
+            expected = [row.id for row in FlightController.get_schedule_rows(sort_by=sort_by)]
+
+            # Вперед от начала
+            forward, key = [], None
+            while True:
+                page = FlightController.get_schedule_rows(sort_by=sort_by, page_size=7, after_key=key)
+                if not page:
+                    break
+                self.assertLessEqual(len(page), 7)
+                forward.extend(row.id for row in page)
+                key = FlightController.schedule_page_key(page[-1], sort_by)
+            self.assertEqual(forward, expected, sort_by)
+
+            # Назад от последней строки
+            last = FlightController.get_filtered_schedules(sort_by=sort_by)[-1]
+            backward, key = [last.id], FlightController.schedule_page_key(last, sort_by)
+            while True:
+                page = FlightController.get_filtered_schedules(sort_by=sort_by, page_size=7, before_key=key)
+                if not page:
+                    break
+                backward[:0] = [schedule.id for schedule in page]
+                key = FlightController.schedule_page_key(page[0], sort_by)
+            self.assertEqual(backward, expected, sort_by)
+
+    def test_get_schedule_row_after_toggle(self):
+        """Строка одного рейса отражает изменение статуса без загрузки всей таблицы"""
+        self.assertIsNotNone(self.schedule)
+        initial_status = self.schedule.confirmed
+
+        FlightController.toggle_flight_status(self.schedule.id)
+        try:
+            row = FlightController.get_schedule_row(self.schedule.id)
+            self.assertEqual(row.id, self.schedule.id)
+            self.assertEqual(row.confirmed, not initial_status)
+            self.assertEqual(row.flight_number, self.schedule.flight_number)
+        finally:
+            FlightController.toggle_flight_status(self.schedule.id)
+
+        self.assertIsNone(FlightController.get_schedule_row(-1))
+
+    def test_filter_by_airport_id(self):
+        """Фильтр по аэропортам принимает ID так же, как объекты Airport"""
+        self.assertIsNotNone(self.schedule)
+        route = self.session.query(Route).get(self.schedule.route_id)
+        from_airport = self.session.query(Airport).get(route.departure_airport_id)
+
+        self.assertEqual(
+            [row.id for row in FlightController.get_schedule_rows(from_airport=from_airport.id)],
+            [row.id for row in FlightController.get_schedule_rows(from_airport=from_airport)]
+        )
+
     def test_get_filtered_schedules_by_flight_number(self):
         """Тест получения отфильтрованного списка расписаний по номеру рейса"""
         # Проверяем, что расписание существует
@@ -85,6 +188,51 @@ class TestScheduleManagement(unittest.TestCase):
         for schedule in schedules:
             self.assertIn(self.schedule.flight_number, schedule.flight_number)
 
+    def test_flight_number_index_sync(self):
+        """Индекс номеров рейсов следует за вставкой, изменением и удалением расписаний"""
+        self.assertIsNotNone(self.schedule)
+
+        def found(flight_number):
+            return [schedule.id for schedule in FlightController.get_filtered_schedules(flight_number=flight_number)]
+
+        schedule = Schedule(
+            route_id=self.schedule.route_id,
+            aircraft_id=self.schedule.aircraft_id,
+            date=self.schedule.date,
+            time=datetime.time(23, 59),
+            flight_number="QZX917",
+            economy_price=100.0,
+            confirmed=True
+        )
+        self.session.add(schedule)
+        self.session.commit()
+        schedule_id = schedule.id
+        try:
+            self.assertEqual(found("ZX9"), [schedule_id])
+            self.assertEqual(found("zx91"), [schedule_id])
+
+            schedule.flight_number = "QWV555"
+            self.session.commit()
+            self.assertEqual(found("ZX9"), [])
+            self.assertEqual(found("WV5"), [schedule_id])
+        finally:
+            self.session.delete(schedule)
+            self.session.commit()
+
+        self.assertEqual(found("WV5"), [])
+
+    def test_flight_number_search_matches_like(self):
+        """Поиск по индексу дает те же строки, что и LIKE"""
+        for flight_number in ("A", "AA", "AA1", "100", "ZZZ"):
+            expected = self.session.query(Schedule.id).filter(
+                Schedule.flight_number.like(f"%{flight_number}%")
+            ).order_by(Schedule.date, Schedule.time, Schedule.id)
+            self.assertEqual(
+                [schedule.id for schedule in FlightController.get_filtered_schedules(flight_number=flight_number)],
+                [schedule_id for schedule_id, in expected],
+                flight_number
+            )
+
     def test_get_filtered_schedules_by_date(self):
         """Тест получения отфильтрованного списка расписаний по дате"""
         # Проверяем, что расписание существует
@@ -122,5 +270,135 @@ class TestScheduleManagement(unittest.TestCase):
             self.assertEqual(schedule.route.arrival_airport_id, to_airport.id)
 
 
+    def test_get_filtered_schedules_by_cabin_price(self):
+        """Тест сортировки и ограничения цены по кабине"""
+        schedules = FlightController.get_filtered_schedules(sort_by="business_price")
+        prices = [schedule.business_price for schedule in schedules]
+        self.assertGreater(len(prices), 0)
+        self.assertEqual(prices, sorted(prices))
+
+        ceiling = sorted(schedule.first_class_price for schedule in schedules)[len(schedules) // 2]
+        cheap = FlightController.get_filtered_schedules(max_price=ceiling, cabin_type="First Class")
+        expected = {schedule.id for schedule in schedules if schedule.first_class_price <= ceiling}
+        self.assertEqual({schedule.id for schedule in cheap}, expected)
+
+
+class TestBulkScheduleOperations(unittest.TestCase):
+    """Тесты массовых операций над расписаниями"""
+
+    def setUp(self):
+        """Подготовка перед каждым тестом"""
+        self.session = get_session()
+        self.date = datetime.date(2031, 3, 10)
+
+        self.route = self.session.query(Route).first()
+        from app.models import Aircraft
+        aircraft = self.session.query(Aircraft).first()
+        self.other_route = self.session.query(Route).filter(Route.id != self.route.id).first()
+
+        self.schedules = [
+            Schedule(route_id=self.route.id, aircraft_id=aircraft.id, date=self.date + datetime.timedelta(days=day),
+                     time=datetime.time(10, 0), flight_number=f"BK{day}", economy_price=200.0, confirmed=True)
+            for day in range(5)
+        ]
+        # Рейс другого маршрута в те же даты не должен меняться фильтром по маршруту
+        self.schedules.append(Schedule(
+            route_id=self.other_route.id, aircraft_id=aircraft.id, date=self.date, time=datetime.time(11, 0),
+            flight_number="BK9", economy_price=200.0, confirmed=True
+        ))
+        self.session.add_all(self.schedules)
+        self.session.commit()
+        self.schedule_ids = [schedule.id for schedule in self.schedules]
+
+    def tearDown(self):
+        """Очистка после каждого теста"""
+        self.session.rollback()
+        self.session.query(Schedule).filter(Schedule.id.in_(self.schedule_ids)).delete(synchronize_session=False)
+        self.session.commit()
+
+    def states(self):
+        self.session.expire_all()
+        return {schedule.flight_number: (schedule.confirmed, schedule.economy_price)
+                for schedule in self.session.query(Schedule).filter(Schedule.id.in_(self.schedule_ids))}
+
+    def test_cancel_by_ids(self):
+        """Отмена и подтверждение рейсов по списку ID"""
+        success, count = FlightController.set_flights_status(False, schedule_ids=self.schedule_ids[:2])
+        self.assertTrue(success)
+        self.assertEqual(count, 2)
+
+        states = self.states()
+        self.assertFalse(states["BK0"][0])
+        self.assertFalse(states["BK1"][0])
+        self.assertTrue(states["BK2"][0])
+
+        success, count = FlightController.set_flights_status(True, schedule_ids=self.schedule_ids[:2])
+        self.assertTrue(success)
+        self.assertTrue(all(confirmed for confirmed, _ in self.states().values()))
+
+    def test_reprice_by_filter_is_one_statement(self):
+        """Изменение цен рейсов маршрута за период - один UPDATE"""
+        from_airport = self.session.get(Airport, self.route.departure_airport_id)
+        with capture_statements("UPDATE") as statements:
+            success, count = FlightController.reprice_flights(
+                percent=5, from_airport=from_airport, to_airport=self.route.arrival_airport_id,
+                start_date=self.date + datetime.timedelta(days=1), end_date=self.date + datetime.timedelta(days=3)
+            )
+
+        self.assertTrue(success)
+        self.assertEqual(len(statements), 1)
+
+        states = self.states()
+        self.assertEqual([states[f"BK{day}"][1] for day in range(5)], [200.0, 210.0, 210.0, 210.0, 200.0])
+        self.assertEqual(states["BK9"][1], 200.0)
+
+    def test_reprice_rejects_non_positive_prices(self):
+        """Цена не может стать неположительной; ничего не изменяется"""
+        success, message = FlightController.reprice_flights(amount=-500, schedule_ids=self.schedule_ids)
+        self.assertFalse(success)
+        self.assertIn("неположительной", message)
+        self.assertTrue(all(price == 200.0 for _, price in self.states().values()))
+
+    def test_bulk_update_expires_loaded_instances(self):
+        """Загруженные в сессию рейсы после массовой операции не устаревают"""
+        schedule = FlightController.get_flight_by_id(self.schedule_ids[0])
+        self.assertEqual(schedule.economy_price, 200.0)
+
+        FlightController.reprice_flights(percent=10, schedule_ids=self.schedule_ids[:1])
+        self.assertEqual(schedule.economy_price, 220.0)
+
+    def test_changes_from_other_thread_are_visible(self):
+        """Изменения рейса в другом потоке видны при следующем вызове контроллера"""
+        flight_id = self.schedule_ids[0]
+        schedule = FlightController.get_flight_by_id(flight_id)
+        self.assertTrue(schedule.confirmed)
+
+        def change_in_worker():
+            try:
+                FlightController.set_flights_status(False, schedule_ids=[flight_id])
+                FlightController.reprice_flights(percent=10, schedule_ids=[flight_id])
+            finally:
+                remove_session()
+
+        worker = threading.Thread(target=change_in_worker)
+        worker.start()
+        worker.join(10)
+
+        schedule = FlightController.get_flight_by_id(flight_id)
+        self.assertFalse(schedule.confirmed)
+        self.assertEqual(schedule.economy_price, 220.0)
+
+        # Повторная отмена отменяет изменение, а не отменяет рейс еще раз
+        success, message = FlightController.toggle_flight_status(flight_id)
+        self.assertTrue(success)
+        self.assertIn("подтвержден", message)
+
+    def test_requires_flights(self):
+        """Без фильтров и списка ID операция не выполняется"""
+        success, message = FlightController.set_flights_status(False)
+        self.assertFalse(success)
+        self.assertEqual(FlightController.set_flights_status(False, schedule_ids=[]), (True, 0))
+
+
 if __name__ == '__main__':
     unittest.main()
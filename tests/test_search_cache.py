@@ -0,0 +1,145 @@
+import unittest
+import sys
+import os
+import datetime
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.search_cache import SearchCache
+from app.controllers.flight_controller import FlightController, search_cache
+from app.models import Schedule
+from app.config.database import get_session, remove_session
+
+DAY = datetime.date(2030, 1, 15)
+
+class FakeClock:
+    """Управляемые часы для проверки времени жизни записей"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestSearchCache(unittest.TestCase):
+    """Тесты для кэша результатов поиска"""
+
+    def setUp(self):
+        """Подготовка перед каждым тестом"""
+        self.clock = FakeClock()
+        self.cache = SearchCache(max_entries=2, ttl=60, clock=self.clock)
+
+    def test_hit_and_miss(self):
+        """Счетчики попаданий и промахов"""
+        key = SearchCache.make_key("AUH", "CAI", DAY, DAY, False)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, "result")
+        self.assertEqual(self.cache.get(key), "result")
+
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_ttl(self):
+        """Запись устаревает по истечении времени жизни"""
+        key = SearchCache.make_key("AUH", "CAI", DAY, DAY, False)
+        self.cache.put(key, "result")
+        self.clock.now = 61
+        self.assertIsNone(self.cache.get(key))
+
+    def test_lru_eviction(self):
+        """Вытесняется давно не использованная запись"""
+        first = SearchCache.make_key("AUH", "CAI", DAY, DAY, False)
+        second = SearchCache.make_key("CAI", "AUH", DAY, DAY, False)
+        third = SearchCache.make_key("AUH", "TXL", DAY, DAY, False)
+
+        self.cache.put(first, 1)
+        self.cache.put(second, 2)
+        self.cache.get(first)
+        self.cache.put(third, 3)
+
+        self.assertEqual(self.cache.get(first), 1)
+        self.assertIsNone(self.cache.get(second))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_invalidation_by_airport_and_date(self):
+        """Инвалидируются только записи с затронутыми аэропортами и датами"""
+        cache = SearchCache(max_entries=10)
+        extended = SearchCache.make_key("AUH", "CAI", DAY - datetime.timedelta(days=3), DAY + datetime.timedelta(days=3), True)
+        other_date = SearchCache.make_key("AUH", "CAI", DAY + datetime.timedelta(days=10), DAY + datetime.timedelta(days=10), False)
+        connecting = SearchCache.make_key("AUH", "LHR", DAY, DAY, False)
+        unrelated = SearchCache.make_key("TXL", "LHR", DAY, DAY, False)
+        for key in (extended, other_date, connecting, unrelated):
+            cache.put(key, key)
+
+        # Рейс AUH -> DOH может быть первым сегментом стыковки AUH -> LHR
+        self.assertEqual(cache.invalidate("AUH", "DOH", DAY), 2)
+
+        self.assertIsNone(cache.get(extended))
+        self.assertIsNone(cache.get(connecting))
+        self.assertIsNotNone(cache.get(other_date))
+        self.assertIsNotNone(cache.get(unrelated))
+
+
+class TestSearchCacheInvalidation(unittest.TestCase):
+    """Инвалидация кэша операциями контроллера"""
+
+    def setUp(self):
+        """Подготовка перед каждым тестом"""
+        search_cache.clear()
+        self.session = get_session()
+        self.schedule = self.session.query(Schedule).filter_by(confirmed=True).first()
+
+    def tearDown(self):
+        """Очистка после каждого теста"""
+        search_cache.clear()
+
+    def test_toggle_invalidates_search(self):
+        """Отмена рейса сбрасывает закэшированный результат поиска"""
+        if not self.schedule:
+            self.skipTest("No confirmed schedules")
+
+        from_code = self.schedule.route.departure_airport.iata_code
+        to_code = self.schedule.route.arrival_airport.iata_code
+        date = self.schedule.date
+        schedule_id = self.schedule.id
+
+        def direct_ids():
+            return [segment.id for segment in FlightController.search_segments(from_code, to_code, date, date)['direct']]
+
+        first = FlightController.search_segments(from_code, to_code, date, date)
+        second = FlightController.search_segments(from_code, to_code, date, date)
+        self.assertIs(first, second)
+        self.assertIn(schedule_id, direct_ids())
+
+        FlightController.toggle_flight_status(schedule_id)
+        try:
+            self.assertNotIn(schedule_id, direct_ids())
+        finally:
+            FlightController.toggle_flight_status(schedule_id)
+
+        self.assertIn(schedule_id, direct_ids())
+
+    def test_search_flights_returns_current_session_objects(self):
+        """search_flights не кэширует объекты ORM: после закрытия сессии они не устаревают"""
+        if not self.schedule:
+            self.skipTest("No confirmed schedules")
+
+        from_code = self.schedule.route.departure_airport.iata_code
+        to_code = self.schedule.route.arrival_airport.iata_code
+        date = self.schedule.date
+        schedule_id = self.schedule.id
+
+        FlightController.search_flights(from_code, to_code, date)
+        remove_session()
+
+        result = FlightController.search_flights(from_code, to_code, date)
+        session = get_session()
+        self.assertTrue(all(flight in session for flight in result['direct']))
+        self.assertIn(schedule_id, [flight.id for flight in result['direct']])
+        self.assertEqual(search_cache.stats()["entries"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -99,5 +99,23 @@ class TestTicketPricing(unittest.TestCase):
         )
 
 
+    def test_sql_prices_match_python(self):
+        """Цены, вычисленные в SQL, совпадают с ценами в Python"""
+        rows = self.session.query(
+            Schedule.id,
+            Schedule.business_price,
+            Schedule.first_class_price,
+            Schedule.price_expression("First Class")
+        ).all()
+        self.assertGreater(len(rows), 0)
+
+        schedules = {schedule.id: schedule for schedule in self.session.query(Schedule).all()}
+        for schedule_id, business_price, first_class_price, cabin_price in rows:
+            schedule = schedules[schedule_id]
+            self.assertEqual(business_price, schedule.business_price)
+            self.assertEqual(first_class_price, schedule.first_class_price)
+            self.assertEqual(cabin_price, schedule.get_price_by_cabin_type("first class"))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,177 @@
+import unittest
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+# Добавляем корневую директорию проекта в путь поиска модулей
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.tk_tasks import TaskRunner
+
+class FakeWidget:
+    """Окно без Tk: отложенные вызовы after() выполняются вручную"""
+
+    def __init__(self):
+        self.scheduled = []
+        self.cursor = ""
+        self.exists = True
+
+    def after(self, delay, callback):
+        self.scheduled.append(callback)
+
+    def configure(self, **options):
+        self.cursor = options.get("cursor", self.cursor)
+
+    def winfo_exists(self):
+        return self.exists
+
+    def pump(self, timeout=5.0):
+        """Опрос очереди, пока окно планирует новые опросы"""
+        deadline = time.monotonic() + timeout
+        while self.scheduled and time.monotonic() < deadline:
+            callback = self.scheduled.pop(0)
+            callback()
+            if self.scheduled:
+                time.sleep(0.005)
+
+
+class TestTaskRunner(unittest.TestCase):
+    """Тесты выполнения запросов окон в фоновых потоках"""
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.widget = FakeWidget()
+        self.busy_changes = []
+        self.runner = TaskRunner(self.widget, poll_interval=1, on_busy=self.busy_changes.append,
+                                 executor=self.executor)
+
+    def tearDown(self):
+        self.executor.shutdown(wait=True)
+
+    def test_success_callback_runs_on_polling_thread(self):
+        """Функция выполняется в потоке пула, обработчик - в потоке опроса"""
+        threads = {}
+        results = []
+
+        def work(value):
+            threads["work"] = threading.get_ident()
+            return value * 2
+
+        def done(result):
+            threads["callback"] = threading.get_ident()
+            results.append(result)
+
+        self.runner.submit("load", work, 21, on_success=done)
+        self.assertTrue(self.runner.busy)
+        self.assertEqual(self.widget.cursor, "watch")
+
+        self.widget.pump()
+
+        self.assertEqual(results, [42])
+        self.assertNotEqual(threads["work"], threading.get_ident())
+        self.assertEqual(threads["callback"], threading.get_ident())
+        self.assertFalse(self.runner.busy)
+        self.assertEqual(self.widget.cursor, "")
+        self.assertEqual(self.busy_changes, [True, False])
+
+    def test_superseded_result_is_dropped(self):
+        """Результат запроса, вытесненного более новым с тем же ключом, отбрасывается"""
+        release = threading.Event()
+        results = []
+
+        def slow():
+            release.wait(5)
+            return "old"
+
+        self.runner.submit("search", slow, on_success=results.append)
+        self.runner.submit("search", lambda: "new", on_success=results.append)
+        release.set()
+
+        self.widget.pump()
+
+        self.assertEqual(results, ["new"])
+        self.assertFalse(self.runner.busy)
+
+    def test_cancelled_request_does_not_run(self):
+        """Отмененный до начала выполнения запрос не выполняется"""
+        release = threading.Event()
+        calls = []
+
+        # Занимаем оба потока пула, чтобы запрос остался в очереди
+        self.runner.submit("a", release.wait, 5)
+        self.runner.submit("b", release.wait, 5)
+        self.runner.submit("load", calls.append, "called", on_success=calls.append)
+        self.runner.cancel("load")
+        release.set()
+
+        self.widget.pump()
+
+        self.assertEqual(calls, [])
+        self.assertFalse(self.runner.busy)
+
+    def test_error_goes_to_error_callback(self):
+        """Исключение функции передается в on_error, on_success не вызывается"""
+        errors = []
+        results = []
+
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertLogs("app.utils.tk_tasks", level="ERROR"):
+            self.runner.submit("load", fail, on_success=results.append, on_error=errors.append)
+            self.widget.pump()
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], ValueError)
+
+    def test_worker_session_is_removed(self):
+        """После задачи сессия потока пула закрывается"""
+        with mock.patch("app.utils.tk_tasks.remove_session") as remove_session:
+            self.runner.submit("load", lambda: None)
+            self.widget.pump()
+
+        remove_session.assert_called_once()
+
+    def test_latency_is_logged(self):
+        """Время выполнения каждого запроса записывается в журнал"""
+        with self.assertLogs("app.utils.tk_tasks", level="INFO") as logs:
+            self.runner.submit("load", lambda: None)
+            self.widget.pump()
+
+        self.assertTrue(any("Task load finished in" in line for line in logs.output))
+
+    def test_progress_reaches_main_thread(self):
+        """Ход выполнения передается в on_progress в потоке опроса до результата"""
+        events = []
+
+        def work(count, progress):
+            for done in range(1, count + 1):
+                progress(done, count)
+            return "done"
+
+        self.runner.submit("import", work, 3,
+                           on_progress=lambda done, total: events.append((done, total, threading.get_ident())),
+                           on_success=events.append)
+        self.widget.pump()
+
+        main_thread = threading.get_ident()
+        self.assertEqual(events, [(1, 3, main_thread), (2, 3, main_thread), (3, 3, main_thread), "done"])
+
+    def test_closed_window_stops_polling(self):
+        """Закрытое окно больше не опрашивается и обработчики не вызываются"""
+        results = []
+        self.runner.submit("load", lambda: 1, on_success=results.append)
+        self.widget.exists = False
+
+        self.widget.pump()
+
+        self.assertEqual(results, [])
+        self.assertEqual(self.widget.scheduled, [])
+
+
+if __name__ == '__main__':
+    unittest.main()